@@ -0,0 +1,382 @@
+"""
+Modo lote (Batch API) para jobs grandes de extração com IA.
+
+Em vez de uma chamada interativa por página, os prompts de um job vão
+todos num lote do provedor (OpenAI Batch, Anthropic Message Batches,
+Gemini Batch Mode), que custa cerca de metade e termina em até 24h.
+O job consulta o lote de tempos em tempos e, quando ele termina, as
+respostas entram no cache de respostas da IA: o processamento normal
+das páginas encontra tudo pronto e monta os mesmos `seletores`/`dados`
+do modo interativo.
+
+O provedor LOCAL_AI_PROVIDER ("Local (offline)") responde na hora com uma
+heurística simples sobre o HTML, sem rede nem API key - serve para testar
+o fluxo de lote (e o resto do app) offline.
+"""
+import json
+import os
+import re
+import uuid
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from html_document import element_text
+from html_reducer import query_keywords
+from page_fingerprint import stable_classes
+from ai_providers import (
+    OPENAI_PROVIDER, ANTHROPIC_PROVIDER, GEMINI_PROVIDER, LOCAL_AI_PROVIDER, AI_MAX_OUTPUT_TOKENS,
+    get_client, provider_available, parse_json_response
+)
+
+AI_BATCH_DIR = os.environ.get('AI_BATCH_DIR', os.path.join('.cache', 'ai_batches'))  # lotes do provedor local
+AI_BATCH_POLL_SECONDS = float(os.environ.get('AI_BATCH_POLL_SECONDS', 60))  # intervalo entre consultas ao lote
+
+# Status normalizados de um lote
+BATCH_RUNNING = 'running'
+BATCH_ENDED = 'ended'  # terminou (pode ter pedidos individuais com erro)
+BATCH_FAILED = 'failed'  # o lote inteiro falhou
+
+BATCH_PROVIDERS = (OPENAI_PROVIDER, ANTHROPIC_PROVIDER, GEMINI_PROVIDER, LOCAL_AI_PROVIDER)
+
+
+def supports_batch(ai_provider):
+    """True se o provedor tem modo lote"""
+    return ai_provider in BATCH_PROVIDERS
+
+
+# ---- OpenAI (Batch API) ----
+
+def _openai_submit(api_key, model, requests):
+    client = get_client(OPENAI_PROVIDER, api_key)
+    lines = [
+        json.dumps({
+            'custom_id': request['custom_id'],
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {
+                'model': model,
+                'messages': [{'role': 'user', 'content': request['prompt']}],
+                'response_format': {'type': 'json_object'}
+            }
+        }, ensure_ascii=False)
+        for request in requests
+    ]
+    batch_file = client.files.create(file=('batch.jsonl', '\n'.join(lines).encode('utf-8')), purpose='batch')
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint='/v1/chat/completions', completion_window='24h')
+    return batch.id
+
+
+def _openai_poll(api_key, batch_id):
+    batch = get_client(OPENAI_PROVIDER, api_key).batches.retrieve(batch_id)
+    counts = batch.request_counts
+    if batch.status == 'failed':
+        status = BATCH_FAILED
+    elif batch.status in ('completed', 'expired', 'cancelled'):
+        status = BATCH_ENDED
+    else:
+        status = BATCH_RUNNING
+    return {
+        'status': status,
+        'done': (counts.completed + counts.failed) if counts else None,
+        'total': counts.total if counts else None,
+        'message': batch.status
+    }
+
+
+def _openai_results(api_key, batch_id, custom_ids):
+    client = get_client(OPENAI_PROVIDER, api_key)
+    batch = client.batches.retrieve(batch_id)
+    results = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get('response') or {}
+            if entry.get('error') or response.get('status_code') != 200:
+                error = entry.get('error') or (response.get('body') or {}).get('error') or response.get('status_code')
+                results[entry['custom_id']] = {'error': f"Erro no lote: {error}"}
+            else:
+                content = response['body']['choices'][0]['message']['content']
+                results[entry['custom_id']] = parse_json_response(content)
+    return results
+
+
+# ---- Anthropic (Message Batches) ----
+
+def _anthropic_submit(api_key, model, requests):
+    batch = get_client(ANTHROPIC_PROVIDER, api_key).messages.batches.create(requests=[
+        {
+            'custom_id': request['custom_id'],
+            'params': {
+                'model': model,
+                'max_tokens': AI_MAX_OUTPUT_TOKENS,
+                'messages': [{'role': 'user', 'content': request['prompt']}]
+            }
+        }
+        for request in requests
+    ])
+    return batch.id
+
+
+def _anthropic_poll(api_key, batch_id):
+    batch = get_client(ANTHROPIC_PROVIDER, api_key).messages.batches.retrieve(batch_id)
+    counts = batch.request_counts
+    pending = counts.processing
+    total = counts.processing + counts.succeeded + counts.errored + counts.canceled + counts.expired
+    return {
+        'status': BATCH_ENDED if batch.processing_status == 'ended' else BATCH_RUNNING,
+        'done': total - pending,
+        'total': total,
+        'message': batch.processing_status
+    }
+
+
+def _anthropic_results(api_key, batch_id, custom_ids):
+    results = {}
+    for entry in get_client(ANTHROPIC_PROVIDER, api_key).messages.batches.results(batch_id):
+        if entry.result.type != 'succeeded':
+            error = getattr(entry.result, 'error', None) or entry.result.type
+            results[entry.custom_id] = {'error': f"Erro no lote: {error}"}
+            continue
+        content_text = ''.join(block.text for block in entry.result.message.content if hasattr(block, 'text'))
+        results[entry.custom_id] = parse_json_response(content_text)
+    return results
+
+
+# ---- Google Gemini (Batch Mode) ----
+
+def _gemini_submit(api_key, model, requests):
+    batch = get_client(GEMINI_PROVIDER, api_key).batches.create(
+        model=model,
+        src=[
+            {
+                'contents': [{'parts': [{'text': request['prompt']}], 'role': 'user'}],
+                'config': {'response_mime_type': 'application/json'}
+            }
+            for request in requests
+        ]
+    )
+    return batch.name
+
+
+def _gemini_poll(api_key, batch_id):
+    batch = get_client(GEMINI_PROVIDER, api_key).batches.get(name=batch_id)
+    state = batch.state.name if batch.state else ''
+    if state == 'JOB_STATE_SUCCEEDED':
+        status = BATCH_ENDED
+    elif state in ('JOB_STATE_FAILED', 'JOB_STATE_CANCELLED', 'JOB_STATE_EXPIRED'):
+        status = BATCH_FAILED
+    else:
+        status = BATCH_RUNNING
+    return {'status': status, 'done': None, 'total': None, 'message': state}
+
+
+def _gemini_results(api_key, batch_id, custom_ids):
+    # As respostas em linha voltam na mesma ordem dos pedidos
+    batch = get_client(GEMINI_PROVIDER, api_key).batches.get(name=batch_id)
+    responses = (batch.dest.inlined_responses if batch.dest else None) or []
+    results = {}
+    for custom_id, entry in zip(custom_ids, responses):
+        if getattr(entry, 'error', None) or not entry.response:
+            results[custom_id] = {'error': f"Erro no lote: {getattr(entry, 'error', None)}"}
+        else:
+            results[custom_id] = parse_json_response(entry.response.text)
+    return results
+
+
+# ---- Provedor local (offline) ----
+
+_FIELD_SEPARATORS = re.compile(r',|;|\n|\s+e\s+|\s+and\s+', re.I)
+_IMAGE_KEYWORDS = {'img', 'image', 'imagem', 'imagens', 'foto', 'photo'}
+_CSS_IDENTIFIER = re.compile(r'^-?[A-Za-z_][\w-]*$')
+
+
+def _query_fields(user_query):
+    """Campos pedidos ("título, preço e imagens" → ['título', 'preço', 'imagens'])"""
+    fields = [part.strip(' .:') for part in _FIELD_SEPARATORS.split(user_query or '')]
+    return [field for field in fields if field] or ['conteúdo']
+
+
+def _css_selector(elem):
+    """Seletor CSS simples para o elemento: #id ou tag.classe"""
+    elem_id = elem.get('id')
+    if elem_id and _CSS_IDENTIFIER.match(elem_id):
+        return f"#{elem_id}"
+    classes = [cls for cls in stable_classes(elem.get('class')) if _CSS_IDENTIFIER.match(cls)]
+    return elem.tag.lower() + ''.join('.' + cls for cls in classes[:2])
+
+
+def _find_field(root, field):
+    """Primeiro elemento da página que parece conter o campo (elemento, valor) ou (None, None)"""
+    keywords = query_keywords(field) or {field.lower()}
+    if keywords & _IMAGE_KEYWORDS:
+        for img in root.iter('img'):
+            if img.get('src'):
+                return img, img.get('src')
+    for elem in root.iter(etree.Element):
+        if elem.tag in ('html', 'head', 'body'):
+            continue
+        haystack = ' '.join([elem.tag, elem.get('class') or '', elem.get('id') or '', elem.get('itemprop') or '']).lower()
+        if any(keyword in haystack for keyword in keywords):
+            text = element_text(elem)
+            if text:
+                return elem, text
+    return None, None
+
+
+def local_ai_response(kind, html_content, user_query):
+    """
+    Resposta do provedor local: procura cada campo pedido por tag/classe/id.
+
+    Args:
+        kind: 'selectors' (formato de extract_with_ai), 'data' (formato de extract_data_directly_with_ai)
+              ou 'multi_selectors' (formato de extract_multi_with_ai; user_query = {nome: pergunta})
+        html_content: HTML limpo da página
+        user_query: Pedido do usuário
+
+    Returns:
+        dict: {'seletores', 'explicacao'}, {'dados', 'resumo'} ou {'respostas'}
+    """
+    if kind == 'multi_selectors':
+        return {
+            'respostas': {
+                name: local_ai_response('selectors', html_content, query) for name, query in user_query.items()
+            }
+        }
+    try:
+        root = lxml_html.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        return {'error': 'HTML vazio ou inválido'}
+    fields = _query_fields(user_query)
+    found = [(field,) + _find_field(root, field) for field in fields]
+    found_count = sum(1 for _, elem, _ in found if elem is not None)
+    summary = f"Provedor local (offline): {found_count} de {len(fields)} campo(s) encontrados"
+    if kind == 'selectors':
+        return {
+            'seletores': [
+                {
+                    'tipo': 'css',
+                    'seletor': _css_selector(elem) if elem is not None else '',
+                    'descricao': field,
+                    'exemplo_resultado': value[:200] if value else 'Não encontrado'
+                }
+                for field, elem, value in found
+            ],
+            'explicacao': summary
+        }
+    return {
+        'dados': [
+            {'campo': field, 'valor': value if value else 'Não encontrado', 'encontrado': elem is not None}
+            for field, elem, value in found
+        ],
+        'resumo': summary
+    }
+
+
+def _local_path(batch_id):
+    return os.path.join(AI_BATCH_DIR, f"{batch_id}.jsonl")
+
+
+def _local_submit(api_key, model, requests):
+    batch_id = f"local-{uuid.uuid4().hex[:12]}"
+    os.makedirs(AI_BATCH_DIR, exist_ok=True)
+    with open(_local_path(batch_id), 'w', encoding='utf-8') as f:
+        for request in requests:
+            f.write(json.dumps({
+                'custom_id': request['custom_id'],
+                'kind': request['kind'],
+                'html': request['html'],
+                'user_query': request['user_query']
+            }, ensure_ascii=False) + '\n')
+    return batch_id
+
+
+def _local_poll(api_key, batch_id):
+    if not os.path.exists(_local_path(batch_id)):
+        return {'status': BATCH_FAILED, 'done': None, 'total': None, 'message': 'lote não encontrado'}
+    return {'status': BATCH_ENDED, 'done': None, 'total': None, 'message': 'concluído'}
+
+
+def _local_results(api_key, batch_id, custom_ids):
+    results = {}
+    with open(_local_path(batch_id), 'r', encoding='utf-8') as f:
+        for line in f:
+            request = json.loads(line)
+            results[request['custom_id']] = local_ai_response(request['kind'], request['html'], request['user_query'])
+    return results  # o arquivo só sai em discard_batch, depois que o chamador guardou as respostas
+
+
+_BATCH_BACKENDS = {
+    OPENAI_PROVIDER: (_openai_submit, _openai_poll, _openai_results),
+    ANTHROPIC_PROVIDER: (_anthropic_submit, _anthropic_poll, _anthropic_results),
+    GEMINI_PROVIDER: (_gemini_submit, _gemini_poll, _gemini_results),
+    LOCAL_AI_PROVIDER: (_local_submit, _local_poll, _local_results),
+}
+
+
+def _backend(ai_provider):
+    if ai_provider not in _BATCH_BACKENDS:
+        raise ValueError(f"Provedor sem modo lote: {ai_provider}")
+    if ai_provider != LOCAL_AI_PROVIDER and not provider_available(ai_provider):
+        raise ValueError(f"{ai_provider} não está disponível")
+    return _BATCH_BACKENDS[ai_provider]
+
+
+def submit_batch(ai_provider, api_key, model, requests):
+    """
+    Envia um lote de prompts ao provedor.
+
+    Args:
+        ai_provider: Provedor de IA
+        api_key: API key do provedor
+        model: Modelo usado em todos os pedidos
+        requests: Lista de dicts {'custom_id', 'prompt', 'kind', 'html', 'user_query'}
+                  (custom_id: letras, números, '-' e '_')
+
+    Returns:
+        str: ID do lote no provedor
+    """
+    submit, _, _ = _backend(ai_provider)
+    return submit(api_key, model, requests)
+
+
+def poll_batch(ai_provider, api_key, batch_id):
+    """
+    Consulta o andamento de um lote.
+
+    Returns:
+        dict: {'status': BATCH_RUNNING/BATCH_ENDED/BATCH_FAILED, 'done', 'total', 'message'}
+              (done/total podem ser None quando o provedor não informa)
+    """
+    _, poll, _ = _backend(ai_provider)
+    return poll(api_key, batch_id)
+
+
+def fetch_batch_results(ai_provider, api_key, batch_id, custom_ids):
+    """
+    Baixa as respostas de um lote terminado.
+
+    Args:
+        custom_ids: IDs dos pedidos na ordem de envio (o Gemini devolve só pela ordem)
+
+    Returns:
+        dict: {custom_id: resposta JSON da IA ou {'error': mensagem}}; pedidos sem resposta ficam de fora
+    """
+    _, _, results = _backend(ai_provider)
+    return results(api_key, batch_id, custom_ids)
+
+
+def discard_batch(ai_provider, batch_id):
+    """
+    Descarta um lote cujas respostas já foram guardadas (ou que falhou).
+    Só o provedor local guarda algo (o arquivo do lote); nos demais o provedor mantém o lote.
+    """
+    if ai_provider == LOCAL_AI_PROVIDER:
+        try:
+            os.remove(_local_path(batch_id))
+        except OSError:
+            pass
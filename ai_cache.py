@@ -0,0 +1,66 @@
+"""
+Cache persistente das respostas da IA.
+
+Clicar em "Processar Novamente" ou reexecutar uma tarefa com a mesma página
+e o mesmo pedido mandava o mesmo prompt para a IA de novo. A chave do cache
+é provedor + modelo + hash do HTML limpo enviado + pedido do usuário: a
+mesma análise volta do disco em milissegundos, sem custo de API.
+
+O HTML entra na chave já limpo e reduzido (o que de fato vai no prompt),
+então mudanças irrelevantes na página (scripts, tracking) não invalidam
+o cache, mas qualquer mudança no conteúdo sim.
+"""
+import hashlib
+import json
+import os
+
+from disk_cache import DiskCache
+from selector_cache import normalize_query
+
+AI_CACHE_DIR = os.environ.get('AI_CACHE_DIR', os.path.join('.cache', 'ai'))
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', 3 * 24 * 3600))  # o conteúdo das páginas muda
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_MB', 100)) * 1024 * 1024
+
+ai_cache = DiskCache(AI_CACHE_DIR, max_bytes=AI_CACHE_MAX_BYTES, default_ttl=AI_CACHE_TTL)
+
+
+def ai_response_key(kind, ai_provider, model, html_content, user_query):
+    """
+    Chave da resposta no cache.
+
+    Args:
+        kind: 'selectors' (extract_with_ai) ou 'data' (extract_data_directly_with_ai)
+        ai_provider: Provedor de IA
+        model: Modelo usado na chamada
+        html_content: HTML limpo enviado no prompt
+        user_query: Pedido do usuário
+    """
+    html_hash = hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+    return ('ai', kind, ai_provider, model, html_hash, normalize_query(user_query))
+
+
+def get_cached_response(key):
+    """
+    Busca uma resposta já recebida da IA.
+
+    Returns:
+        dict: Resposta da IA ou None
+    """
+    entry = ai_cache.get(key)
+    if not entry:
+        return None
+    try:
+        return json.loads(entry['value'])
+    except ValueError:
+        return None
+
+
+def store_response(key, result):
+    """Grava a resposta da IA (respostas com erro não são gravadas)"""
+    if not isinstance(result, dict) or 'error' in result:
+        return
+    ai_cache.set(
+        key,
+        json.dumps(result, ensure_ascii=False, default=str),
+        meta={'kind': key[1], 'provider': key[2], 'model': key[3]}
+    )
@@ -0,0 +1,261 @@
+"""
+Chamadas à IA em paralelo respeitando os limites de cada provedor.
+
+O Multi-URL chamava a IA uma URL por vez (10-60s cada). Aqui as chamadas
+rodam num pool de threads, com três limites por provedor, compartilhados
+por todos os jobs do processo:
+
+- concorrência: máximo de chamadas simultâneas
+- requisições por minuto (token bucket)
+- tokens por minuto (token bucket, pela estimativa de tokens do prompt)
+
+Respostas 429 (limite estourado) e 529 (provedor sobrecarregado) são
+repetidas com backoff exponencial, respeitando o Retry-After quando vem.
+"""
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def _provider_limits(env_name, concurrency, requests_per_minute, tokens_per_minute):
+    return {
+        'concurrency': int(os.environ.get(f'AI_CONCURRENCY_{env_name}', concurrency)),
+        'requests_per_minute': int(os.environ.get(f'AI_RPM_{env_name}', requests_per_minute)),
+        'tokens_per_minute': int(os.environ.get(f'AI_TPM_{env_name}', tokens_per_minute)),
+    }
+
+
+# Limites por provedor (os padrões são os de contas iniciais; ajuste pelo ambiente conforme o plano)
+AI_PROVIDER_LIMITS = {
+    "OpenAI (ChatGPT)": _provider_limits('OPENAI', 8, 500, 200000),
+    "Anthropic (Claude)": _provider_limits('ANTHROPIC', 4, 50, 30000),
+    "Google (Gemini)": _provider_limits('GEMINI', 8, 1000, 1000000),
+}
+AI_DEFAULT_LIMITS = _provider_limits('DEFAULT', 4, 60, 100000)
+
+AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 5))  # novas tentativas após 429/529
+AI_BACKOFF_BASE = 2.0  # segundos da primeira espera (dobra a cada tentativa)
+AI_BACKOFF_MAX = 60.0
+
+_RATE_LIMIT_STATUS = {429, 529}
+_RATE_LIMIT_PATTERN = re.compile(r'\b429\b|\b529\b|rate.?limit|too many requests|resource.?exhausted|overloaded', re.I)
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe: `per_minute` unidades por minuto, acumulando até `capacity`.
+
+    Args:
+        per_minute: Taxa de reposição (unidades por minuto)
+        capacity: Máximo acumulado (padrão = per_minute, ou seja, no máximo 1 minuto de rajada)
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(capacity or per_minute)
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """
+        Consome `amount` unidades, esperando o quanto for preciso.
+        Pedidos maiores que a capacidade esperam o bucket encher e o esvaziam.
+        """
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait_seconds = (amount - self.available) / self.rate
+            time.sleep(min(wait_seconds, 1.0))
+
+
+def is_rate_limit_error(error):
+    """True se a exceção do SDK for um 429 (limite de taxa) ou 529 (provedor sobrecarregado)"""
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status in _RATE_LIMIT_STATUS:
+        return True
+    return bool(_RATE_LIMIT_PATTERN.search(str(error)))
+
+
+def _retry_after(error):
+    """Segundos pedidos pelo provedor no cabeçalho Retry-After (ou None)"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, error=None):
+    """Espera antes da tentativa `attempt` (1, 2, ...): Retry-After ou exponencial com jitter"""
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, AI_BACKOFF_MAX)
+    delay = min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * (2 ** (attempt - 1)))
+    return delay * (0.5 + random.random() / 2)
+
+
+class ProviderLimiter:
+    """
+    Limites de um provedor: concorrência + requisições/min + tokens/min.
+
+    Args:
+        concurrency: Chamadas simultâneas
+        requests_per_minute: Requisições por minuto
+        tokens_per_minute: Tokens (estimados) por minuto
+    """
+
+    def __init__(self, concurrency, requests_per_minute, tokens_per_minute):
+        self.concurrency = max(1, concurrency)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+
+    @contextmanager
+    def slot(self, estimated_tokens):
+        """Reserva requisição + tokens nos buckets e ocupa uma vaga de concorrência"""
+        self._requests.acquire(1)
+        self._tokens.acquire(estimated_tokens)
+        with self._slots:
+            yield
+
+    def call(self, estimated_tokens, fn, *args, on_retry=None, **kwargs):
+        """
+        Executa fn(*args, **kwargs) dentro dos limites, repetindo em 429/529.
+
+        Args:
+            estimated_tokens: Tokens estimados da chamada (prompt)
+            on_retry: Callback opcional on_retry(tentativa, espera_em_segundos, erro)
+
+        Returns:
+            O retorno de fn (outras exceções sobem para quem chamou)
+        """
+        attempt = 0
+        while True:
+            with self.slot(estimated_tokens):
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt >= AI_MAX_RETRIES:
+                        raise
+                    error = e
+            # Espera fora do slot: outras chamadas podem seguir enquanto esta aguarda
+            attempt += 1
+            delay = backoff_delay(attempt, error)
+            if on_retry:
+                on_retry(attempt, delay, error)
+            time.sleep(delay)
+
+    def stream(self, estimated_tokens, fn, *args, on_retry=None, **kwargs):
+        """
+        Versão de call para respostas em streaming: fn devolve um iterável de pedaços de texto,
+        repassados conforme chegam. A vaga de concorrência fica ocupada até o fim do stream.
+        Só repete em 429/529 se o erro vier antes do primeiro pedaço.
+        """
+        attempt = 0
+        while True:
+            started = False
+            with self.slot(estimated_tokens):
+                try:
+                    for chunk in fn(*args, **kwargs):
+                        started = True
+                        yield chunk
+                    return
+                except Exception as e:
+                    if started or not is_rate_limit_error(e) or attempt >= AI_MAX_RETRIES:
+                        raise
+                    error = e
+            attempt += 1
+            delay = backoff_delay(attempt, error)
+            if on_retry:
+                on_retry(attempt, delay, error)
+            time.sleep(delay)
+
+
+# Um limitador por provedor, compartilhado pelo processo inteiro (sobrevive aos reruns do Streamlit)
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(ai_provider):
+    """Limitador do provedor (criado na primeira chamada)"""
+    with _limiters_lock:
+        if ai_provider not in _limiters:
+            limits = AI_PROVIDER_LIMITS.get(ai_provider, AI_DEFAULT_LIMITS)
+            _limiters[ai_provider] = ProviderLimiter(**limits)
+        return _limiters[ai_provider]
+
+
+def dispatch_ai_call(ai_provider, estimated_tokens, fn, *args, on_retry=None, **kwargs):
+    """Executa uma chamada à IA respeitando os limites do provedor (ver ProviderLimiter.call)"""
+    return limiter_for(ai_provider).call(estimated_tokens, fn, *args, on_retry=on_retry, **kwargs)
+
+
+def dispatch_ai_stream(ai_provider, estimated_tokens, fn, *args, on_retry=None, **kwargs):
+    """Streaming de uma chamada à IA respeitando os limites do provedor (ver ProviderLimiter.stream)"""
+    return limiter_for(ai_provider).stream(estimated_tokens, fn, *args, on_retry=on_retry, **kwargs)
+
+
+def iter_concurrent(items, fn, max_workers, before_submit=None):
+    """
+    Executa fn(item) para vários itens em paralelo, entregando cada resultado assim que termina.
+
+    Novas tarefas só são disparadas quando quem consome pede o próximo resultado
+    (no máximo `max_workers` em andamento), e before_submit() roda na thread de
+    quem consome antes de cada disparo - ex: job.checkpoint() para pausar/parar.
+
+    Args:
+        items: Lista de itens
+        fn: Função fn(item) -> resultado (exceções viram {'error': mensagem})
+        max_workers: Máximo de tarefas simultâneas
+
+    Yields:
+        tuple: (índice do item na entrada, resultado), em ordem de conclusão
+    """
+    pending = deque(range(len(items)))
+    if not pending:
+        return
+
+    def _safe_call(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            return {'error': str(e)}
+
+    executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix='ai-call')
+    running = {}
+
+    def _fill_slots():
+        while pending and len(running) < max_workers:
+            if before_submit:
+                before_submit()
+            idx = pending.popleft()
+            running[executor.submit(_safe_call, items[idx])] = idx
+
+    try:
+        _fill_slots()
+        while running:
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield running.pop(future), future.result()
+            _fill_slots()
+    finally:
+        # Consumidor parou antes do fim: não disparar as chamadas pendentes
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=False)
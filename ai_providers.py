@@ -0,0 +1,302 @@
+"""
+Camada única de acesso aos provedores de IA (OpenAI, Anthropic, Gemini).
+
+Antes cada chamada criava um OpenAI(...)/Anthropic(...)/genai.Client(...)
+novo - cada um com seu próprio pool de conexões HTTP e handshake TLS - e a
+tarefa agendada ainda usava o SDK antigo google.generativeai. Aqui os
+clientes ficam em cache por (provedor, API key) e são reaproveitados por
+todas as chamadas e threads (os clientes dos SDKs são thread-safe), e todos
+os pontos do app que falam com a IA usam a mesma interface:
+
+- call_json: resposta em JSON (análise de páginas)
+- stream_json: resposta em JSON em streaming, item a item (json_stream)
+- call_text: resposta em texto livre
+- get_client: cliente do SDK (ex: Batch API)
+
+As chamadas passam pelo ai_dispatcher (limites por provedor e backoff em 429).
+
+Prompt caching: os prompts começam pela parte estável (instruções + HTML da
+página) e terminam no pedido do usuário. OpenAI e Gemini reaproveitam
+sozinhos esse prefixo entre chamadas; na Anthropic o prefixo informado em
+`cacheable_prefix` é marcado com cache_control.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from ai_dispatcher import dispatch_ai_call, dispatch_ai_stream
+from html_reducer import estimate_tokens
+from json_stream import JsonArrayStream
+
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+try:
+    from anthropic import Anthropic
+    ANTHROPIC_AVAILABLE = True
+except ImportError:
+    ANTHROPIC_AVAILABLE = False
+
+try:
+    from google import genai
+    from google.genai import types
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+OPENAI_PROVIDER = "OpenAI (ChatGPT)"
+ANTHROPIC_PROVIDER = "Anthropic (Claude)"
+GEMINI_PROVIDER = "Google (Gemini)"
+LOCAL_AI_PROVIDER = "Local (offline)"  # heurística sem rede (ver ai_batch.local_ai_response)
+
+# Modelo usado por provedor nas análises de página (também faz parte da chave do cache de respostas)
+# O modelo mais recente da OpenAI é o gpt-5, da Anthropic é claude-sonnet-4-20250514 e da Google é gemini-2.5-flash
+# Não altere isso a menos que explicitamente solicitado pelo usuário
+AI_MODELS = {
+    OPENAI_PROVIDER: "gpt-5",
+    ANTHROPIC_PROVIDER: "claude-sonnet-4-20250514",
+    GEMINI_PROVIDER: "gemini-2.5-flash",
+    LOCAL_AI_PROVIDER: "heuristica-local",
+}
+
+AI_MAX_OUTPUT_TOKENS = 2048  # tamanho máximo da resposta (Anthropic exige)
+AI_CLIENT_CACHE_SIZE = 16  # clientes mantidos (um por provedor + API key)
+# Marcar o prefixo do prompt como cacheável na Anthropic (a escrita no cache custa 25% a mais;
+# as leituras, 10% do preço - compensa quando o mesmo HTML é analisado mais de uma vez em 5 min)
+AI_PROMPT_CACHE = os.environ.get('AI_PROMPT_CACHE', '1') != '0'
+
+_AVAILABILITY = {
+    OPENAI_PROVIDER: OPENAI_AVAILABLE,
+    ANTHROPIC_PROVIDER: ANTHROPIC_AVAILABLE,
+    GEMINI_PROVIDER: GEMINI_AVAILABLE,
+}
+_PROVIDER_NAMES = {OPENAI_PROVIDER: "OpenAI", ANTHROPIC_PROVIDER: "Anthropic", GEMINI_PROVIDER: "Gemini"}
+
+
+def provider_available(ai_provider):
+    """True se o SDK do provedor está instalado"""
+    return _AVAILABILITY.get(ai_provider, False)
+
+
+def available_providers():
+    """Provedores com SDK instalado, na ordem exibida na interface"""
+    return [provider for provider, available in _AVAILABILITY.items() if available]
+
+
+def parse_json_response(text):
+    """Converte o texto de resposta da IA em JSON (aceita JSON cercado de texto/markdown)"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        match = re.search(r'\{.*\}', text or '', re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group())
+            except ValueError:
+                pass
+    return {'error': 'Resposta da IA não é um JSON válido'}
+
+
+# Clientes em cache (LRU) - o módulo não é reexecutado nos reruns do Streamlit
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _new_client(ai_provider, api_key):
+    if ai_provider == OPENAI_PROVIDER:
+        return OpenAI(api_key=api_key)
+    if ai_provider == ANTHROPIC_PROVIDER:
+        return Anthropic(api_key=api_key)
+    return genai.Client(api_key=api_key)
+
+
+def get_client(ai_provider, api_key):
+    """
+    Cliente do SDK do provedor, reaproveitado entre chamadas (mesmo pool de conexões).
+
+    Raises:
+        ValueError: Provedor desconhecido ou SDK não instalado
+    """
+    if ai_provider not in _AVAILABILITY:
+        raise ValueError(f"Provedor de IA não reconhecido: {ai_provider}")
+    if not provider_available(ai_provider):
+        raise ValueError(f"{_PROVIDER_NAMES[ai_provider]} não está disponível")
+    # A key entra na chave só como hash (não fica em texto no dicionário)
+    cache_key = (ai_provider, hashlib.sha256((api_key or '').encode('utf-8')).hexdigest())
+    with _clients_lock:
+        client = _clients.get(cache_key)
+        if client is not None:
+            _clients.move_to_end(cache_key)
+            return client
+        client = _new_client(ai_provider, api_key)
+        _clients[cache_key] = client
+        while len(_clients) > AI_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+        return client
+
+
+def _anthropic_messages(prompt, cacheable_prefix=None):
+    """Mensagem da Anthropic; com cacheable_prefix, o início do prompt vira um bloco com cache_control"""
+    if AI_PROMPT_CACHE and cacheable_prefix and prompt.startswith(cacheable_prefix):
+        content = [
+            {"type": "text", "text": cacheable_prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": prompt[len(cacheable_prefix):]},
+        ]
+    else:
+        content = prompt
+    return [{"role": "user", "content": content}]
+
+
+def complete(ai_provider, api_key, prompt, model=None, json_mode=False, cacheable_prefix=None):
+    """
+    Faz UMA chamada ao provedor e devolve o texto da resposta.
+    Exceções do SDK sobem (o dispatcher repete as de limite de taxa).
+
+    Args:
+        model: Modelo (padrão = AI_MODELS do provedor)
+        json_mode: Pedir resposta em JSON ao provedor
+        cacheable_prefix: Início do prompt que se repete entre chamadas (ex: instruções + HTML)
+    """
+    client = get_client(ai_provider, api_key)
+    model = model or AI_MODELS[ai_provider]
+    if ai_provider == OPENAI_PROVIDER:
+        kwargs = {'response_format': {"type": "json_object"}} if json_mode else {}
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+        return response.choices[0].message.content or ""
+    if ai_provider == ANTHROPIC_PROVIDER:
+        response = client.messages.create(
+            model=model,
+            max_tokens=AI_MAX_OUTPUT_TOKENS,
+            messages=_anthropic_messages(prompt, cacheable_prefix)
+        )
+        return "".join(block.text for block in response.content if hasattr(block, 'text'))
+    response = client.models.generate_content(
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json") if json_mode else None
+    )
+    return response.text or ""
+
+
+def stream_chunks(ai_provider, api_key, prompt, model=None, json_mode=False, cacheable_prefix=None):
+    """
+    Faz UMA chamada em streaming e devolve os pedaços de texto conforme chegam.
+    Exceções do SDK sobem (o dispatcher repete as de limite de taxa antes do primeiro pedaço).
+    """
+    client = get_client(ai_provider, api_key)
+    model = model or AI_MODELS[ai_provider]
+    if ai_provider == OPENAI_PROVIDER:
+        kwargs = {'response_format': {"type": "json_object"}} if json_mode else {}
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            **kwargs
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        return
+    if ai_provider == ANTHROPIC_PROVIDER:
+        with client.messages.stream(
+            model=model,
+            max_tokens=AI_MAX_OUTPUT_TOKENS,
+            messages=_anthropic_messages(prompt, cacheable_prefix)
+        ) as stream:
+            for text in stream.text_stream:
+                yield text
+        return
+    for chunk in client.models.generate_content_stream(
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_mime_type="application/json") if json_mode else None
+    ):
+        if chunk.text:
+            yield chunk.text
+
+
+def _unavailable_error(ai_provider):
+    """{'error': ...} se o provedor for desconhecido ou não estiver instalado (senão None)"""
+    if ai_provider not in _AVAILABILITY:
+        return {"error": f"Provedor de IA não reconhecido: {ai_provider}"}
+    if not provider_available(ai_provider):
+        return {"error": f"{_PROVIDER_NAMES[ai_provider]} não está disponível"}
+    return None
+
+
+def request_json(ai_provider, api_key, prompt, model=None, cacheable_prefix=None):
+    """
+    Faz UMA chamada pedindo resposta em JSON.
+
+    Returns:
+        Resposta JSON da IA, ou {'error': mensagem} se o provedor não estiver disponível
+        ou a resposta vier vazia (demais exceções sobem)
+    """
+    unavailable = _unavailable_error(ai_provider)
+    if unavailable:
+        return unavailable
+    content_text = complete(ai_provider, api_key, prompt, model=model, json_mode=True,
+                            cacheable_prefix=cacheable_prefix)
+    if not content_text.strip():
+        return {"error": f"Resposta vazia da API {_PROVIDER_NAMES[ai_provider]}"}
+    return json.loads(content_text)
+
+
+def call_json(ai_provider, api_key, prompt, model=None, cacheable_prefix=None):
+    """
+    Chama a IA pedindo JSON, respeitando os limites do provedor (concorrência, requisições
+    e tokens por minuto) e repetindo com backoff quando a API responde 429.
+
+    Returns:
+        dict: Resposta JSON da IA ou {'error': mensagem}
+    """
+    try:
+        return dispatch_ai_call(ai_provider, estimate_tokens(prompt), request_json, ai_provider, api_key, prompt,
+                                model=model, cacheable_prefix=cacheable_prefix)
+    except Exception as e:
+        return {"error": f"Erro ao chamar a IA: {str(e)}"}
+
+
+def stream_json(ai_provider, api_key, prompt, keys, on_item, model=None, cacheable_prefix=None):
+    """
+    Como call_json, mas em streaming: on_item(lista, item) é chamado para cada item
+    das listas `keys` da resposta (ex: 'dados', 'seletores') assim que ele fica completo.
+
+    Returns:
+        dict: Resposta JSON completa da IA ou {'error': mensagem}
+    """
+    unavailable = _unavailable_error(ai_provider)
+    if unavailable:
+        return unavailable
+    parser = JsonArrayStream(keys)
+    try:
+        for chunk in dispatch_ai_stream(ai_provider, estimate_tokens(prompt), stream_chunks,
+                                        ai_provider, api_key, prompt, model=model, json_mode=True,
+                                        cacheable_prefix=cacheable_prefix):
+            for key, item in parser.feed(chunk):
+                on_item(key, item)
+    except Exception as e:
+        return {"error": f"Erro ao chamar a IA: {str(e)}"}
+    if not parser.text.strip():
+        return {"error": f"Resposta vazia da API {_PROVIDER_NAMES[ai_provider]}"}
+    return parse_json_response(parser.text)
+
+
+def call_text(ai_provider, api_key, prompt, model=None):
+    """
+    Chama a IA e devolve o texto livre da resposta (com os mesmos limites de call_json).
+
+    Raises:
+        Exception: Erros do SDK/provedor (quem chama decide se tenta outro provedor)
+    """
+    return dispatch_ai_call(ai_provider, estimate_tokens(prompt), complete, ai_provider, api_key, prompt, model=model)
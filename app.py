@@ -1,49 +1,51 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup, Comment
+from bs4 import BeautifulSoup
 import pandas as pd
 import json
 import os
 import re
+import time
 from io import StringIO
 from lxml import html as lxml_html
 from lxml import etree
 from urllib.parse import quote_plus
+from fetch_engine import fetch_concurrently, DEFAULT_MAX_WORKERS, DEFAULT_MAX_PER_HOST
+from pipeline import stream_pipeline, store_page, load_page
+from job_checkpoints import JobCheckpoint, list_checkpoints, prune_finished_checkpoints
+from job_runner import (
+    new_job_id, job_registry, JOB_POLL_SECONDS, FINISHED_STATUSES, STATUS_PAUSED, STATUS_STOPPED, STATUS_ERROR
+)
+from page_fingerprint import structural_fingerprint, page_domain, page_signature, cluster_signatures
+from selector_cache import selector_cache, get_cached_selectors, store_selectors, forget_selectors
+from ai_cache import ai_cache, ai_response_key, get_cached_response, store_response
+from html_reducer import clean_html, reduce_html_for_ai, token_budget_for
+from ai_dispatcher import iter_concurrent, limiter_for
+from ai_providers import (
+    LOCAL_AI_PROVIDER, AI_MODELS, available_providers, call_json, stream_json
+)
+from ai_batch import (
+    AI_BATCH_POLL_SECONDS, BATCH_RUNNING, BATCH_FAILED,
+    supports_batch, submit_batch, poll_batch, fetch_batch_results, discard_batch, local_ai_response
+)
+from http_client import configure_session, cached_get_text, response_cache
+from result_store import (
+    ResultWriter, write_results, has_results, load_results, export_results_csv, export_results_parquet, prune_results
+)
+from scraping_tasks import (
+    get_secret, load_page_with_browser, load_scraping_tasks, add_scraping_task, delete_scraping_task,
+    load_scraping_history, count_scraping_history, run_scraping_task, RUN_SCHEDULED, TASK_RESULTS_PREFIX
+)
+from change_detection import has_changes, change_rows, task_identity_field
+from html_document import ParsedDocument, element_text, element_html
+from extraction_engine import (
+    extract_element_value, compile_selector_plan, ensure_plan, extract_document, SelectorPlan,
+    extract_batch, batch_page, build_preview, build_rows, build_summary_row,
+    DEFAULT_EXTRACT_PROCESSES, PROCESS_POOL_MIN_PAGES
+)
 
 # Requests-HTML removido - não funciona com Streamlit threading
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-try:
-    from anthropic import Anthropic
-    ANTHROPIC_AVAILABLE = True
-except ImportError:
-    ANTHROPIC_AVAILABLE = False
-
-try:
-    from google import genai
-    from google.genai import types
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-
-# 🔑 GERENCIAMENTO SIMPLIFICADO DE API KEYS
-def get_secret(key_name, default=None):
-    """
-    Obtém secret de forma compatível com Replit e Streamlit Cloud
-    Tenta st.secrets primeiro (Streamlit Cloud), depois os.environ (Replit)
-    """
-    try:
-        # Streamlit Cloud: usa st.secrets
-        return st.secrets.get(key_name, default)
-    except:
-        # Replit: usa variáveis de ambiente
-        return os.environ.get(key_name, default)
-
+# 🔑 GERENCIAMENTO SIMPLIFICADO DE API KEYS (get_secret fica em scraping_tasks, usado também pelo agendador)
 def get_api_key(key_name):
     """
     Obtém API key (wrapper para compatibilidade)
@@ -388,50 +390,71 @@ def clean_html_for_ai(html_content):
     - Tags inúteis (noscript, iframe embed externos)
     
     Economia estimada: 50-80% de tokens
+    
+    Returns:
+        dict: {'html': HTML limpo, 'bytes_in': tamanho original, 'bytes_out': tamanho limpo}
     """
-    try:
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        # Remover scripts, styles, noscript
-        for tag in soup(['script', 'style', 'noscript']):
-            tag.decompose()
-        
-        # Remover comentários HTML (bs4.element.Comment)
-        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
-            comment.extract()
-        
-        # Remover iframes externos (mantém vídeos do YouTube, etc que podem ter info)
-        for iframe in soup.find_all('iframe'):
-            src = iframe.get('src', '')
-            # Manter só iframes de vídeo conhecidos
-            if not any(domain in src for domain in ['youtube.com', 'vimeo.com', 'dailymotion.com']):
-                iframe.decompose()
-        
-        # Remover atributos de eventos e outros inúteis
-        # MANTÉM: href, src, alt, class, id, data-*, aria-*, title, name, value, type, placeholder
-        for tag in soup.find_all(True):
-            attrs_to_remove = []
-            for attr in tag.attrs:
-                # Remover eventos (onclick, onload, etc.)
-                if attr.startswith('on'):
-                    attrs_to_remove.append(attr)
-                # Remover atributos de estilo inline
-                elif attr == 'style':
-                    attrs_to_remove.append(attr)
-                # Remover tracking e analytics
-                elif attr in ['data-gtm', 'data-analytics', 'data-track']:
-                    attrs_to_remove.append(attr)
-            
-            for attr in attrs_to_remove:
-                del tag[attr]
-        
-        return str(soup)
+    # Passada única na árvore lxml (ver html_reducer.clean_html); em erro, devolve o HTML original
+    return clean_html(html_content)
+
+def html_stats_caption(html_stats):
+    """Legenda com o tamanho do HTML antes/depois da limpeza e os tokens enviados à IA"""
+    return (
+        f"🧹 HTML enviado à IA: {html_stats['bytes_in'] / 1024:,.0f} KB → "
+        f"{html_stats['bytes_out'] / 1024:,.0f} KB limpo → ~{html_stats['tokens_out']:,} tokens"
+    )
+
+def ai_stream_preview(placeholder):
+    """
+    Callback on_item para run_ai_request: redesenha em `placeholder` (st.empty) a tabela
+    com os seletores/dados recebidos até agora, enquanto a IA ainda está respondendo.
+    """
+    rows = []
     
-    except Exception as e:
-        # Se der erro na limpeza, retorna HTML original
-        return html_content
+    def on_item(key, item):
+        if not isinstance(item, dict):
+            return
+        if key == 'dados':
+            valor = item.get('valor', '')
+            if isinstance(valor, list):
+                valor = ', '.join(str(v) for v in valor[:5]) + ('...' if len(valor) > 5 else '')
+            rows.append({
+                'Status': "✅" if item.get('encontrado', False) else "❌",
+                'Campo': item.get('campo', 'Campo'),
+                'Valor': str(valor)[:200]
+            })
+        else:
+            rows.append({
+                'Campo': item.get('descricao', ''),
+                'Tipo': item.get('tipo', 'css'),
+                'Seletor': item.get('seletor', '')
+            })
+        placeholder.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    
+    return on_item
+
+def _with_html_stats(result, html_stats):
+    """Anexa ao resultado da IA as estatísticas do HTML enviado"""
+    if isinstance(result, dict):
+        result['html_stats'] = html_stats
+    return result
+
+def _ai_response(result, html_stats, cache_key):
+    """Grava a resposta da IA no cache de respostas e anexa as estatísticas do HTML enviado"""
+    store_response(cache_key, result)
+    if isinstance(result, dict):
+        result['response_cache_hit'] = False
+    return _with_html_stats(result, html_stats)
 
-def fetch_html(url, extraction_method='python', timeout=10):
+def _cached_ai_response(cache_key, html_stats):
+    """Resposta já recebida da IA para o mesmo provedor/modelo/HTML/pedido (ou None)"""
+    cached = get_cached_response(cache_key)
+    if cached is None:
+        return None
+    cached['response_cache_hit'] = True
+    return _with_html_stats(cached, html_stats)
+
+def fetch_html(url, extraction_method='python', timeout=10, force_refresh=False):
     """
     Função helper para fazer request e baixar HTML de uma URL
     
@@ -439,6 +462,7 @@ def fetch_html(url, extraction_method='python', timeout=10):
         url: URL para fazer scraping
         extraction_method: 'python' ou 'proxy' - método de extração do HTML
         timeout: Timeout para requisição
+        force_refresh: True para ignorar o cache em disco e baixar a página novamente
     
     Returns:
         dict: {'url': url, 'html_content': html, 'status': 'success'/'error', 'error': None/mensagem}
@@ -463,9 +487,10 @@ def fetch_html(url, extraction_method='python', timeout=10):
                     'mature_content': '1'
                 }
             
-            response = requests.get(proxy_url, headers=headers, cookies=cookies, timeout=timeout)
-            response.raise_for_status()
-            html_content = response.text
+            html_content = cached_get_text(
+                url, method='proxy', request_url=proxy_url, headers=headers, cookies=cookies,
+                timeout=timeout, force_refresh=force_refresh
+            )
         else:
             # Usar Python direto
             headers = {
@@ -483,9 +508,10 @@ def fetch_html(url, extraction_method='python', timeout=10):
                     'mature_content': '1'
                 }
             
-            response = requests.get(url, headers=headers, cookies=cookies, timeout=timeout)
-            response.raise_for_status()
-            html_content = response.text
+            html_content = cached_get_text(
+                url, method='python', headers=headers, cookies=cookies,
+                timeout=timeout, force_refresh=force_refresh
+            )
         
         return {
             'url': url,
@@ -501,33 +527,134 @@ def fetch_html(url, extraction_method='python', timeout=10):
             'error': str(e)
         }
 
-def load_urls(urls, extraction_method='python', timeout=10):
+def load_urls(urls, extraction_method='python', timeout=10, max_workers=DEFAULT_MAX_WORKERS,
+              max_per_host=DEFAULT_MAX_PER_HOST, on_result=None, force_refresh=False):
     """
-    Carrega múltiplas URLs e retorna status de cada uma
+    Carrega múltiplas URLs em paralelo e retorna status de cada uma
     
     Args:
         urls: Lista de URLs para carregar
         extraction_method: 'python' ou 'proxy'
         timeout: Timeout para cada requisição
+        max_workers: Máximo de downloads simultâneos no total
+        max_per_host: Máximo de downloads simultâneos no mesmo host
+        on_result: Callback opcional on_result(done, total, result) para progresso
+        force_refresh: True para ignorar o cache em disco
     
     Returns:
-        list: Lista de dicts com url, html_content, status, error
+        list: Lista de dicts com url, html_content, status, error (na ordem de entrada)
+    """
+    return fetch_concurrently(
+        urls,
+        lambda url: fetch_html(url, extraction_method, timeout, force_refresh=force_refresh),
+        max_workers=max_workers,
+        max_per_host=max_per_host,
+        on_result=on_result
+    )
+
+def load_urls_to_store(urls, extraction_method='python', timeout=10, max_workers=DEFAULT_MAX_WORKERS,
+                       max_per_host=DEFAULT_MAX_PER_HOST, on_result=None, force_refresh=False):
     """
-    results = []
-    for url in urls:
-        result = fetch_html(url, extraction_method, timeout)
-        results.append(result)
+    Carrega múltiplas URLs em streaming guardando o HTML comprimido em disco.
+    Na sessão fica só a referência, então a memória não cresce com o número de URLs.
+    
+    Cada página também ganha uma assinatura estrutural, e as páginas são agrupadas
+    por template ('template': índice do grupo) para a IA analisar uma página por grupo.
+    
+    Args:
+        (mesmos de load_urls)
+    
+    Returns:
+        list: Lista de dicts com url, html_ref, size, signature, template, status, error (na ordem de entrada)
+    """
+    def _store(fetch_result):
+        loaded = {
+            'url': fetch_result['url'],
+            'html_ref': None,
+            'size': 0,
+            'signature': None,
+            'template': None,
+            'status': fetch_result['status'],
+            'error': fetch_result['error']
+        }
+        if fetch_result['status'] == 'success':
+            loaded['html_ref'] = store_page(fetch_result['url'], fetch_result['html_content'], extraction_method)
+            loaded['size'] = len(fetch_result['html_content'])
+            try:
+                loaded['signature'] = page_signature(fetch_result['html_content'])
+            except Exception:
+                pass  # página que o lxml não consegue analisar fica sem template
+        return loaded
+    
+    results = [None] * len(urls)
+    for done, (idx, loaded) in enumerate(stream_pipeline(
+        urls,
+        lambda url: fetch_html(url, extraction_method, timeout, force_refresh=force_refresh),
+        _store,
+        max_workers=max_workers,
+        max_per_host=max_per_host
+    ), start=1):
+        results[idx] = loaded
+        if on_result:
+            on_result(done, len(urls), loaded)
+    
+    # Agrupar páginas parecidas (SimHash + MinHash do esqueleto) em templates
+    for loaded, template in zip(results, cluster_signatures([loaded['signature'] for loaded in results])):
+        loaded['template'] = template
     return results
 
-def apply_selectors_to_url(url, seletores, timeout=10, extraction_method='python'):
+def get_loaded_html(loaded_url, extraction_method='python', timeout=10):
+    """
+    Recupera o HTML de uma URL carregada por load_urls_to_store.
+    Se a cópia em disco já foi removida, baixa a página de novo.
+    
+    Returns:
+        str: HTML da página
+    
+    Raises:
+        Exception: Se não for possível obter o HTML
+    """
+    html_content = load_page(loaded_url.get('html_ref')) or loaded_url.get('html_content')
+    if html_content:
+        return html_content
+    fetch_result = fetch_html(loaded_url['url'], extraction_method, timeout)
+    if fetch_result['status'] == 'error':
+        raise Exception(fetch_result['error'])
+    return fetch_result['html_content']
+
+def extract_fetched_page(fetch_result, seletores):
+    """
+    Aplica os seletores em uma página já baixada (resultado de fetch_html).
+    Só os dados extraídos são retornados; o HTML é descartado.
+    
+    Returns:
+        dict: Mesmo formato de apply_selectors_to_url
+    """
+    url = fetch_result['url']
+    if fetch_result['status'] == 'error':
+        return {'url': url, 'data_preview': None, 'data_full': None, 'error': fetch_result['error']}
+    try:
+        # Aplicar os seletores com o motor de extração unificado
+        extracted = extract_document(fetch_result['html_content'], ensure_plan(seletores))
+        data_preview = build_preview(extracted)
+        
+        # data_full: cada linha representa um conjunto de valores alinhados por índice
+        data_full = build_rows(extracted)
+        
+        return {'url': url, 'data_preview': data_preview, 'data_full': data_full, 'error': None}
+    except Exception as e:
+        return {'url': url, 'data_preview': None, 'data_full': None, 'error': str(e)}
+
+def apply_selectors_to_url(url, seletores, timeout=10, extraction_method='python', force_refresh=False):
     """
     Aplica seletores identificados pela IA em uma URL específica
     
     Args:
         url: URL para fazer scraping
-        seletores: Lista de seletores identificados pela IA
+        seletores: Lista de seletores identificados pela IA (ou SelectorPlan já compilado)
         timeout: Timeout para requisição
         extraction_method: 'python' ou 'proxy' - método de extração do HTML
+        force_refresh: True para ignorar o cache em disco
     
     Returns:
         dict: {
@@ -539,84 +666,58 @@ def apply_selectors_to_url(url, seletores, timeout=10, extraction_method='python
     """
     try:
         # Baixar HTML usando fetch_html
-        fetch_result = fetch_html(url, extraction_method, timeout)
-        
-        if fetch_result['status'] == 'error':
-            return {'url': url, 'data_preview': None, 'data_full': None, 'error': fetch_result['error']}
-        
-        html_content = fetch_result['html_content']
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        data_preview = []
-        all_valores = {}  # {descricao: [valores]}
-        
-        for sel in seletores:
-            seletor = sel.get('seletor', '')
-            tipo = sel.get('tipo', 'css')
-            descricao = sel.get('descricao', 'Campo')
-            
-            try:
-                extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
-                
-                if tipo == 'css':
-                    elements = soup.select(seletor)
-                    valores = []
-                    for elem in elements:
-                        valor = extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html)
-                        if valor:
-                            valores.append(valor)
-                elif tipo == 'xpath':
-                    tree = lxml_html.fromstring(html_content)
-                    elements = tree.xpath(seletor)
-                    is_xpath_attr = isinstance(elements[0], str) if elements else False
-                    valores = []
-                    for elem in elements:
-                        valor = extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)
-                        if valor:
-                            valores.append(valor)
-                else:
-                    valores = []
-                
-                # Armazenar valores para estruturação posterior
-                all_valores[descricao] = valores
-                
-                # Preview: resumo para exibição na tela
-                if valores:
-                    data_preview.append({
-                        'Campo': descricao,
-                        'Valor': valores[0] if len(valores) == 1 else ', '.join(str(v)[:100] for v in valores[:3]) + ('...' if len(valores) > 3 else ''),
-                        'Total Encontrado': len(valores)
-                    })
-                else:
-                    data_preview.append({
-                        'Campo': descricao,
-                        'Valor': 'Nenhum resultado',
-                        'Total Encontrado': 0
-                    })
-            except Exception as e:
-                all_valores[descricao] = []
-                data_preview.append({
-                    'Campo': descricao,
-                    'Valor': f'Erro: {str(e)}',
-                    'Total Encontrado': 0
-                })
-        
-        # Estruturar data_full: criar linhas com todos os campos
-        # Cada linha representa um conjunto de valores alinhados por índice
-        data_full = []
-        if all_valores:
-            max_len = max(len(v) for v in all_valores.values())
-            for i in range(max_len):
-                row = {}
-                for descricao, valores in all_valores.items():
-                    row[descricao] = valores[i] if i < len(valores) else ''
-                data_full.append(row)
-        
-        return {'url': url, 'data_preview': data_preview, 'data_full': data_full, 'error': None}
+        fetch_result = fetch_html(url, extraction_method, timeout, force_refresh=force_refresh)
+        return extract_fetched_page(fetch_result, seletores)
     except Exception as e:
         return {'url': url, 'data_preview': None, 'data_full': None, 'error': str(e)}
 
-def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extraction_method='python'):
+def identify_selectors_cached(html_content, url, user_query, ai_provider, api_key):
+    """
+    Identifica seletores com IA reaproveitando os de páginas do mesmo template.
+    
+    A chave do cache é domínio + impressão digital estrutural da página + pedido.
+    Seletores em cache que não encontram nada nesta página são descartados e a IA
+    é chamada de novo (o template pode ter mudado).
+    
+    Args:
+        html_content: HTML da página
+        url: URL da página (o domínio faz parte da chave)
+        user_query: Descrição do que extrair
+        ai_provider: Provedor de IA
+        api_key: API key do provedor
+    
+    Returns:
+        tuple: (resultado da IA com 'cache_hit', dados extraídos com extract_document ou None em caso de erro)
+    """
+    doc = ParsedDocument(html_content)
+    domain = page_domain(url)
+    fingerprint = structural_fingerprint(doc)
+    
+    cached = get_cached_selectors(domain, fingerprint, user_query)
+    if cached:
+        extracted = extract_document(doc, compile_selector_plan(seletores=cached['seletores']))
+        if any(extracted['valores'].values()):
+            cached['cache_hit'] = True
+            return cached, extracted
+        forget_selectors(domain, fingerprint, user_query)
+    
+    ai_result = extract_with_ai(html_content, user_query, ai_provider, api_key)
+    if "error" in ai_result:
+        return ai_result, None
+    
+    extracted = extract_document(doc, compile_selector_plan(seletores=ai_result.get('seletores', [])))
+    if any(extracted['valores'].values()):
+        store_selectors(domain, fingerprint, user_query, ai_result, source_url=url)
+    ai_result['cache_hit'] = False
+    return ai_result, extracted
+
+def cached_selectors_explanation(ai_result):
+    """Explicação exibida para a URL (indica quando os seletores vieram do cache de template)"""
+    if ai_result.get('cache_hit'):
+        return f"♻️ Seletores reaproveitados de outra página do mesmo template (sem chamada à IA). {ai_result.get('explicacao', '')}"
+    return ai_result.get('explicacao', '')
+
+def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extraction_method='python', force_refresh=False):
     """
     Analisa uma URL individualmente com IA e extrai os dados
     
@@ -627,6 +728,7 @@ def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extracti
         api_key: API key do provedor
         timeout: Timeout para requisição
         extraction_method: 'python' ou 'proxy' - método de extração do HTML
+        force_refresh: True para ignorar o cache em disco
     
     Returns:
         dict: {
@@ -639,7 +741,7 @@ def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extracti
     """
     try:
         # 1. Baixar HTML usando fetch_html
-        fetch_result = fetch_html(url, extraction_method, timeout)
+        fetch_result = fetch_html(url, extraction_method, timeout, force_refresh=force_refresh)
         
         if fetch_result['status'] == 'error':
             return {
@@ -652,8 +754,8 @@ def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extracti
         
         html_content = fetch_result['html_content']
         
-        # 2. Chamar IA para identificar seletores
-        ai_result = extract_with_ai(html_content, user_query, ai_provider, api_key)
+        # 2. Chamar IA para identificar seletores (ou reaproveitar os do mesmo template)
+        ai_result, extracted = identify_selectors_cached(html_content, url, user_query, ai_provider, api_key)
         
         if "error" in ai_result:
             return {
@@ -664,76 +766,15 @@ def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extracti
                 'error': f"Erro na IA: {ai_result['error']}"
             }
         
-        # 3. Extrair dados usando os seletores identificados
-        soup = BeautifulSoup(html_content, 'lxml')
-        
-        data_preview = []
-        all_valores = {}
-        
-        for sel in ai_result.get('seletores', []):
-            seletor = sel.get('seletor', '')
-            tipo = sel.get('tipo', 'css')
-            descricao = sel.get('descricao', 'Campo')
-            
-            try:
-                extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
-                
-                if tipo == 'css':
-                    elements = soup.select(seletor)
-                    valores = []
-                    for elem in elements:
-                        valor = extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html)
-                        if valor:
-                            valores.append(valor)
-                elif tipo == 'xpath':
-                    tree = lxml_html.fromstring(html_content)
-                    elements = tree.xpath(seletor)
-                    is_xpath_attr = isinstance(elements[0], str) if elements else False
-                    valores = []
-                    for elem in elements:
-                        valor = extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)
-                        if valor:
-                            valores.append(valor)
-                else:
-                    valores = []
-                
-                all_valores[descricao] = valores
-                
-                if valores:
-                    data_preview.append({
-                        'Campo': descricao,
-                        'Valor': valores[0] if len(valores) == 1 else ', '.join(str(v)[:100] for v in valores[:3]) + ('...' if len(valores) > 3 else ''),
-                        'Total Encontrado': len(valores)
-                    })
-                else:
-                    data_preview.append({
-                        'Campo': descricao,
-                        'Valor': 'Nenhum resultado',
-                        'Total Encontrado': 0
-                    })
-            except Exception as e:
-                all_valores[descricao] = []
-                data_preview.append({
-                    'Campo': descricao,
-                    'Valor': f'Erro: {str(e)}',
-                    'Total Encontrado': 0
-                })
-        
-        # Estruturar data_full
-        data_full = []
-        if all_valores:
-            max_len = max(len(v) for v in all_valores.values())
-            for i in range(max_len):
-                row = {}
-                for descricao, valores in all_valores.items():
-                    row[descricao] = valores[i] if i < len(valores) else ''
-                data_full.append(row)
+        # 3. Dados extraídos com os seletores identificados
+        data_preview = build_preview(extracted)
+        data_full = build_rows(extracted)
         
         return {
             'url': url,
             'data_preview': data_preview,
             'data_full': data_full,
-            'ai_explanation': ai_result.get('explicacao', ''),
+            'ai_explanation': cached_selectors_explanation(ai_result),
             'error': None
         }
     except Exception as e:
@@ -745,343 +786,696 @@ def apply_ai_per_url(url, user_query, ai_provider, api_key, timeout=10, extracti
             'error': str(e)
         }
 
-# 🔧 FUNÇÃO UNIFICADA DE EXTRAÇÃO (usada em todas as abas)
-def extract_element_value(elem, selector, tipo='css', is_xpath_attr=False, extrair_html=False):
+# 🧵 JOBS EM SEGUNDO PLANO (rodam fora dos reruns do Streamlit - ver job_runner.py)
+# Scraping em Massa processa as URLs em lotes: memória limitada e checkpoint a cada lote
+BULK_CHUNK_SIZE = 200
+
+def _bulk_page_rows(identifier, html_content, fetch_error, extracted, page_error, manual_config, use_ai_selectors):
     """
-    Função unificada para extrair valores de elementos HTML de forma inteligente.
-    Usada por todas as abas para garantir consistência.
+    Linhas de uma página do Scraping em Massa.
+    
+    Returns:
+        tuple: (linhas, nível do erro ou None, mensagem de erro ou None)
+    """
+    if fetch_error:
+        return [], 'error', f"❌ Falha ao baixar {identifier[:80]}: {fetch_error}"
+    
+    # VALIDAÇÃO: Verificar se o HTML foi obtido com sucesso
+    if not html_content or len(html_content.strip()) == 0:
+        return [], 'error', f"❌ {identifier}: HTML vazio ou inválido"
+    
+    if extracted is not None or page_error:
+        # Resultado do lote (plano compilado uma vez) - uma linha por URL
+        if page_error:
+            return [], 'warning', f"⚠️ Erro ao processar {identifier[:80]}: {page_error}"
+        # Seletores da IA: campo vazio em caso de erro; Método Universal: mostrar o erro
+        return [build_summary_row(
+            identifier,
+            extracted,
+            error_template=None if use_ai_selectors else "ERRO: {}"
+        )], None, None
+    
+    method = manual_config.get('method')
+    doc = ParsedDocument(html_content)
+    if method == "Seletor CSS":
+        elements = doc.select(manual_config['selector'])
+    elif method == "XPath":
+        elements = doc.xpath(manual_config['selector'])
+    elif method == "Tag HTML":
+        elements = doc.soup.find_all(manual_config['selector'])
+    else:
+        elements = doc.soup.find_all(class_=manual_config['selector'])
+    attr_name = manual_config.get('attr_name') if manual_config.get('extract_attrs') else None
+    rows = []
+    for elem_idx, elem in enumerate(elements, 1):
+        row = {
+            'Fonte': identifier,
+            '#': elem_idx
+        }
+        if method == "XPath":
+            if isinstance(elem, str):
+                row['Valor'] = elem
+            elif hasattr(elem, 'text_content'):
+                if manual_config.get('extract_text'):
+                    row['Texto'] = elem.text_content().strip()
+                if attr_name:
+                    row[attr_name] = elem.get(attr_name, '')
+            else:
+                row['Valor'] = str(elem)
+        else:
+            if manual_config.get('extract_text'):
+                row['Texto'] = element_text(elem)
+            if attr_name:
+                row[attr_name] = elem.get(attr_name, '')
+        rows.append(row)
+    return rows, None, None
+
+def run_bulk_scraping_job(job, urls_list, uploaded_items, selector_plan, manual_config, use_ai_selectors,
+                          max_workers=DEFAULT_MAX_WORKERS, max_per_host=DEFAULT_MAX_PER_HOST,
+                          processes=1, force_refresh=False, checkpoint=None):
+    """
+    Scraping em Massa executado como job em segundo plano.
     
     Args:
-        elem: Elemento BeautifulSoup ou lxml
-        selector: O seletor usado (para detecção automática)
-        tipo: 'css' ou 'xpath'
-        is_xpath_attr: True se for atributo XPath (ex: /@src)
-        extrair_html: True para forçar extração de HTML completo
+        job: Job (progresso, mensagens e controle de pausa/parada)
+        urls_list: URLs para baixar (ignoradas se houver uploaded_items)
+        uploaded_items: Lista de (nome do arquivo, html) enviados pelo usuário
+        selector_plan: SelectorPlan compilado (seletores da IA / Método Universal) ou None
+        manual_config: Dict com method, selector, extract_text, extract_attrs, attr_name (métodos manuais)
+        use_ai_selectors: True se os seletores vieram da IA
+        max_workers, max_per_host: Limites de download paralelo
+        processes: Processos para a extração em lote
+        force_refresh: True para ignorar o cache em disco
+        checkpoint: JobCheckpoint opcional; fontes já concluídas nele são puladas
     
     Returns:
-        str: Valor extraído (texto, atributo ou HTML)
+        list: Linhas extraídas (uma por URL com plano de seletores, uma por elemento nos métodos manuais)
     """
+    all_data = []
+    job.partial_result = all_data
+    sources = [name for name, _ in uploaded_items] if uploaded_items else list(urls_list)
+    total = len(sources)
+    # Linhas gravadas em Parquet conforme são extraídas (job retomado regrava tudo)
+    writer = ResultWriter(job.id)
+    
+    # Retomada: reaproveitar as fontes concluídas (as que falharam são tentadas de novo)
+    progress = checkpoint.load_progress() if checkpoint else {}
+    pending = []
+    for idx in range(total):
+        entry = progress.get(idx)
+        if entry and not entry.get('error'):
+            all_data.extend(entry.get('data') or [])
+            writer.add(entry.get('data') or [])
+        else:
+            pending.append(idx)
+    done = total - len(pending)
+    if done:
+        job.log('info', f"♻️ Retomando: {done} fonte(s) já concluída(s) no checkpoint")
+    job.update(done=done, total=total)
+    
     try:
-        # 1. Se for atributo XPath (string), retornar direto
-        if is_xpath_attr and isinstance(elem, str):
-            return elem
-        
-        # 2. Detectar automaticamente o tipo de extração baseado no seletor
-        selector_lower = selector.lower() if selector else ''
-        
-        # Detectar se o seletor pede atributos específicos
-        wants_src = '/@src' in selector or 'src' in selector_lower
-        wants_href = '/@href' in selector or 'href' in selector_lower
-        wants_img = 'img' in selector_lower or wants_src
-        
-        # 3. CSS: Extrair de forma inteligente
-        if tipo == 'css' and hasattr(elem, 'name'):
-            # Se for tag IMG ou seletor pede SRC
-            if elem.name == 'img' or wants_img:
-                src = elem.get('src', '') or elem.get('data-src', '')
-                if src:
-                    return src
-            
-            # Se for tag A ou seletor pede HREF
-            if elem.name == 'a' or wants_href:
-                href = elem.get('href', '')
-                if href:
-                    return href
-            
-            # Se deve extrair HTML completo (descrições com imagens/GIFs)
-            if extrair_html:
-                return str(elem)
-            
-            # Extração padrão de texto
-            return elem.get_text(strip=True)
-        
-        # 4. XPath: Extrair de forma inteligente
-        elif tipo == 'xpath':
-            # Se deve extrair HTML completo
-            if extrair_html and hasattr(elem, 'tag'):
-                return lxml_html.tostring(elem, encoding='unicode')
-            
-            # Extração padrão de texto
-            if hasattr(elem, 'text_content'):
-                return elem.text_content().strip()
+        for chunk_start in range(0, len(pending), BULK_CHUNK_SIZE):
+            chunk = pending[chunk_start:chunk_start + BULK_CHUNK_SIZE]
+            job.checkpoint()
+            
+            # Processar URLs ou arquivos HTML
+            if uploaded_items:
+                chunk_items = [(uploaded_items[idx][0], uploaded_items[idx][1], None) for idx in chunk]
             else:
-                return str(elem)
-        
-        # 5. Fallback padrão
-        if tipo == 'css':
-            return elem.get_text(strip=True) if hasattr(elem, 'get_text') else str(elem)
-        else:
-            return elem.text_content().strip() if hasattr(elem, 'text_content') else str(elem)
+                # Baixar as URLs do lote em paralelo antes da extração
+                def _on_bulk_url_loaded(loaded, total_urls, result):
+                    job.update(message=f"Baixando {done + loaded}/{total}: {result['url']}")
+                    job.checkpoint()
+                
+                fetched_pages = load_urls(
+                    [urls_list[idx] for idx in chunk],
+                    'python',
+                    timeout=10,
+                    max_workers=max_workers,
+                    max_per_host=max_per_host,
+                    on_result=_on_bulk_url_loaded,
+                    force_refresh=force_refresh
+                )
+                chunk_items = [(page['url'], page['html_content'], page['error']) for page in fetched_pages]
             
-    except Exception as e:
-        # Em caso de erro, retornar string vazia ao invés de gerar exceção
-        return ''
-
-# 🤖 GERENCIAMENTO DE SCRAPING AUTOMÁTICO
-SCRAPING_TASKS_FILE = "scraping_tasks.json"
-SCRAPING_HISTORY_FILE = "scraping_history.json"
+            # Com plano de seletores: extrair o lote de uma vez (API em lote, colunar)
+            batch = None
+            if selector_plan is not None:
+                def _on_page_extracted(extracted_count, total_pages):
+                    job.update(message=f"Extraindo {done + extracted_count}/{total}...")
+                    job.checkpoint()
+                
+                batch = extract_batch(
+                    [(identifier, html_content if not fetch_error and html_content and html_content.strip() else None)
+                     for identifier, html_content, fetch_error in chunk_items],
+                    selector_plan,
+                    on_result=_on_page_extracted,
+                    processes=processes
+                )
+            
+            for pos, (idx, (identifier, html_content, fetch_error)) in enumerate(zip(chunk, chunk_items)):
+                job.update(message=f"Processando {done + 1}/{total}: {identifier}")
+                try:
+                    rows, level, error = _bulk_page_rows(
+                        identifier, html_content, fetch_error,
+                        batch_page(batch, pos) if batch is not None else None,
+                        batch['page_errors'][pos] if batch is not None else None,
+                        manual_config, use_ai_selectors
+                    )
+                except Exception as e:
+                    rows, level, error = [], 'warning', f"⚠️ Erro ao processar {identifier[:80]}: {str(e)}"
+                if error:
+                    job.log(level, error)
+                all_data.extend(rows)
+                writer.add(rows)
+                if checkpoint:
+                    checkpoint.record(idx, identifier, data=rows, error=error)
+                done += 1
+                job.update(done=done)
+        
+    finally:
+        # Também quando o job é parado: o que já foi extraído fica gravado
+        writer.close()
+    
+    job.update(done=total, message=f"{len(all_data)} elemento(s) extraído(s) de {total} fonte(s)")
+    return all_data
 
-def load_scraping_tasks():
-    """Carrega tarefas de scraping automático"""
-    try:
-        if os.path.exists(SCRAPING_TASKS_FILE):
-            with open(SCRAPING_TASKS_FILE, 'r') as f:
-                return json.load(f)
-        return []
-    except:
-        return []
-
-def save_scraping_tasks(tasks):
-    """Salva tarefas de scraping automático"""
-    try:
-        with open(SCRAPING_TASKS_FILE, 'w') as f:
-            json.dump(tasks, f, indent=2)
-        return True
-    except:
-        return False
-
-def add_scraping_task(task_config):
-    """Adiciona nova tarefa de scraping automático"""
-    import uuid
-    tasks = load_scraping_tasks()
-    task_config['id'] = str(uuid.uuid4())[:8]  # UUID único e curto
-    task_config['created_at'] = pd.Timestamp.now().isoformat()
-    task_config['enabled'] = True
-    tasks.append(task_config)
-    return save_scraping_tasks(tasks)
-
-def load_scraping_history():
-    """Carrega histórico de execuções"""
-    try:
-        if os.path.exists(SCRAPING_HISTORY_FILE):
-            with open(SCRAPING_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        return []
-    except:
-        return []
-
-def save_scraping_history(history):
-    """Salva histórico de execuções"""
-    try:
-        with open(SCRAPING_HISTORY_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
-        return True
-    except:
-        return False
-
-def execute_scraping_task(task):
-    """Executa uma tarefa de scraping"""
+def _multi_url_ai_result(loaded_url, extraction_mode, user_query, ai_provider, api_key, extraction_method,
+                         template_selectors=None):
+    """
+    Processa uma URL do Multi-URL com IA (resultado no formato de multi_url_results).
+    
+    Args:
+        template_selectors: Dict {template: {'ai_result', 'plan'}} compartilhado entre as URLs do job;
+                            no modo identify_selectors, a IA só é chamada na primeira página de cada template
+    """
+    if loaded_url['status'] == 'error':
+        return {
+            'url': loaded_url['url'],
+            'data_preview': None,
+            'data_full': None,
+            'error': loaded_url['error']
+        }
+    
+    # HTML vem do disco só agora (a sessão guarda apenas a referência)
     try:
-        # 1. Buscar produtos na fonte
-        st.info(f"🔍 Carregando página: {task['source_url']}")
-        html_content = load_page_with_browser(task['source_url'])
-        
-        if html_content.startswith('ERROR:'):
-            return {'success': False, 'error': html_content}
-        
-        soup = BeautifulSoup(html_content, 'lxml')
+        page_html = get_loaded_html(loaded_url, extraction_method)
+    except Exception as e:
+        return {'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'error': str(e)}
+    
+    if extraction_mode == "identify_selectors":
+        template = loaded_url.get('template')
+        known = template_selectors.get(template) if template_selectors is not None and template is not None else None
+        extracted = None
+        if known:
+            # Seletores já identificados para outra página do mesmo grupo
+            extracted = extract_document(page_html, known['plan'])
+            if any(extracted['valores'].values()):
+                ai_result = known['ai_result']
+                explanation = f"🧩 Seletores do template {template + 1} (identificados uma vez para o grupo). {ai_result.get('explicacao', '')}"
+            else:
+                extracted = None
         
-        # 2. Extrair lançamentos usando IA
-        st.info(f"🤖 Identificando lançamentos usando IA...")
+        if extracted is None:
+            # Identificar seletores para essa URL (ou reaproveitar os do mesmo template em cache)
+            ai_result, extracted = identify_selectors_cached(page_html, loaded_url['url'], user_query, ai_provider, api_key)
+            
+            if "error" in ai_result:
+                return {'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'error': ai_result['error']}
+            
+            explanation = cached_selectors_explanation(ai_result)
+            if template_selectors is not None and template is not None and template not in template_selectors \
+                    and any(extracted['valores'].values()):
+                template_selectors[template] = {
+                    'ai_result': ai_result,
+                    'plan': compile_selector_plan(seletores=ai_result.get('seletores', []))
+                }
         
-        # Preparar prompt para IA identificar produtos
-        ai_prompt = f"""Analise este HTML de uma página de lançamentos e identifique os seletores CSS para extrair:
-{', '.join(task['fields'])}
+        return {
+            'url': loaded_url['url'], 
+            'data_preview': build_preview(extracted), 
+            'data_full': build_rows(extracted), 
+            'ai_explanation': explanation,
+            'error': None
+        }
+    
+    # extract_direct: extração direta para essa URL
+    direct_result = extract_data_directly_with_ai(page_html, user_query, ai_provider, api_key)
+    
+    if "error" in direct_result:
+        return {'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'ai_explanation': None, 'error': direct_result['error']}
+    
+    # Converter resultado direto para formato de preview
+    data_preview = []
+    data_full = []
+    for item in direct_result.get('dados', []):
+        data_preview.append({
+            'Campo': item['campo'],
+            'Valor': str(item['valor'])[:200],
+            'Encontrado': '✅' if item['encontrado'] else '❌'
+        })
+        data_full.append({
+            item['campo']: item['valor']
+        })
+    
+    return {
+        'url': loaded_url['url'], 
+        'data_preview': data_preview, 
+        'data_full': data_full,
+        'ai_explanation': direct_result.get('resumo', ''),
+        'error': None
+    }
 
-HTML (primeiros 5000 caracteres):
-{html_content[:5000]}
+def _template_leaders(loaded_urls, indices):
+    """Primeira URL de cada template (e todas as sem template) entre `indices`"""
+    leaders, seen_templates = [], set()
+    for idx in indices:
+        template = loaded_urls[idx].get('template')
+        if template is None or template not in seen_templates:
+            leaders.append(idx)
+            seen_templates.add(template)
+    return leaders
 
-Retorne APENAS um JSON com este formato:
-{{"selectors": [{{"field": "nome_campo", "selector": "seletor_css", "type": "text/attribute/html"}}]}}"""
+def _wait_for_batch(job, seconds):
+    """Espera entre consultas ao lote sem travar a pausa/parada do job"""
+    deadline = time.time() + seconds
+    while True:
+        job.checkpoint()
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        time.sleep(min(1.0, remaining))
 
-        # Usar API disponível (prioridade: Gemini > OpenAI > Claude)
-        ai_response = None
-        gemini_key = get_api_key('GEMINI_API_KEY')
-        openai_key = get_api_key('OPENAI_API_KEY')
-        anthropic_key = get_api_key('ANTHROPIC_API_KEY')
-        
-        if gemini_key:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=gemini_key)
-                model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                response = model.generate_content(ai_prompt)
-                ai_response = response.text
-            except:
-                pass
-        
-        if not ai_response and openai_key:
+def run_ai_batch_phase(job, loaded_urls, indices, extraction_mode, user_query, ai_provider, api_key,
+                       extraction_method, results, checkpoint=None):
+    """
+    Modo lote: envia os prompts das URLs `indices` num lote do provedor (Batch API),
+    espera o lote terminar e grava as respostas no cache de respostas da IA - o
+    processamento normal das páginas as encontra prontas, sem chamada interativa.
+    
+    O lote enviado fica no checkpoint: ao retomar o job, ele volta a consultar o
+    mesmo lote em vez de enviar (e pagar) de novo.
+    
+    Returns:
+        int: URLs finalizadas com erro nesta etapa (pedido que falhou dentro do lote)
+    """
+    build_request = build_selector_request if extraction_mode == "identify_selectors" else build_direct_extraction_request
+    batch = (checkpoint.load_meta() or {}).get('ai_batch') if checkpoint else None
+    
+    if batch:
+        job.log('info', f"📦 Retomando o lote {batch['id']} já enviado")
+    else:
+        batch_requests = []
+        for idx in indices:
+            job.checkpoint()
+            loaded_url = loaded_urls[idx]
+            if loaded_url['status'] == 'error':
+                continue
             try:
-                from openai import OpenAI
-                client = OpenAI(api_key=openai_key)
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": ai_prompt}]
-                )
-                ai_response = response.choices[0].message.content
-            except:
-                pass
-        
-        if not ai_response:
-            return {'success': False, 'error': 'Nenhuma API de IA disponível'}
-        
-        # Parse resposta IA
-        import re
-        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
-        if json_match:
-            selectors_data = json.loads(json_match.group())
-            selectors = selectors_data.get('selectors', [])
-        else:
-            return {'success': False, 'error': 'Erro ao parsear resposta da IA'}
-        
-        # 3. Extrair dados usando seletores identificados
-        # Extrair cada campo separadamente
-        all_fields = {}
-        max_items = 0
-        
-        for selector_info in selectors:
-            field_name = selector_info['field']
-            selector = selector_info['selector']
-            elements = soup.select(selector)
-            
-            values = []
-            for elem in elements:
-                if selector_info['type'] == 'attribute':
-                    attr_name = selector.split('@')[-1] if '@' in selector else 'href'
-                    values.append(elem.get(attr_name, ''))
-                else:
-                    values.append(elem.get_text(strip=True))
-            
-            all_fields[field_name] = values
-            max_items = max(max_items, len(values))
-        
-        # Alinhar produtos: cada produto pega valores do mesmo índice
-        products = []
-        for i in range(max_items):
-            product = {}
-            for field_name, values in all_fields.items():
-                product[field_name] = values[i] if i < len(values) else ''
-            products.append(product)
-        
-        # 4. Buscar produtos no site alvo (se configurado)
-        if task.get('target_site'):
-            st.info(f"🔎 Buscando produtos em {task['target_site']}...")
-            # Esta parte será implementada na próxima iteração
-        
-        return {
-            'success': True,
-            'products': products,
-            'total': len(products)
+                page_html = get_loaded_html(loaded_url, extraction_method)
+            except Exception:
+                continue  # o processamento normal da página registra o erro
+            request = build_request(page_html, user_query, ai_provider)
+            if get_cached_response(request['cache_key']) is not None:
+                continue
+            request['custom_id'] = f"url-{idx}"
+            batch_requests.append(request)
+        if not batch_requests:
+            return 0
+        
+        job.update(message=f"📦 Enviando lote com {len(batch_requests)} pedido(s) para {ai_provider}...")
+        batch_id = submit_batch(ai_provider, api_key, AI_MODELS.get(ai_provider), batch_requests)
+        batch = {
+            'id': batch_id,
+            'custom_ids': [request['custom_id'] for request in batch_requests],
+            'cache_keys': {request['custom_id']: request['cache_key'] for request in batch_requests}
         }
-        
-    except Exception as e:
-        return {'success': False, 'error': str(e)}
+        if checkpoint:
+            checkpoint.update_meta(ai_batch=batch)
+        job.log('info', f"📦 Lote {batch_id} enviado com {len(batch_requests)} pedido(s)")
+    
+    while True:
+        job.checkpoint()
+        status = poll_batch(ai_provider, api_key, batch['id'])
+        counts = f" ({status['done']}/{status['total']})" if status.get('total') else ''
+        job.update(message=f"📦 Lote {batch['id']}: {status['message']}{counts}")
+        if status['status'] != BATCH_RUNNING:
+            break
+        _wait_for_batch(job, AI_BATCH_POLL_SECONDS)
+    
+    if status['status'] == BATCH_FAILED:
+        if checkpoint:
+            checkpoint.update_meta(ai_batch=None)
+        discard_batch(ai_provider, batch['id'])
+        raise RuntimeError(f"O lote {batch['id']} falhou no provedor ({status['message']})")
+    
+    batch_results = fetch_batch_results(ai_provider, api_key, batch['id'], batch['custom_ids'])
+    failed = 0
+    for custom_id, cache_key in batch['cache_keys'].items():
+        response = batch_results.get(custom_id, {'error': 'Pedido sem resposta no lote'})
+        if isinstance(response, dict) and 'error' in response:
+            idx = int(custom_id.split('-', 1)[1])
+            results[idx] = {'url': loaded_urls[idx]['url'], 'data_preview': None, 'data_full': None, 'error': response['error']}
+            if checkpoint:
+                checkpoint.record(idx, loaded_urls[idx]['url'], data=results[idx], error=response['error'])
+            failed += 1
+        else:
+            store_response(cache_key, response)
+    
+    # Só agora o lote sai do checkpoint: se o download ou a gravação falharem (ou o app cair),
+    # o job retomado busca as respostas do mesmo lote em vez de enviar (e pagar) outro
+    if checkpoint:
+        checkpoint.update_meta(ai_batch=None)
+    discard_batch(ai_provider, batch['id'])
+    job.log('info', f"📦 Lote {batch['id']} concluído: {len(batch['cache_keys']) - failed} resposta(s), {failed} erro(s)")
+    return failed
 
-def send_email_notification(task, result):
-    """Envia email com resultados do scraping"""
+def multi_url_rows(results):
+    """Linhas de todas as URLs processadas (coluna URL + campos extraídos), como no download combinado"""
+    rows = []
+    for result in results:
+        if result and result.get('data_full') and not result.get('error'):
+            for item in result['data_full']:
+                row = {'URL': result['url']}
+                row.update(item)
+                rows.append(row)
+    return rows
+
+def run_multi_url_ai_job(job, loaded_urls, extraction_mode, user_query, ai_provider, api_key,
+                         extraction_method='python', checkpoint=None, use_batch=False):
+    """
+    Processamento Multi-URL com IA executado como job em segundo plano.
+    
+    Args:
+        job: Job (progresso, mensagens e controle de pausa/parada)
+        loaded_urls: URLs carregadas na ETAPA 1 (dicts de load_urls_to_store)
+        extraction_mode: 'identify_selectors' ou 'extract_direct'
+        user_query: Descrição do que extrair
+        ai_provider: Provedor de IA
+        api_key: API key do provedor
+        extraction_method: 'python' ou 'proxy'
+        checkpoint: JobCheckpoint opcional; URLs já concluídas nele não chamam a IA de novo
+        use_batch: Modo lote - as chamadas à IA vão num lote do provedor (mais barato, mais lento)
+    
+    Returns:
+        list: Resultados por URL ({'url', 'data_preview', 'data_full', 'ai_explanation', 'error'})
+    """
+    total = len(loaded_urls)
+    results = [None] * total
+    job.partial_result = results
+    
+    # Retomada: resultados já pagos ficam; URLs com erro são tentadas de novo
+    progress = checkpoint.load_progress() if checkpoint else {}
+    for idx, entry in progress.items():
+        if idx < total and not entry.get('error') and entry.get('data'):
+            results[idx] = entry['data']
+    done = sum(1 for result in results if result is not None)
+    if done:
+        job.log('info', f"♻️ Retomando: {done} URL(s) já processada(s) no checkpoint")
+    job.update(done=done, total=total)
+    
     try:
-        email_config = task.get('smtp_config')
-        provider = task.get('email_provider', 'SMTP Customizado')
-        
-        # Preparar conteúdo do email
-        subject = f"🤖 Scraping Automático: {task['name']}"
-        
-        if result['success']:
-            body = f"""
-            <h2>Scraping Concluído!</h2>
-            <p><strong>Tarefa:</strong> {task['name']}</p>
-            <p><strong>Total de produtos encontrados:</strong> {result['total']}</p>
-            <p><strong>Data:</strong> {pd.Timestamp.now().strftime('%d/%m/%Y %H:%M')}</p>
-            
-            <h3>Produtos Encontrados:</h3>
-            <ul>
-            """
-            
-            for product in result.get('products', [])[:10]:  # Limitar a 10 produtos
-                body += f"<li>{product}</li>"
-            
-            body += "</ul>"
+        # Seletores por template: a IA analisa uma página de cada grupo e o resto reaproveita
+        template_selectors = {}
+        
+        pending = [idx for idx in range(total) if results[idx] is None]
+        if use_batch and supports_batch(ai_provider) and pending:
+            # Respostas do lote entram no cache de respostas; as rodadas abaixo as encontram prontas
+            batch_indices = _template_leaders(loaded_urls, pending) if extraction_mode == "identify_selectors" else pending
+            done += run_ai_batch_phase(job, loaded_urls, batch_indices, extraction_mode, user_query, ai_provider,
+                                       api_key, extraction_method, results, checkpoint=checkpoint)
+            job.update(done=done)
+            pending = [idx for idx in pending if results[idx] is None]
+        
+        # Chamadas à IA em paralelo, dentro dos limites do provedor (concorrência, requisições/min, tokens/min)
+        if extraction_mode == "identify_selectors":
+            # 1ª rodada: uma página de cada template (e as sem template); 2ª rodada: o resto do grupo,
+            # que já encontra os seletores do template identificados
+            leaders = _template_leaders(loaded_urls, pending)
+            leader_set = set(leaders)
+            rounds = [leaders, [idx for idx in pending if idx not in leader_set]]
         else:
-            body = f"""
-            <h2>Erro no Scraping</h2>
-            <p><strong>Tarefa:</strong> {task['name']}</p>
-            <p><strong>Erro:</strong> {result['error']}</p>
-            """
-        
-        # Enviar email baseado no provedor
-        if provider == "SMTP Customizado" and email_config:
-            try:
-                import smtplib
-                from email.mime.text import MIMEText
-                from email.mime.multipart import MIMEMultipart
-                
-                msg = MIMEMultipart()
-                msg['From'] = email_config['user']
-                msg['To'] = task['recipient_email']
-                msg['Subject'] = subject
-                msg.attach(MIMEText(body, 'html'))
-                
-                server = smtplib.SMTP(email_config['server'], email_config['port'])
-                server.starttls()
-                server.login(email_config['user'], email_config['pass'])
-                server.send_message(msg)
-                server.quit()
-                return True
-            except Exception as e:
-                return f"Erro SMTP: {str(e)}"
-        elif provider in ["SendGrid", "Resend", "Gmail"]:
-            # Para integrations Replit, salvar resultado e avisar usuário
-            return f"⚠️ {provider}: Configure a integração no Replit para envio automático"
+            rounds = [pending]
+        
+        max_workers = limiter_for(ai_provider).concurrency
+        
+        def _process(idx):
+            return _multi_url_ai_result(loaded_urls[idx], extraction_mode, user_query, ai_provider, api_key,
+                                        extraction_method, template_selectors=template_selectors)
+        
+        for round_indices in rounds:
+            for position, result in iter_concurrent(round_indices, _process, max_workers, before_submit=job.checkpoint):
+                idx = round_indices[position]
+                loaded_url = loaded_urls[idx]
+                if 'url' not in result:
+                    # Falha inesperada fora das chamadas à IA
+                    result = {'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'error': result.get('error')}
+                results[idx] = result
+                if checkpoint:
+                    checkpoint.record(idx, loaded_url['url'], data=result, error=result.get('error'))
+                done += 1
+                job.update(done=done, message=f"Processado {done}/{total}: {loaded_url['url'][:50]}")
+    finally:
+        # Linhas de todas as URLs concluídas em Parquet (também quando o job é parado)
+        write_results(job.id, multi_url_rows(results))
+    
+    return [result for result in results if result is not None]
+
+def start_bulk_job(urls_list, uploaded_items, selector_plan, manual_config, use_ai_selectors,
+                   settings, owner=None, job_id=None, title=None):
+    """
+    Dispara o Scraping em Massa em segundo plano.
+    Listas de URLs ganham checkpoint em disco (arquivos enviados não: não há o que baixar de novo).
+    
+    Args:
+        settings: Dict com max_workers, max_per_host, processes, force_refresh
+        job_id: ID de um checkpoint existente para retomar (None = job novo)
+    
+    Returns:
+        str: ID do job
+    """
+    total = len(uploaded_items) if uploaded_items else len(urls_list)
+    title = title or f"Scraping em Massa: {total} fonte(s)"
+    checkpoint = None
+    if not uploaded_items:
+        if job_id:
+            checkpoint = JobCheckpoint(job_id)
+            checkpoint.set_status('running')
         else:
-            return "Provedor de email não configurado"
-            
-    except Exception as e:
-        return f"Erro ao enviar email: {str(e)}"
+            job_id = new_job_id()
+            checkpoint = JobCheckpoint.create(job_id, 'bulk', title, {
+                'urls': urls_list,
+                'selector_plan': selector_plan.to_spec() if selector_plan is not None else None,
+                'manual_config': manual_config,
+                'use_ai_selectors': use_ai_selectors,
+                'settings': settings
+            }, total, owner=owner)
+            prune_finished_checkpoints()
+            prune_results(keep_prefix=TASK_RESULTS_PREFIX)
+    return job_registry.submit(
+        'bulk',
+        title,
+        run_bulk_scraping_job,
+        urls_list,
+        uploaded_items,
+        selector_plan,
+        manual_config,
+        use_ai_selectors,
+        max_workers=settings.get('max_workers', DEFAULT_MAX_WORKERS),
+        max_per_host=settings.get('max_per_host', DEFAULT_MAX_PER_HOST),
+        processes=settings.get('processes', 1),
+        force_refresh=settings.get('force_refresh', False),
+        checkpoint=checkpoint,
+        owner=owner,
+        job_id=job_id,
+        on_finish=checkpoint.set_status if checkpoint else None
+    )
 
-def load_page_with_browser(url):
+def start_multi_url_ai_job(loaded_urls, extraction_mode, user_query, ai_provider, api_key,
+                           extraction_method='python', owner=None, job_id=None, title=None, use_batch=False):
     """
-    Carrega página usando proxy CORS direto no Python.
-    Contorna bloqueios que sites fazem ao Python puro.
+    Dispara o processamento Multi-URL com IA em segundo plano, com checkpoint em disco.
+    A API key não é gravada no checkpoint: ao retomar, usa a key atual da sessão.
+    
+    Args:
+        use_batch: Enviar as chamadas à IA num lote do provedor (Batch API)
+    
+    Returns:
+        str: ID do job
     """
-    try:
-        # Usar corsproxy.io para contornar bloqueios
-        proxy_url = f'https://corsproxy.io/?{url}'
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7'
-        }
-        
-        # Se for Steam, adicionar cookies de verificação de idade
-        cookies = {}
-        if 'steampowered.com' in url:
-            # Cookies para pular verificação de idade
-            cookies = {
-                'wants_mature_content': '1',
-                'birthtime': '631152000',
-                'lastagecheckage': '1-0-1990'
-            }
-        
-        response = requests.get(proxy_url, headers=headers, cookies=cookies, timeout=20)
-        response.raise_for_status()
-        
-        if len(response.text) < 100:
-            return 'ERROR:Resposta muito curta ou vazia'
-        
-        return response.text
-        
-    except requests.exceptions.Timeout:
-        return 'ERROR:Tempo esgotado ao carregar página'
-    except requests.exceptions.RequestException as e:
-        return f'ERROR:{str(e)}'
-    except Exception as e:
-        return f'ERROR:{str(e)}'
+    title = title or f"IA Multi-URL: {len(loaded_urls)} URL(s)"
+    if job_id:
+        checkpoint = JobCheckpoint(job_id)
+        checkpoint.set_status('running')
+    else:
+        job_id = new_job_id()
+        checkpoint = JobCheckpoint.create(job_id, 'multi_url_ai', title, {
+            'loaded_urls': loaded_urls,
+            'extraction_mode': extraction_mode,
+            'user_query': user_query,
+            'ai_provider': ai_provider,
+            'extraction_method': extraction_method,
+            'use_batch': use_batch
+        }, len(loaded_urls), owner=owner)
+        prune_finished_checkpoints()
+        prune_results(keep_prefix=TASK_RESULTS_PREFIX)
+    return job_registry.submit(
+        'multi_url_ai',
+        title,
+        run_multi_url_ai_job,
+        loaded_urls,
+        extraction_mode,
+        user_query,
+        ai_provider,
+        api_key,
+        extraction_method,
+        checkpoint=checkpoint,
+        use_batch=use_batch,
+        owner=owner,
+        job_id=job_id,
+        on_finish=checkpoint.set_status
+    )
+
+def resume_checkpoint_job(meta, api_key=None):
+    """
+    Retoma um job interrompido a partir do checkpoint gravado em disco.
+    
+    Args:
+        meta: Resumo do checkpoint (list_checkpoints)
+        api_key: API key atual (necessária para jobs de IA)
+    
+    Returns:
+        str: ID do job
+    """
+    params = meta['params']
+    if meta['kind'] == 'bulk':
+        plan_spec = params.get('selector_plan')
+        return start_bulk_job(
+            params['urls'],
+            None,
+            SelectorPlan.from_spec(plan_spec) if plan_spec else None,
+            params.get('manual_config') or {},
+            params.get('use_ai_selectors', False),
+            params.get('settings') or {},
+            owner=meta.get('owner'),
+            job_id=meta['id'],
+            title=meta.get('title')
+        )
+    return start_multi_url_ai_job(
+        params['loaded_urls'],
+        params['extraction_mode'],
+        params['user_query'],
+        params['ai_provider'],
+        api_key,
+        params.get('extraction_method', 'python'),
+        owner=meta.get('owner'),
+        job_id=meta['id'],
+        title=meta.get('title'),
+        use_batch=params.get('use_batch', False)
+    )
+
+def render_resumable_jobs(kind, api_key=None):
+    """
+    Lista os jobs interrompidos (app reiniciado, job parado...) com botões para retomar ou descartar.
+    
+    Args:
+        kind: 'bulk' ou 'multi_url_ai'
+        api_key: API key atual (para retomar jobs de IA)
+    
+    Returns:
+        str: ID do job retomado (ou None)
+    """
+    checkpoints = [
+        meta for meta in list_checkpoints(owner=st.session_state.get('user_name'), kind=kind)
+        if not job_registry.is_active(meta['id'])
+    ]
+    if not checkpoints:
+        return None
+    
+    with st.expander(f"♻️ Jobs interrompidos ({len(checkpoints)})", expanded=False):
+        for meta in checkpoints[:10]:
+            st.caption(
+                f"{meta['title']} · ✅ {meta['done']}/{meta['total']}"
+                + (f" · ❌ {meta['failed']} com erro" if meta['failed'] else "")
+                + (" · 📦 lote da IA em andamento" if meta.get('ai_batch') else "")
+            )
+            col_a, col_b = st.columns(2)
+            with col_a:
+                if st.button("▶️ Retomar", key=f"resume_checkpoint_{meta['id']}", use_container_width=True):
+                    if kind == 'multi_url_ai' and not api_key:
+                        st.warning("⚠️ Por favor, forneça uma API Key")
+                    else:
+                        return resume_checkpoint_job(meta, api_key=api_key)
+            with col_b:
+                if st.button("🗑️ Descartar", key=f"discard_checkpoint_{meta['id']}", use_container_width=True):
+                    JobCheckpoint(meta['id']).delete()
+                    st.rerun()
+    return None
+
+def _job_fragment(fn):
+    """Re-renderiza só o painel do job a cada JOB_POLL_SECONDS (se o Streamlit suportar st.fragment)"""
+    if hasattr(st, 'fragment'):
+        return st.fragment(run_every=JOB_POLL_SECONDS)(fn)
+    return fn
+
+@_job_fragment
+def render_job_panel(job_id):
+    """
+    Painel de acompanhamento de um job: progresso, controles e mensagens.
+    Quando o job termina, dispara um rerun completo para a página mostrar o resultado.
+    """
+    job = job_registry.snapshot(job_id)
+    if job is None:
+        return
+    
+    st.progress(min(job['progress'], 1.0), text=f"{job['status_label']} · {job['done']}/{job['total']}")
+    if job['message']:
+        st.caption(job['message'])
+    
+    if job['status'] in FINISHED_STATUSES:
+        # Página principal consome o resultado no próximo rerun
+        st.rerun()
+    
+    col_a, col_b, col_c = st.columns(3)
+    with col_a:
+        if job['status'] == STATUS_PAUSED:
+            if st.button("▶️ Retomar", key=f"resume_job_{job_id}", use_container_width=True):
+                job_registry.resume(job_id)
+                st.rerun()
+        elif st.button("⏸️ Pausar", key=f"pause_job_{job_id}", use_container_width=True):
+            job_registry.pause(job_id)
+            st.rerun()
+    with col_b:
+        if st.button("⏹️ Parar", key=f"stop_job_{job_id}", use_container_width=True):
+            job_registry.stop(job_id)
+            st.rerun()
+    with col_c:
+        if not hasattr(st, 'fragment'):
+            if st.button("🔄 Atualizar", key=f"refresh_job_{job_id}", use_container_width=True):
+                st.rerun()
+    
+    problems = [msg for msg in job['messages'] if msg['level'] in ('warning', 'error')]
+    if problems:
+        with st.expander(f"⚠️ {len(problems)} aviso(s)", expanded=False):
+            for msg in problems[-20:]:
+                st.caption(msg['message'])
+
+def get_session_document():
+    """
+    Retorna o ParsedDocument da página carregada no sidebar.
+    Reaproveitado entre abas e cliques: a árvore lxml é montada uma vez por página.
+    """
+    doc = st.session_state.get('parsed_doc')
+    if doc is None or doc.html_content is not st.session_state.html_content:
+        doc = ParsedDocument(st.session_state.html_content, soup=st.session_state.soup)
+        st.session_state.parsed_doc = doc
+    return doc
 
 def reset_single_extraction():
     """Limpa resultados de extração de página única"""
     st.session_state.ai_result = None
     st.session_state.ai_direct_result = None
+    st.session_state.ai_multi_result = None
 
 def reset_multi_url_extraction():
     """Limpa resultados de extração multi-URL"""
@@ -1089,22 +1483,30 @@ def reset_multi_url_extraction():
     st.session_state.loaded_urls = []
     st.session_state.selected_url_indices = []
 
-def extract_data_directly_with_ai(html_content, user_query, ai_provider, api_key):
+def build_direct_extraction_request(html_content, user_query, ai_provider):
     """
-    Usa IA para extrair dados DIRETAMENTE do HTML sem identificar seletores.
-    Mais rápido e barato - ideal para consultas únicas.
+    Monta o pedido de extração direta (HTML limpo e reduzido + prompt + chave do cache).
+    
+    Returns:
+        dict: {'kind', 'prompt', 'prompt_prefix', 'html', 'user_query', 'html_stats', 'cache_key'}
     """
     
     # Limpar HTML usando função inteligente (remove lixo, mantém conteúdo importante)
-    html_clean = clean_html_for_ai(html_content)
-    html_preview = html_clean[:200000] if len(html_clean) > 200000 else html_clean
+    cleaned = clean_html_for_ai(html_content)
+    
+    # Reduzir ao orçamento de tokens do provedor sem perder os itens pedidos (modo 'data')
+    reduced = reduce_html_for_ai(cleaned['html'], user_query, token_budget_for(ai_provider), mode='data')
+    html_preview = reduced['html']
+    html_stats = {'bytes_in': cleaned['bytes_in'], 'bytes_out': cleaned['bytes_out'], 'tokens_out': reduced['tokens_out']}
     
-    prompt = f"""Você é um especialista em extração de dados web. Analise o HTML e extraia DIRETAMENTE os dados solicitados.
+    # Instruções + HTML primeiro: prefixo igual entre pedidos sobre a mesma página (cacheável)
+    prefix = f"""Você é um especialista em extração de dados web. Analise o HTML e extraia DIRETAMENTE os dados solicitados.
 
 HTML da página (limpo):
 {html_preview}
 
-Solicitação do usuário:
+"""
+    prompt = prefix + f"""Solicitação do usuário:
 {user_query}
 
 IMPORTANTE:
@@ -1128,75 +1530,63 @@ Formato de resposta JSON:
 
 Retorne APENAS o JSON válido, sem markdown ou texto adicional."""
 
-    try:
-        if ai_provider == "OpenAI (ChatGPT)":
-            if not OPENAI_AVAILABLE:
-                return {"error": "OpenAI não está disponível"}
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model="gpt-5",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
-        
-        elif ai_provider == "Anthropic (Claude)":
-            if not ANTHROPIC_AVAILABLE:
-                return {"error": "Anthropic não está disponível"}
-            client = Anthropic(api_key=api_key)
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            content_text = ""
-            for block in response.content:
-                if hasattr(block, 'text'):
-                    content_text += block.text
-            if not content_text.strip():
-                return {"error": "Resposta vazia da API Anthropic"}
-            return json.loads(content_text)
-        
-        elif ai_provider == "Google (Gemini)":
-            if not GEMINI_AVAILABLE:
-                return {"error": "Gemini não está disponível"}
-            client = genai.Client(api_key=api_key)
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            return json.loads(response.text)
-        
-        else:
-            return {"error": f"Provedor de IA não reconhecido: {ai_provider}"}
-        
-    except Exception as e:
-        return {"error": f"Erro ao chamar a IA: {str(e)}"}
+    return {
+        'kind': 'data',
+        'prompt': prompt,
+        'prompt_prefix': prefix,
+        'html': html_preview,
+        'user_query': user_query,
+        'html_stats': html_stats,
+        'cache_key': ai_response_key('data', ai_provider, AI_MODELS.get(ai_provider), html_preview, user_query)
+    }
 
-def extract_with_ai(html_content, user_query, ai_provider, api_key):
-    """
-    Usa IA para identificar seletores CSS/XPath baseado na descrição do usuário.
-    Referência: blueprint:python_openai, blueprint:python_anthropic, blueprint:python_gemini
+# Lista da resposta mostrada linha a linha durante o streaming, por tipo de pedido
+AI_STREAM_KEYS = {'selectors': ('seletores',), 'data': ('dados',)}
+
+def run_ai_request(request, ai_provider, api_key, on_item=None):
     """
+    Executa um pedido montado por build_*_request: devolve a resposta do cache se a mesma
+    página e o mesmo pedido já foram analisados; senão chama a IA e grava a resposta.
     
-    # Limpar HTML usando função inteligente (remove lixo, mantém conteúdo importante)
-    html_clean = clean_html_for_ai(html_content)
-    
-    # Limitar a 200k caracteres (muito generoso, cobre páginas grandes)
-    html_preview = html_clean[:200000] if len(html_clean) > 200000 else html_clean
+    Args:
+        on_item: Callback opcional on_item(lista, item) - com ele a resposta vem em streaming
+                 e cada seletor/dado é entregue assim que chega (resposta do cache não chama)
+    """
+    cached = _cached_ai_response(request['cache_key'], request['html_stats'])
+    if cached is not None:
+        return cached
     
-    prompt = f"""Você é um especialista em web scraping. Analise o HTML LIMPO (sem scripts/CSS) e identifique seletores CSS/XPath para CADA campo solicitado pelo usuário.
+    if ai_provider == LOCAL_AI_PROVIDER:
+        result = local_ai_response(request['kind'], request['html'], request['user_query'])
+    elif on_item and request['kind'] in AI_STREAM_KEYS:
+        result = stream_json(ai_provider, api_key, request['prompt'], AI_STREAM_KEYS[request['kind']], on_item,
+                             cacheable_prefix=request.get('prompt_prefix'))
+    else:
+        result = call_json(ai_provider, api_key, request['prompt'], cacheable_prefix=request.get('prompt_prefix'))
+    if isinstance(result, dict) and "error" in result:
+        return result
+    return _ai_response(result, request['html_stats'], request['cache_key'])
 
-HTML da página (limpo, até 200k caracteres):
+def extract_data_directly_with_ai(html_content, user_query, ai_provider, api_key, on_item=None):
+    """
+    Usa IA para extrair dados DIRETAMENTE do HTML sem identificar seletores.
+    Mais rápido e barato - ideal para consultas únicas.
+    """
+    return run_ai_request(build_direct_extraction_request(html_content, user_query, ai_provider), ai_provider, api_key, on_item=on_item)
+
+def _selector_prompt_prefix(html_preview):
+    """
+    Início do prompt de seletores: instruções + HTML. Não depende do pedido do usuário,
+    então se repete entre perguntas sobre a mesma página (prefixo cacheável no provedor).
+    """
+    return f"""Você é um especialista em web scraping. Analise o HTML LIMPO (sem scripts/CSS) e identifique seletores CSS/XPath para CADA campo solicitado pelo usuário.
+
+HTML da página (limpo e reduzido; comentários indicam elementos repetidos ou blocos omitidos):
 {html_preview}
 
-Solicitação do usuário:
-{user_query}
+"""
 
-REGRAS IMPORTANTES:
+SELECTOR_PROMPT_RULES = """REGRAS IMPORTANTES:
 1. Retorne um seletor para CADA campo mencionado pelo usuário
 2. Se o usuário pede "título, preço, descrição, imagens", retorne 4 seletores (um para cada)
 3. Se um campo não for encontrado, inclua mesmo assim com seletor vazio e explique
@@ -1208,73 +1598,166 @@ REGRAS IMPORTANTES:
    - Retorne o seletor do CONTAINER (div que contém tudo)
    - Exemplo: "#game_area_description" (pega texto E imagens dentro)
    - NÃO retorne só o texto - retorne o container completo
-6. Seja COMPLETO - não omita campos pedidos
+6. Seja COMPLETO - não omita campos pedidos"""
 
-Formato de resposta JSON:
-{{
-    "seletores": [
-        {{
+SELECTOR_PROMPT_ITEM = """{
             "tipo": "css" ou "xpath",
             "seletor": "o seletor completo (ou vazio se não encontrado)",
             "descricao": "nome exato do campo (ex: 'Título', 'Preço', 'Descrição completa com imagens')",
             "exemplo_resultado": "exemplo real do HTML ou 'Não encontrado'"
-        }}
+        }"""
+
+def _reduced_selector_html(html_content, user_query, ai_provider):
+    """HTML limpo e reduzido ao orçamento do provedor + estatísticas (pedidos de seletores)"""
+    
+    # Limpar HTML usando função inteligente (remove lixo, mantém conteúdo importante)
+    cleaned = clean_html_for_ai(html_content)
+    
+    # Reduzir ao orçamento de tokens do provedor: itens repetidos viram poucos exemplos,
+    # textos longos são encurtados e os blocos sem relação com o pedido saem primeiro
+    reduced = reduce_html_for_ai(cleaned['html'], user_query, token_budget_for(ai_provider), mode='selectors')
+    html_stats = {'bytes_in': cleaned['bytes_in'], 'bytes_out': cleaned['bytes_out'], 'tokens_out': reduced['tokens_out']}
+    return reduced['html'], html_stats
+
+def build_selector_request(html_content, user_query, ai_provider):
+    """
+    Monta o pedido de identificação de seletores (HTML limpo e reduzido + prompt + chave do cache).
+    
+    Returns:
+        dict: {'kind', 'prompt', 'prompt_prefix', 'html', 'user_query', 'html_stats', 'cache_key'}
+    """
+    html_preview, html_stats = _reduced_selector_html(html_content, user_query, ai_provider)
+    prefix = _selector_prompt_prefix(html_preview)
+    
+    prompt = prefix + f"""Solicitação do usuário:
+{user_query}
+
+{SELECTOR_PROMPT_RULES}
+
+Formato de resposta JSON:
+{{
+    "seletores": [
+        {SELECTOR_PROMPT_ITEM}
     ],
     "explicacao": "resumo de quantos campos foram encontrados vs solicitados"
 }}
 
 Retorne APENAS o JSON válido, sem markdown ou texto adicional."""
 
-    try:
-        if ai_provider == "OpenAI (ChatGPT)":
-            if not OPENAI_AVAILABLE:
-                return {"error": "OpenAI não está disponível"}
-            client = OpenAI(api_key=api_key)
-            # O modelo mais recente da OpenAI é o gpt-5, lançado em 7 de agosto de 2025
-            # Não altere isso a menos que explicitamente solicitado pelo usuário
-            response = client.chat.completions.create(
-                model="gpt-5",
-                messages=[{"role": "user", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            return json.loads(response.choices[0].message.content)
-        
-        elif ai_provider == "Anthropic (Claude)":
-            if not ANTHROPIC_AVAILABLE:
-                return {"error": "Anthropic não está disponível"}
-            client = Anthropic(api_key=api_key)
-            # O modelo mais recente da Anthropic é claude-sonnet-4-20250514
-            # Não altere isso a menos que explicitamente solicitado pelo usuário
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            content_text = ""
-            for block in response.content:
-                if hasattr(block, 'text'):
-                    content_text += block.text
-            if not content_text.strip():
-                return {"error": "Resposta vazia da API Anthropic"}
-            return json.loads(content_text)
-        
-        elif ai_provider == "Google (Gemini)":
-            if not GEMINI_AVAILABLE:
-                return {"error": "Gemini não está disponível"}
-            client = genai.Client(api_key=api_key)
-            # O modelo mais recente da Google é gemini-2.5-flash
-            # Não altere isso a menos que explicitamente solicitado pelo usuário
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    response_mime_type="application/json"
-                )
-            )
-            return json.loads(response.text)
-        
-    except Exception as e:
-        return {"error": f"Erro ao chamar a IA: {str(e)}"}
+    return {
+        'kind': 'selectors',
+        'prompt': prompt,
+        'prompt_prefix': prefix,
+        'html': html_preview,
+        'user_query': user_query,
+        'html_stats': html_stats,
+        'cache_key': ai_response_key('selectors', ai_provider, AI_MODELS.get(ai_provider), html_preview, user_query)
+    }
+
+def extract_with_ai(html_content, user_query, ai_provider, api_key, on_item=None):
+    """
+    Usa IA para identificar seletores CSS/XPath baseado na descrição do usuário.
+    Referência: blueprint:python_openai, blueprint:python_anthropic, blueprint:python_gemini
+    """
+    return run_ai_request(build_selector_request(html_content, user_query, ai_provider), ai_provider, api_key, on_item=on_item)
+
+def parse_named_queries(text):
+    """
+    Separa o texto do usuário em perguntas nomeadas: uma por linha, no formato
+    "nome: pergunta" ou só "pergunta" (vira "Pergunta N").
+    
+    Returns:
+        dict: {nome: pergunta}, na ordem do texto
+    """
+    queries = {}
+    for line in (text or '').splitlines():
+        line = line.strip().lstrip('-•*').strip()
+        if not line:
+            continue
+        match = re.match(r'^([\w][\w \-]{0,39}):\s+(.+)$', line)
+        name, query = (match.group(1).strip(), match.group(2).strip()) if match else (f"Pergunta {len(queries) + 1}", line)
+        # Nomes repetidos (sem diferenciar maiúsculas) ganham sufixo
+        base_name, suffix = name, 2
+        while name.lower() in (existing.lower() for existing in queries):
+            name = f"{base_name} ({suffix})"
+            suffix += 1
+        queries[name] = query
+    return queries
+
+def build_multi_selector_request(html_content, queries, ai_provider):
+    """
+    Monta UM pedido de seletores para várias perguntas sobre a mesma página:
+    o HTML vai uma vez só e a IA responde os seletores de cada pergunta pelo nome.
+    
+    Args:
+        queries: dict {nome: pergunta} (ver parse_named_queries)
+    
+    Returns:
+        dict: Mesmo formato de build_selector_request, com kind 'multi_selectors'
+    """
+    html_preview, html_stats = _reduced_selector_html(html_content, ' '.join(queries.values()), ai_provider)
+    prefix = _selector_prompt_prefix(html_preview)
+    questions = '\n'.join(f'- "{name}": {query}' for name, query in queries.items())
+    
+    prompt = prefix + f"""Perguntas do usuário (responda CADA uma separadamente, usando o nome entre aspas):
+{questions}
+
+{SELECTOR_PROMPT_RULES}
+(as regras valem para cada pergunta)
+
+Formato de resposta JSON:
+{{
+    "respostas": {{
+        "nome da pergunta": {{
+            "seletores": [
+                {SELECTOR_PROMPT_ITEM}
+            ],
+            "explicacao": "resumo de quantos campos foram encontrados vs solicitados nesta pergunta"
+        }}
+    }}
+}}
+
+Inclua TODAS as perguntas em "respostas". Retorne APENAS o JSON válido, sem markdown ou texto adicional."""
+
+    return {
+        'kind': 'multi_selectors',
+        'prompt': prompt,
+        'prompt_prefix': prefix,
+        'html': html_preview,
+        'user_query': queries,
+        'html_stats': html_stats,
+        'cache_key': ai_response_key(
+            'multi_selectors', ai_provider, AI_MODELS.get(ai_provider), html_preview,
+            json.dumps(list(queries.items()), ensure_ascii=False)
+        )
+    }
+
+def extract_multi_with_ai(html_content, queries, ai_provider, api_key):
+    """
+    Identifica seletores para várias perguntas sobre a mesma página numa única chamada à IA,
+    em vez de reenviar o HTML inteiro a cada pergunta.
+    
+    Args:
+        queries: dict {nome: pergunta}
+    
+    Returns:
+        dict: {'respostas': {nome: {'seletores', 'explicacao'} ou {'error'}}, 'html_stats', ...}
+              ou {'error': mensagem}
+    """
+    result = run_ai_request(build_multi_selector_request(html_content, queries, ai_provider), ai_provider, api_key)
+    if "error" in result:
+        return result
+    respostas = result.get('respostas') if isinstance(result.get('respostas'), dict) else {}
+    # O cache normaliza maiúsculas do pedido: casar os nomes sem diferenciar maiúsculas
+    by_name = {str(name).lower(): answer for name, answer in respostas.items()}
+    result['respostas'] = {}
+    for name in queries:
+        answer = by_name.get(name.lower())
+        if isinstance(answer, dict) and isinstance(answer.get('seletores'), list):
+            result['respostas'][name] = answer
+        else:
+            result['respostas'][name] = {'error': 'A IA não respondeu a esta pergunta'}
+    return result
 
 st.set_page_config(
     page_title="Web Scraper Intuitivo",
@@ -1371,6 +1854,91 @@ with st.sidebar:
     # Salvar em session_state para uso em Multi-URL e outras funções
     st.session_state.extraction_method = 'proxy' if loading_method == "🌐 Proxy CORS" else 'python'
     
+    with st.expander("⚡ Paralelismo", expanded=False):
+        st.session_state.fetch_max_workers = st.number_input(
+            "Downloads simultâneos (total)",
+            min_value=1, max_value=64, value=DEFAULT_MAX_WORKERS,
+            help="Quantas páginas são baixadas ao mesmo tempo no Multi-URL e no Scraping em Massa"
+        )
+        st.session_state.fetch_max_per_host = st.number_input(
+            "Downloads simultâneos por site",
+            min_value=1, max_value=16, value=DEFAULT_MAX_PER_HOST,
+            help="Limite por domínio para não sobrecarregar o mesmo site"
+        )
+        st.session_state.http_pool_maxsize = st.number_input(
+            "Conexões keep-alive por site",
+            min_value=1, max_value=64, value=max(8, DEFAULT_MAX_PER_HOST),
+            help="Tamanho do pool de conexões reaproveitadas por domínio (evita novo handshake TLS a cada página)"
+        )
+        st.session_state.http_max_retries = st.number_input(
+            "Tentativas extras (429/5xx/conexão)",
+            min_value=0, max_value=10, value=2
+        )
+        st.session_state.extract_processes = st.number_input(
+            "Processos de extração",
+            min_value=1, max_value=64, value=DEFAULT_EXTRACT_PROCESSES,
+            help=f"Lotes com {PROCESS_POOL_MIN_PAGES}+ páginas são analisados em vários núcleos da CPU ao mesmo tempo (1 = desativado)"
+        )
+    
+    # Aplicar configuração na sessão HTTP compartilhada (só recria se mudou)
+    configure_session(
+        pool_maxsize=st.session_state.http_pool_maxsize,
+        max_retries=st.session_state.http_max_retries
+    )
+    
+    # Cache de páginas em disco (revalidado com ETag/Last-Modified)
+    st.session_state.force_refresh = st.checkbox(
+        "🔄 Forçar atualização (ignorar cache)",
+        value=False,
+        help="Baixa as páginas novamente em vez de reaproveitar a cópia salva em disco"
+    )
+    cache_stats = response_cache.stats()
+    if cache_stats['entries']:
+        col_cache1, col_cache2 = st.columns([3, 2])
+        with col_cache1:
+            st.caption(f"💾 Cache: {cache_stats['entries']} página(s), {cache_stats['bytes'] / 1024 / 1024:.1f} MB")
+        with col_cache2:
+            if st.button("🧹 Limpar", key="clear_http_cache", use_container_width=True):
+                response_cache.clear()
+                st.rerun()
+    
+    # Seletores da IA reaproveitados entre páginas do mesmo template
+    selector_cache_stats = selector_cache.stats()
+    if selector_cache_stats['entries']:
+        col_sel1, col_sel2 = st.columns([3, 2])
+        with col_sel1:
+            st.caption(f"🧩 Templates conhecidos: {selector_cache_stats['entries']}")
+        with col_sel2:
+            if st.button("🧹 Limpar", key="clear_selector_cache", use_container_width=True):
+                selector_cache.clear()
+                st.rerun()
+    
+    # Respostas da IA já recebidas (mesma página + mesmo pedido não paga a API de novo)
+    ai_cache_stats = ai_cache.stats()
+    if ai_cache_stats['entries']:
+        col_ai1, col_ai2 = st.columns([3, 2])
+        with col_ai1:
+            st.caption(f"🤖 Respostas da IA em cache: {ai_cache_stats['entries']}")
+        with col_ai2:
+            if st.button("🧹 Limpar", key="clear_ai_cache", use_container_width=True):
+                ai_cache.clear()
+                st.rerun()
+    
+    # Jobs em segundo plano (vários podem rodar ao mesmo tempo)
+    user_jobs = job_registry.list(owner=st.session_state.get('user_name'))
+    if user_jobs:
+        with st.expander(f"🧵 Jobs em segundo plano ({len(user_jobs)})", expanded=job_registry.has_active(owner=st.session_state.get('user_name'))):
+            for job in user_jobs[:10]:
+                st.caption(f"{job['status_label']} · {job['title']} · {job['done']}/{job['total']}")
+                if job['status'] not in FINISHED_STATUSES:
+                    if st.button("⏹️ Parar", key=f"sidebar_stop_job_{job['id']}", use_container_width=True):
+                        job_registry.stop(job['id'])
+                        st.rerun()
+            if st.button("🧹 Remover finalizados", key="clear_finished_jobs", use_container_width=True):
+                for job in user_jobs:
+                    job_registry.remove(job['id'])
+                st.rerun()
+    
     st.divider()
     
     # Opção de carregar HTML ou fazer upload
@@ -1430,11 +1998,13 @@ with st.sidebar:
                                     'lastagecheckage': '1-0-1990'
                                 }
                             
-                            response = requests.get(url, headers=headers, cookies=cookies, timeout=10)
-                            response.raise_for_status()
+                            html_content = cached_get_text(
+                                url, method='python', headers=headers, cookies=cookies, timeout=10,
+                                force_refresh=st.session_state.get('force_refresh', False)
+                            )
                             
-                            st.session_state.html_content = response.text
-                            st.session_state.soup = BeautifulSoup(response.text, 'lxml')
+                            st.session_state.html_content = html_content
+                            st.session_state.soup = BeautifulSoup(html_content, 'lxml')
                             st.session_state.url = url
                             st.session_state.loading_mode = None
                             st.success("✅ Página carregada!")
@@ -1447,7 +2017,10 @@ with st.sidebar:
     if st.session_state.get('loading_mode') == 'browser':
         st.divider()
         with st.spinner('🌐 Carregando via Proxy CORS... Aguarde (pode demorar até 20 segundos)'):
-            result = load_page_with_browser(st.session_state.loading_url)
+            result = load_page_with_browser(
+                st.session_state.loading_url,
+                force_refresh=st.session_state.get('force_refresh', False)
+            )
         
         st.session_state.loading_mode = None
         
@@ -1598,24 +2171,28 @@ if st.session_state.soup is not None:
         
         if 'ai_result' not in st.session_state:
             st.session_state.ai_result = None
+        if 'ai_multi_result' not in st.session_state:
+            st.session_state.ai_multi_result = None
         
         st.markdown("**Selecione o provedor de IA:**")
-        ai_options = []
-        if OPENAI_AVAILABLE:
-            ai_options.append("OpenAI (ChatGPT)")
-        if ANTHROPIC_AVAILABLE:
-            ai_options.append("Anthropic (Claude)")
-        if GEMINI_AVAILABLE:
-            ai_options.append("Google (Gemini)")
+        ai_options = available_providers()
+        if os.environ.get('AI_LOCAL_PROVIDER'):
+            # Provedor local (heurística, sem rede): testar o app e o modo lote offline
+            ai_options.append(LOCAL_AI_PROVIDER)
         
         if not ai_options:
             st.error("❌ Nenhuma API de IA está disponível. Instale pelo menos uma: openai, anthropic ou google-genai")
         else:
             ai_provider = st.selectbox("Provedor de IA", ai_options, key="ai_provider")
             
-            st.markdown("**Configure sua API Key:**")
+            if ai_provider == LOCAL_AI_PROVIDER:
+                st.caption("🧪 Provedor local: respostas heurísticas, sem rede e sem API Key")
+            else:
+                st.markdown("**Configure sua API Key:**")
             
-            if ai_provider == "OpenAI (ChatGPT)":
+            if ai_provider == LOCAL_AI_PROVIDER:
+                api_key = "local"
+            elif ai_provider == "OpenAI (ChatGPT)":
                 api_key_hint = "Obtenha em: https://platform.openai.com/api-keys"
                 env_var_name = "OPENAI_API_KEY"
             elif ai_provider == "Anthropic (Claude)":
@@ -1625,24 +2202,25 @@ if st.session_state.soup is not None:
                 api_key_hint = "Obtenha em: https://ai.google.dev/gemini-api/docs/api-key"
                 env_var_name = "GEMINI_API_KEY"
             
-            # Usar sistema híbrido de API keys
-            api_key_value = get_api_key(env_var_name)
+            if ai_provider != LOCAL_AI_PROVIDER:
+                # Usar sistema híbrido de API keys
+                api_key_value = get_api_key(env_var_name)
             
-            if api_key_value:
-                # Detectar origem da key
-                is_from_secrets = (os.environ.get(env_var_name) == api_key_value)
-                source = "Replit Secrets (🔒)" if is_from_secrets else "Customizada (🔑)"
+                if api_key_value:
+                    # Detectar origem da key
+                    is_from_secrets = (os.environ.get(env_var_name) == api_key_value)
+                    source = "Replit Secrets (🔒)" if is_from_secrets else "Customizada (🔑)"
                 
-                st.success(f"✅ API Key encontrada: {env_var_name} ({source})")
-                use_saved_key = st.checkbox("Usar API Key salva", value=True, key="use_env_key")
-                if use_saved_key:
-                    api_key = api_key_value
+                    st.success(f"✅ API Key encontrada: {env_var_name} ({source})")
+                    use_saved_key = st.checkbox("Usar API Key salva", value=True, key="use_env_key")
+                    if use_saved_key:
+                        api_key = api_key_value
+                    else:
+                        api_key = st.text_input("API Key", type="password", key="ai_api_key_manual")
                 else:
-                    api_key = st.text_input("API Key", type="password", key="ai_api_key_manual")
-            else:
-                st.info(f"ℹ️ {api_key_hint}")
-                st.caption("💡 Configure suas API keys em Settings → Secrets no Streamlit Cloud")
-                api_key = st.text_input(f"API Key do {ai_provider}", type="password", key="ai_api_key")
+                    st.info(f"ℹ️ {api_key_hint}")
+                    st.caption("💡 Configure suas API keys em Settings → Secrets no Streamlit Cloud")
+                    api_key = st.text_input(f"API Key do {ai_provider}", type="password", key="ai_api_key")
             
             st.divider()
             
@@ -1691,12 +2269,19 @@ if st.session_state.soup is not None:
                                     progress_bar = st.progress(0)
                                     status_text = st.empty()
                                     
-                                    loaded_results = []
-                                    for idx, url in enumerate(urls_to_load):
-                                        status_text.text(f"Carregando {idx + 1}/{len(urls_to_load)}: {url[:50]}...")
-                                        result = fetch_html(url, extraction_method, timeout=10)
-                                        loaded_results.append(result)
-                                        progress_bar.progress((idx + 1) / len(urls_to_load))
+                                    def _on_url_loaded(done, total, result):
+                                        status_text.text(f"Carregando {done}/{total}: {result['url'][:50]}...")
+                                        progress_bar.progress(done / total)
+                                    
+                                    loaded_results = load_urls_to_store(
+                                        urls_to_load,
+                                        extraction_method,
+                                        timeout=10,
+                                        max_workers=st.session_state.get('fetch_max_workers', DEFAULT_MAX_WORKERS),
+                                        max_per_host=st.session_state.get('fetch_max_per_host', DEFAULT_MAX_PER_HOST),
+                                        on_result=_on_url_loaded,
+                                        force_refresh=st.session_state.get('force_refresh', False)
+                                    )
                                     
                                     st.session_state.loaded_urls = loaded_results
                                     st.session_state.selected_url_indices = list(range(len(loaded_results)))  # Selecionar todas por padrão
@@ -1718,6 +2303,14 @@ if st.session_state.soup is not None:
                     with st.expander("**URLs Carregadas**", expanded=True):
                         st.markdown(f"**{len(st.session_state.loaded_urls)} URL(s) carregada(s)**")
                         
+                        # Templates detectados (a IA analisa uma página por template)
+                        templates = {loaded_url.get('template') for loaded_url in st.session_state.loaded_urls} - {None}
+                        if templates:
+                            st.caption(
+                                f"🧩 {len(templates)} template(s) detectado(s) - no modo 'Identificar Seletores' "
+                                f"a IA é chamada uma vez por template em vez de uma vez por URL"
+                            )
+                        
                         # Tabela com checkboxes
                         for idx, loaded_url in enumerate(st.session_state.loaded_urls):
                             col1, col2, col3 = st.columns([1, 8, 2])
@@ -1739,6 +2332,8 @@ if st.session_state.soup is not None:
                             with col3:
                                 if loaded_url['status'] == 'error':
                                     st.caption(f"❌ {loaded_url['error'][:30]}...")
+                                elif loaded_url.get('template') is not None:
+                                    st.caption(f"🧩 Template {loaded_url['template'] + 1}")
                         
                         selected_count = len(st.session_state.get('selected_url_indices', []))
                         st.info(f"📊 {selected_count} URL(s) selecionada(s) para processar")
@@ -1751,6 +2346,34 @@ if st.session_state.soup is not None:
                 key="ai_query"
             )
             
+            # ========== ACOMPANHAR PROCESSAMENTO MULTI-URL EM SEGUNDO PLANO ==========
+            if multi_url_mode and not st.session_state.get('multi_url_job_id'):
+                # Processamentos interrompidos podem ser retomados sem chamar a IA de novo nas URLs já feitas
+                resumed_job_id = render_resumable_jobs('multi_url_ai', api_key=api_key)
+                if resumed_job_id:
+                    st.session_state.multi_url_results = None
+                    st.session_state.multi_url_job_id = resumed_job_id
+                    st.rerun()
+            
+            multi_url_job_id = st.session_state.get('multi_url_job_id')
+            if multi_url_job_id:
+                multi_url_job = job_registry.snapshot(multi_url_job_id)
+                if multi_url_job is None:
+                    st.session_state.multi_url_job_id = None
+                elif multi_url_job['status'] in FINISHED_STATUSES:
+                    # Job terminou: trazer o resultado (parcial, se foi interrompido) para a página
+                    st.session_state.multi_url_job_id = None
+                    st.session_state.multi_url_results = multi_url_job['result'] or None
+                    st.session_state.multi_url_results_job = multi_url_job_id  # linhas também em Parquet
+                    if multi_url_job['status'] == STATUS_STOPPED:
+                        st.warning(f"⏹️ Processamento interrompido em {multi_url_job['done']}/{multi_url_job['total']}")
+                    elif multi_url_job['status'] == STATUS_ERROR:
+                        st.error(f"❌ Erro no processamento: {multi_url_job['error']}")
+                else:
+                    st.divider()
+                    st.markdown("### ⏳ Processando em segundo plano")
+                    render_job_panel(multi_url_job_id)
+            
             # ========== EXIBIR RESULTADOS DO PROCESSAMENTO MULTI-URL ==========
             if multi_url_mode and st.session_state.get('multi_url_results'):
                 st.divider()
@@ -1914,6 +2537,18 @@ if st.session_state.soup is not None:
                 else:
                     st.warning("⚠️ Nenhuma URL selecionada ou sem dados válidos")
                 
+                # Todas as linhas do job, direto do armazenamento colunar (sem remontar o DataFrame)
+                multi_url_results_job = st.session_state.get('multi_url_results_job')
+                if has_results(multi_url_results_job):
+                    st.download_button(
+                        "📥 Parquet (todas as URLs)",
+                        export_results_parquet(multi_url_results_job),
+                        "dados_multi_url.parquet",
+                        "application/octet-stream",
+                        key='multi_all_parquet',
+                        use_container_width=True
+                    )
+                
                 # Botão para limpar resultados e processar novamente
                 if st.button("🔄 Processar Novamente", use_container_width=True):
                     st.session_state.multi_url_results = None
@@ -1934,6 +2569,26 @@ if st.session_state.soup is not None:
                 horizontal=False
             )
             
+            # Várias perguntas sobre a mesma página numa chamada só (o HTML vai uma vez)
+            use_multi_query = False
+            if extraction_mode == "identify_selectors" and not (multi_url_mode and st.session_state.get('loaded_urls')):
+                use_multi_query = st.checkbox(
+                    "🧩 Várias perguntas de uma vez",
+                    help="Uma pergunta por linha na descrição (opcional: 'nome: pergunta'). "
+                         "A IA recebe o HTML uma vez só e devolve seletores para todas as perguntas.",
+                    key="ai_multi_query"
+                )
+            
+            # Modo lote: para listas grandes sem pressa (resultado em até 24h, cerca de metade do preço)
+            use_ai_batch = False
+            if multi_url_mode and st.session_state.get('loaded_urls') and supports_batch(ai_provider):
+                use_ai_batch = st.checkbox(
+                    "📦 Modo lote (Batch API)",
+                    help="Envia todas as chamadas à IA num lote do provedor: cerca de 50% mais barato, "
+                         "mas o resultado pode levar até 24h. O job consulta o lote e pode ser retomado.",
+                    key="multi_url_use_batch"
+                )
+            
             # Botão único de processamento
             col1, col2 = st.columns([4, 1])
             with col1:
@@ -1946,6 +2601,7 @@ if st.session_state.soup is not None:
                         # Limpar resultados anteriores
                         st.session_state.ai_result = None
                         st.session_state.ai_direct_result = None
+                        st.session_state.ai_multi_result = None
                         st.session_state.multi_url_results = None
                         
                         # Verificar se está no modo multi-URL com URLs carregadas
@@ -1957,206 +2613,101 @@ if st.session_state.soup is not None:
                             else:
                                 extraction_method = st.session_state.get('extraction_method', 'python')
                                 selected_urls = [st.session_state.loaded_urls[i] for i in selected_indices]
-                                total = len(selected_urls)
-                                
-                                # Inicializar controles de processamento
-                                if 'processing_control' not in st.session_state:
-                                    st.session_state.processing_control = 'running'
-                                if 'processing_results' not in st.session_state:
-                                    st.session_state.processing_results = []
-                                if 'processing_index' not in st.session_state:
-                                    st.session_state.processing_index = 0
-                                
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                control_container = st.empty()
-                                results = st.session_state.processing_results
-                                
-                                # Mostrar botões de controle
-                                with control_container.container():
-                                    col_a, col_b = st.columns(2)
-                                    with col_a:
-                                        if st.button("⏸️ Pausar", key="pause_processing", use_container_width=True):
-                                            st.session_state.processing_control = 'paused'
-                                            st.rerun()
-                                    with col_b:
-                                        if st.button("⏹️ Parar", key="stop_processing", use_container_width=True):
-                                            st.session_state.processing_control = 'stopped'
-                                            st.rerun()
-                                
-                                for idx, loaded_url in enumerate(selected_urls[st.session_state.processing_index:], start=st.session_state.processing_index):
-                                    # Verificar controle de processamento
-                                    if st.session_state.processing_control == 'stopped':
-                                        status_text.warning("⏹️ Processamento interrompido pelo usuário")
-                                        break
-                                    elif st.session_state.processing_control == 'paused':
-                                        status_text.info(f"⏸️ Processamento pausado em {idx}/{total}")
-                                        st.session_state.processing_index = idx
-                                        if st.button("▶️ Retomar Processamento", type="primary", key="resume_processing"):
-                                            st.session_state.processing_control = 'running'
-                                            st.rerun()
-                                        st.stop()
-                                    
-                                    if loaded_url['status'] == 'error':
-                                        results.append({
-                                            'url': loaded_url['url'],
-                                            'data_preview': None,
-                                            'data_full': None,
-                                            'error': loaded_url['error']
-                                        })
-                                        continue
-                                    
-                                    status_text.text(f"Processando {idx + 1}/{total}: {loaded_url['url'][:50]}...")
-                                    
-                                    if extraction_mode == "identify_selectors":
-                                        # Identificar seletores para essa URL
-                                        with st.spinner(f"Analisando com IA..."):
-                                            ai_result = extract_with_ai(
-                                                loaded_url['html_content'],
-                                                user_query,
-                                                ai_provider,
-                                                api_key
-                                            )
-                                        
-                                        if "error" in ai_result:
-                                            results.append({'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'error': ai_result['error']})
-                                        else:
-                                            # Aplicar seletores identificados
-                                            soup = BeautifulSoup(loaded_url['html_content'], 'lxml')
-                                            data_preview = []
-                                            all_valores = {}
-                                            
-                                            for sel in ai_result.get('seletores', []):
-                                                seletor = sel.get('seletor', '')
-                                                tipo = sel.get('tipo', 'css')
-                                                descricao = sel.get('descricao', 'Campo')
-                                                
-                                                try:
-                                                    extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
-                                                    
-                                                    if tipo == 'css':
-                                                        elements = soup.select(seletor)
-                                                        valores = [extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html) for elem in elements if extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html)]
-                                                    elif tipo == 'xpath':
-                                                        tree = lxml_html.fromstring(loaded_url['html_content'])
-                                                        elements = tree.xpath(seletor)
-                                                        is_xpath_attr = isinstance(elements[0], str) if elements else False
-                                                        valores = [extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html) for elem in elements if extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)]
-                                                    else:
-                                                        valores = []
-                                                    
-                                                    all_valores[descricao] = valores
-                                                    
-                                                    if valores:
-                                                        data_preview.append({
-                                                            'Campo': descricao,
-                                                            'Valor': valores[0] if len(valores) == 1 else ', '.join(str(v)[:100] for v in valores[:3]) + ('...' if len(valores) > 3 else ''),
-                                                            'Total Encontrado': len(valores)
-                                                        })
-                                                    else:
-                                                        data_preview.append({'Campo': descricao, 'Valor': 'Nenhum resultado', 'Total Encontrado': 0})
-                                                except Exception as e:
-                                                    all_valores[descricao] = []
-                                                    data_preview.append({'Campo': descricao, 'Valor': f'Erro: {str(e)}', 'Total Encontrado': 0})
-                                            
-                                            # Estruturar data_full
-                                            data_full = []
-                                            if all_valores:
-                                                max_len = max(len(v) for v in all_valores.values())
-                                                for i in range(max_len):
-                                                    row = {desc: vals[i] if i < len(vals) else '' for desc, vals in all_valores.items()}
-                                                    data_full.append(row)
-                                            
-                                            results.append({
-                                                'url': loaded_url['url'], 
-                                                'data_preview': data_preview, 
-                                                'data_full': data_full, 
-                                                'ai_explanation': ai_result.get('explicacao', ''),
-                                                'error': None
-                                            })
-                                    
-                                    else:  # extract_direct
-                                        # Extração direta para essa URL
-                                        with st.spinner(f"Extraindo dados..."):
-                                            direct_result = extract_data_directly_with_ai(
-                                                loaded_url['html_content'],
-                                                user_query,
-                                                ai_provider,
-                                                api_key
-                                            )
-                                        
-                                        if "error" in direct_result:
-                                            results.append({'url': loaded_url['url'], 'data_preview': None, 'data_full': None, 'ai_explanation': None, 'error': direct_result['error']})
-                                        else:
-                                            # Converter resultado direto para formato de preview
-                                            data_preview = []
-                                            data_full = []
-                                            for item in direct_result.get('dados', []):
-                                                data_preview.append({
-                                                    'Campo': item['campo'],
-                                                    'Valor': str(item['valor'])[:200],
-                                                    'Encontrado': '✅' if item['encontrado'] else '❌'
-                                                })
-                                                data_full.append({
-                                                    item['campo']: item['valor']
-                                                })
-                                            
-                                            results.append({
-                                                'url': loaded_url['url'], 
-                                                'data_preview': data_preview, 
-                                                'data_full': data_full,
-                                                'ai_explanation': direct_result.get('resumo', ''),
-                                                'error': None
-                                            })
-                                    
-                                    progress_bar.progress((idx + 1) / total)
-                                    st.session_state.processing_results = results
                                 
-                                # Limpar controles se processamento completou sem interrupção
-                                if st.session_state.processing_control == 'running':
-                                    st.session_state.multi_url_results = results
-                                    st.session_state.processing_control = 'completed'
-                                    st.session_state.processing_results = []
-                                    st.session_state.processing_index = 0
-                                    control_container.empty()
-                                    progress_bar.empty()
-                                    status_text.empty()
-                                    st.success(f"✅ {len(results)} URL(s) processada(s)!")
-                                    st.rerun()
-                                else:
-                                    # Processameto parado/pausado - manter estado
-                                    st.session_state.processing_results = results
+                                # Rodar em segundo plano: reruns da página não interrompem o processamento
+                                st.session_state.multi_url_job_id = start_multi_url_ai_job(
+                                    selected_urls,
+                                    extraction_mode,
+                                    user_query,
+                                    ai_provider,
+                                    api_key,
+                                    extraction_method,
+                                    owner=st.session_state.get('user_name'),
+                                    use_batch=use_ai_batch
+                                )
+                                st.rerun()
                         else:
                             # PROCESSAR PÁGINA ÚNICA
-                            if extraction_mode == "identify_selectors":
+                            if use_multi_query:
+                                queries = parse_named_queries(user_query)
+                                with st.spinner(f"Identificando seletores para {len(queries)} pergunta(s) com {ai_provider}..."):
+                                    st.session_state.ai_multi_result = extract_multi_with_ai(
+                                        st.session_state.html_content,
+                                        queries,
+                                        ai_provider,
+                                        api_key
+                                    )
+                            elif extraction_mode == "identify_selectors":
+                                # Seletores aparecem um a um conforme a IA responde (streaming)
+                                stream_placeholder = st.empty()
                                 with st.spinner(f"Identificando seletores com {ai_provider}..."):
                                     result = extract_with_ai(
                                         st.session_state.html_content,
                                         user_query,
                                         ai_provider,
-                                        api_key
+                                        api_key,
+                                        on_item=ai_stream_preview(stream_placeholder)
                                     )
                                     st.session_state.ai_result = result
+                                stream_placeholder.empty()
                             else:  # extract_direct
+                                stream_placeholder = st.empty()
                                 with st.spinner(f"Extraindo dados com {ai_provider}..."):
                                     result = extract_data_directly_with_ai(
                                         st.session_state.html_content,
                                         user_query,
                                         ai_provider,
-                                        api_key
+                                        api_key,
+                                        on_item=ai_stream_preview(stream_placeholder)
                                     )
                                     st.session_state.ai_direct_result = result
+                                stream_placeholder.empty()
             
             with col2:
                 if st.button("🗑️ Limpar", key="clear_ai_results", use_container_width=True):
                     st.session_state.ai_result = None
                     st.session_state.ai_direct_result = None
-                    # Limpar controles de processamento
-                    st.session_state.processing_control = 'running'
-                    st.session_state.processing_results = []
-                    st.session_state.processing_index = 0
+                    st.session_state.ai_multi_result = None
+                    # Parar o processamento Multi-URL em andamento (se houver)
+                    if st.session_state.get('multi_url_job_id'):
+                        job_registry.stop(st.session_state.multi_url_job_id)
+                        st.session_state.multi_url_job_id = None
                     st.rerun()
             
+            # Exibir resultado das VÁRIAS PERGUNTAS (uma chamada à IA)
+            if st.session_state.get('ai_multi_result') is not None:
+                multi_result = st.session_state.ai_multi_result
+                
+                if "error" in multi_result:
+                    st.error(f"❌ {multi_result['error']}")
+                else:
+                    st.success(f"✅ Seletores identificados para {len(multi_result['respostas'])} pergunta(s) numa única chamada à IA!")
+                    if multi_result.get('html_stats'):
+                        st.caption(html_stats_caption(multi_result['html_stats']))
+                    if multi_result.get('response_cache_hit'):
+                        st.caption("⚡ Resposta reaproveitada do cache (mesma página e mesmas perguntas, sem custo de API)")
+                    
+                    for q_idx, (name, answer) in enumerate(multi_result['respostas'].items()):
+                        with st.expander(f"🔍 {name}", expanded=True):
+                            if "error" in answer:
+                                st.error(f"❌ {answer['error']}")
+                            else:
+                                if answer.get('explicacao'):
+                                    st.caption(f"💡 {answer['explicacao']}")
+                                st.dataframe(pd.DataFrame([
+                                    {
+                                        'Campo': sel.get('descricao', ''),
+                                        'Tipo': sel.get('tipo', 'css'),
+                                        'Seletor': sel.get('seletor', ''),
+                                        'Exemplo': str(sel.get('exemplo_resultado', ''))[:150]
+                                    }
+                                    for sel in answer['seletores']
+                                ]), use_container_width=True, hide_index=True)
+                                # Mostra estes seletores no fluxo normal (testar, extrair, baixar)
+                                if st.button("✅ Usar estes seletores", key=f"use_multi_selectors_{q_idx}"):
+                                    st.session_state.ai_result = dict(answer, html_stats=multi_result.get('html_stats'))
+                                    st.rerun()
+            
             if st.session_state.ai_result is not None:
                 result = st.session_state.ai_result
                 
@@ -2164,6 +2715,10 @@ if st.session_state.soup is not None:
                     st.error(f"❌ {result['error']}")
                 else:
                     st.success("✅ Seletores identificados pela IA!")
+                    if result.get('html_stats'):
+                        st.caption(html_stats_caption(result['html_stats']))
+                    if result.get('response_cache_hit'):
+                        st.caption("⚡ Resposta reaproveitada do cache (mesma página e mesmo pedido, sem custo de API)")
                     
                     if "explicacao" in result:
                         st.info(f"💡 **Explicação:** {result['explicacao']}")
@@ -2190,78 +2745,19 @@ if st.session_state.soup is not None:
                                 else:
                                     st.info("⚡ Modo: Mesmos seletores - aplicando seletores identificados em todas as URLs")
                                 
+                                # Seletores compilados uma vez e reaproveitados em todas as URLs
+                                selector_plan = compile_selector_plan(seletores=result['seletores'])
+                                
                                 results = []
-                                for idx, url in enumerate(urls_to_process):
-                                    status_text.text(f"Processando {idx + 1}/{total_urls}: {url[:50]}...")
-                                    
-                                    if url == st.session_state.url:
-                                        # Já temos os dados da página atual
-                                        all_data = []
-                                        all_valores = {}
-                                        
-                                        for sel_idx, sel in enumerate(result['seletores'], 1):
-                                            seletor = sel.get('seletor', '')
-                                            tipo = sel.get('tipo', 'css')
-                                            descricao = sel.get('descricao', f'Campo {sel_idx}')
-                                            
-                                            try:
-                                                extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
-                                                
-                                                if tipo == 'css':
-                                                    elements = st.session_state.soup.select(seletor)
-                                                    valores = []
-                                                    for elem in elements:
-                                                        valor = extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html)
-                                                        if valor:
-                                                            valores.append(valor)
-                                                elif tipo == 'xpath':
-                                                    tree = lxml_html.fromstring(st.session_state.html_content)
-                                                    elements = tree.xpath(seletor)
-                                                    is_xpath_attr = isinstance(elements[0], str) if elements else False
-                                                    valores = []
-                                                    for elem in elements:
-                                                        valor = extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)
-                                                        if valor:
-                                                            valores.append(valor)
-                                                else:
-                                                    valores = []
-                                                
-                                                all_valores[descricao] = valores
-                                                
-                                                if valores:
-                                                    all_data.append({
-                                                        'Campo': descricao,
-                                                        'Valor': valores[0] if len(valores) == 1 else ', '.join(str(v)[:100] for v in valores[:3]) + ('...' if len(valores) > 3 else ''),
-                                                        'Total Encontrado': len(valores)
-                                                    })
-                                                else:
-                                                    all_data.append({
-                                                        'Campo': descricao,
-                                                        'Valor': 'Nenhum resultado',
-                                                        'Total Encontrado': 0
-                                                    })
-                                            except Exception as e:
-                                                all_valores[descricao] = []
-                                                all_data.append({
-                                                    'Campo': descricao,
-                                                    'Valor': f'Erro: {str(e)}',
-                                                    'Total Encontrado': 0
-                                                })
-                                        
-                                        # Estruturar data_full
-                                        data_full = []
-                                        if all_valores:
-                                            max_len = max(len(v) for v in all_valores.values())
-                                            for i in range(max_len):
-                                                row = {}
-                                                for descricao, valores in all_valores.items():
-                                                    row[descricao] = valores[i] if i < len(valores) else ''
-                                                data_full.append(row)
+                                if strategy == 'individual_ai':
+                                    for idx, url in enumerate(urls_to_process):
+                                        status_text.text(f"Processando {idx + 1}/{total_urls}: {url[:50]}...")
                                         
-                                        results.append({'url': url, 'data_preview': all_data, 'data_full': data_full, 'error': None})
-                                    else:
-                                        # Processar URLs adicionais
-                                        if strategy == 'individual_ai':
+                                        if url == st.session_state.url:
+                                            # Já temos os dados da página atual
+                                            extracted = extract_document(get_session_document(), selector_plan)
+                                            results.append({'url': url, 'data_preview': build_preview(extracted), 'data_full': build_rows(extracted), 'error': None})
+                                        else:
                                             # Modo individual: IA analisa cada URL separadamente
                                             url_result = apply_ai_per_url(
                                                 url, 
@@ -2269,20 +2765,35 @@ if st.session_state.soup is not None:
                                                 st.session_state.get('ai_provider', ai_provider),
                                                 st.session_state.get('ai_api_key', api_key),
                                                 timeout=10,
-                                                extraction_method=extraction_method
-                                            )
-                                        else:
-                                            # Modo rápido: aplicar mesmos seletores
-                                            url_result = apply_selectors_to_url(
-                                                url, 
-                                                result['seletores'],
-                                                timeout=10,
-                                                extraction_method=extraction_method
+                                                extraction_method=extraction_method,
+                                                force_refresh=st.session_state.get('force_refresh', False)
                                             )
+                                            results.append(url_result)
                                         
-                                        results.append(url_result)
+                                        progress_bar.progress((idx + 1) / total_urls)
+                                else:
+                                    # Modo rápido: download → extração em streaming com os mesmos seletores
+                                    # (só os dados extraídos ficam em memória, o HTML é descartado página a página)
+                                    other_urls = [url for url in urls_to_process if url != st.session_state.url]
+                                    
+                                    # Já temos os dados da página atual
+                                    extracted = extract_document(get_session_document(), selector_plan)
+                                    current_result = {'url': st.session_state.url, 'data_preview': build_preview(extracted), 'data_full': build_rows(extracted), 'error': None}
+                                    results = [current_result if url == st.session_state.url else None for url in urls_to_process]
                                     
-                                    progress_bar.progress((idx + 1) / total_urls)
+                                    other_positions = [idx for idx, url in enumerate(urls_to_process) if url != st.session_state.url]
+                                    # Lido aqui: as threads do pipeline não têm acesso ao session_state
+                                    force_refresh = st.session_state.get('force_refresh', False)
+                                    for done, (idx, url_result) in enumerate(stream_pipeline(
+                                        other_urls,
+                                        lambda url: fetch_html(url, extraction_method, 10, force_refresh=force_refresh),
+                                        lambda fetch_result: extract_fetched_page(fetch_result, selector_plan),
+                                        max_workers=st.session_state.get('fetch_max_workers', DEFAULT_MAX_WORKERS),
+                                        max_per_host=st.session_state.get('fetch_max_per_host', DEFAULT_MAX_PER_HOST)
+                                    ), start=1):
+                                        results[other_positions[idx]] = url_result
+                                        status_text.text(f"Processando {done}/{len(other_urls)}: {url_result['url'][:50]}...")
+                                        progress_bar.progress((done + 1) / total_urls)
                                 
                                 st.session_state.multi_url_results = results
                                 progress_bar.empty()
@@ -2379,6 +2890,7 @@ if st.session_state.soup is not None:
                         st.caption("A IA identificou os seletores e extraiu os dados para você!")
                         
                         all_data = []
+                        session_doc = get_session_document()
                         for idx, sel in enumerate(result['seletores'], 1):
                             seletor = sel.get('seletor', '')
                             tipo = sel.get('tipo', 'css')
@@ -2388,17 +2900,16 @@ if st.session_state.soup is not None:
                                 extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
                                 
                                 if tipo == 'css':
-                                    elements = st.session_state.soup.select(seletor)
+                                    elements = session_doc.select(seletor)
                                     if extrair_html:
                                         valores = []
                                         for elem in elements:
-                                            html_content = str(elem)
+                                            html_content = element_html(elem)
                                             valores.append(html_content)
                                     else:
-                                        valores = [elem.get_text(strip=True) for elem in elements]
+                                        valores = [element_text(elem) for elem in elements]
                                 elif tipo == 'xpath':
-                                    tree = lxml_html.fromstring(st.session_state.html_content)
-                                    elements = tree.xpath(seletor)
+                                    elements = session_doc.xpath(seletor)
                                     valores = []
                                     for elem in elements:
                                         if isinstance(elem, str):
@@ -2621,6 +3132,10 @@ if st.session_state.soup is not None:
                     st.error(f"❌ {direct_result['error']}")
                 else:
                     st.success("✅ Dados extraídos diretamente pela IA!")
+                    if direct_result.get('html_stats'):
+                        st.caption(html_stats_caption(direct_result['html_stats']))
+                    if direct_result.get('response_cache_hit'):
+                        st.caption("⚡ Resposta reaproveitada do cache (mesma página e mesmo pedido, sem custo de API)")
                     
                     if "resumo" in direct_result:
                         st.info(f"💡 **Resumo:** {direct_result['resumo']}")
@@ -2785,362 +3300,296 @@ if st.session_state.soup is not None:
             elif not use_ai_selectors and not bulk_selector and not bulk_selectors_text:
                 st.warning("⚠️ Insira um seletor")
             else:
-                all_data = []
-                
-                # Processar URLs ou arquivos HTML
-                if uploaded_files:
-                    items_to_process = [(f.name, f.getvalue().decode('utf-8', errors='ignore')) for f in uploaded_files]
-                    total = len(items_to_process)
+                # Compilar os seletores UMA vez para todas as páginas
+                if use_ai_selectors:
+                    selector_plan = compile_selector_plan(seletores=st.session_state.ai_result['seletores'])
+                elif bulk_method == "⚡ Método Universal (Múltiplos Seletores)" and bulk_selectors_text:
+                    selector_plan = compile_selector_plan(selector_lines=bulk_selectors_text)
                 else:
-                    items_to_process = [(url, None) for url in urls_list]
-                    total = len(urls_list)
+                    selector_plan = None
                 
-                progress_bar = st.progress(0)
-                status_text = st.empty()
+                manual_config = {}
+                if selector_plan is None:
+                    manual_config = {
+                        'method': bulk_method,
+                        'selector': bulk_selector,
+                        'extract_text': extract_bulk_text,
+                        'extract_attrs': extract_bulk_attrs,
+                        'attr_name': bulk_attr_name if extract_bulk_attrs else None
+                    }
                 
-                for idx, (identifier, html_content) in enumerate(items_to_process):
-                    status_text.text(f"Processando {idx + 1}/{total}: {identifier}")
-                    
-                    # Variável para armazenar HTML baixado
-                    fetched_html = None
-                    
-                    try:
-                        # Se for arquivo HTML, usar o conteúdo carregado
-                        if html_content:
-                            fetched_html = html_content
-                            soup = BeautifulSoup(html_content, 'lxml')
-                        else:
-                            # Se for URL, fazer requisição
-                            headers = {
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                            }
-                            response = requests.get(identifier, headers=headers, timeout=10)
-                            response.raise_for_status()
-                            fetched_html = response.text
-                            soup = BeautifulSoup(fetched_html, 'lxml')
-                        
-                        # VALIDAÇÃO: Verificar se o HTML foi obtido com sucesso
-                        if not fetched_html or len(fetched_html.strip()) == 0:
-                            st.error(f"❌ {identifier}: HTML vazio ou inválido")
-                            continue
-                        if use_ai_selectors:
-                            row = {'Fonte': identifier}
-                            for sel in st.session_state.ai_result['seletores']:
-                                seletor = sel.get('seletor', '')
-                                tipo = sel.get('tipo', 'css')
-                                descricao = sel.get('descricao', 'Campo')
-                                try:
-                                    # Detectar se precisa extrair HTML (imagens, descrições completas, etc)
-                                    extrair_html = any(palavra in descricao.lower() for palavra in ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media'])
-                                    
-                                    if tipo == 'css':
-                                        elements = soup.select(seletor)
-                                        valores = []
-                                        for elem in elements:
-                                            valor = extract_element_value(elem, seletor, tipo='css', extrair_html=extrair_html)
-                                            if valor is not None and str(valor).strip() != '':
-                                                valores.append(valor)
-                                    elif tipo == 'xpath':
-                                        tree = lxml_html.fromstring(fetched_html)
-                                        elements = tree.xpath(seletor)
-                                        is_xpath_attr = isinstance(elements[0], str) if elements else False
-                                        valores = []
-                                        for elem in elements:
-                                            valor = extract_element_value(elem, seletor, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)
-                                            if valor is not None and str(valor).strip() != '':
-                                                valores.append(valor)
-                                    else:
-                                        valores = []
-                                    row[descricao] = valores[0] if len(valores) == 1 else ', '.join(valores[:5]) + ('...' if len(valores) > 5 else '')
-                                except Exception as e:
-                                    row[descricao] = ''
-                            all_data.append(row)
-                        elif bulk_method == "⚡ Método Universal (Múltiplos Seletores)" and bulk_selectors_text:
-                            # Processar múltiplos seletores - uma linha por URL
-                            row = {'Fonte': identifier}
-                            selectors_list = [s.strip() for s in bulk_selectors_text.strip().split('\n') if s.strip()]
-                            
-                            for selector_idx, selector in enumerate(selectors_list, 1):
-                                try:
-                                    # Detectar automaticamente se precisa extrair HTML (imagens, descrições, etc)
-                                    # Baseado no seletor (img, src, href, etc)
-                                    selector_lower = selector.lower()
-                                    extrair_html = any(palavra in selector_lower for palavra in ['img', 'src', 'screenshot', 'image', 'description', 'game_area_description'])
-                                    
-                                    # Detectar se é XPath ou CSS
-                                    is_xpath = any([
-                                        selector.startswith('//'),
-                                        selector.startswith('/'),
-                                        selector.startswith('./'),
-                                        selector.startswith('(//'),
-                                        '::' in selector,
-                                        '@' in selector and '/' in selector
-                                    ])
-                                    
-                                    if is_xpath:
-                                        tree = lxml_html.fromstring(fetched_html)
-                                        elements = tree.xpath(selector)
-                                        is_xpath_attr = isinstance(elements[0], str) if elements else False
-                                        valores = []
-                                        for elem in elements:  # Remover limite [:5] para pegar todos
-                                            valor = extract_element_value(elem, selector, tipo='xpath', is_xpath_attr=is_xpath_attr, extrair_html=extrair_html)
-                                            if valor is not None and str(valor).strip() != '':
-                                                valores.append(valor)
-                                    else:
-                                        # CSS
-                                        elements = soup.select(selector)
-                                        valores = []
-                                        for elem in elements:  # Remover limite [:5] para pegar todos
-                                            valor = extract_element_value(elem, selector, tipo='css', extrair_html=extrair_html)
-                                            if valor is not None and str(valor).strip() != '':
-                                                valores.append(valor)
-                                    
-                                    # Usar sempre o seletor completo como nome da coluna
-                                    # Se for muito longo, o Streamlit trunca automaticamente na exibição
-                                    row[selector] = valores[0] if len(valores) == 1 else ', '.join(str(v) for v in valores[:5]) + ('...' if len(valores) > 5 else '')
-                                except Exception as e:
-                                    row[selector] = f"ERRO: {str(e)}"
-                            
-                            all_data.append(row)
-                        else:
-                            if bulk_method == "Seletor CSS":
-                                elements = soup.select(bulk_selector)
-                            elif bulk_method == "XPath":
-                                tree = lxml_html.fromstring(fetched_html)
-                                elements = tree.xpath(bulk_selector)
-                            elif bulk_method == "Tag HTML":
-                                elements = soup.find_all(bulk_selector)
-                            else:
-                                elements = soup.find_all(class_=bulk_selector)
-                            for elem_idx, elem in enumerate(elements, 1):
-                                row = {
-                                    'Fonte': identifier,
-                                    '#': elem_idx
-                                }
-                                if bulk_method == "XPath":
-                                    if isinstance(elem, str):
-                                        row['Valor'] = elem
-                                    elif hasattr(elem, 'text_content'):
-                                        if extract_bulk_text:
-                                            row['Texto'] = elem.text_content().strip()
-                                        if extract_bulk_attrs and bulk_attr_name:
-                                            row[bulk_attr_name] = elem.get(bulk_attr_name, '')
-                                    else:
-                                        row['Valor'] = str(elem)
-                                else:
-                                    if extract_bulk_text:
-                                        row['Texto'] = elem.get_text(strip=True)
-                                    if extract_bulk_attrs and bulk_attr_name:
-                                        row[bulk_attr_name] = elem.get(bulk_attr_name, '')
-                                all_data.append(row)
-                    except requests.exceptions.RequestException as e:
-                        st.error(f"❌ Falha ao baixar {identifier[:80]}: {str(e)}")
-                        continue
-                    except Exception as e:
-                        st.warning(f"⚠️ Erro ao processar {identifier[:80]}: {str(e)}")
-                    progress_bar.progress((idx + 1) / total)
-                status_text.empty()
-                progress_bar.empty()
-                if all_data:
-                    # Salvar resultados no session_state para permitir seleção
-                    st.session_state.bulk_results = all_data
-                    
-                    # Agrupar dados por fonte (URL ou arquivo)
-                    df = pd.DataFrame(all_data)
-                    fontes_unicas = df['Fonte'].unique()
-                    
-                    # Detectar URLs com problemas (campos vazios ou com "erro")
-                    urls_com_problemas = []
-                    urls_completas = []
-                    
-                    for fonte in fontes_unicas:
-                        dados_fonte = df[df['Fonte'] == fonte]
-                        # Verificar se há campos vazios ou com erro
-                        tem_problema = False
-                        for _, row in dados_fonte.iterrows():
-                            for col in row.index:
-                                if col != 'Fonte' and col != '#':
-                                    valor = str(row[col]).lower()
-                                    if valor in ['', 'nan', 'none'] or 'erro' in valor or len(valor.strip()) == 0:
-                                        tem_problema = True
-                                        break
-                            if tem_problema:
-                                break
-                        
+                uploaded_items = [(f.name, f.getvalue().decode('utf-8', errors='ignore')) for f in uploaded_files] if uploaded_files else None
+                
+                # Rodar em segundo plano: o scraping continua mesmo se a página for recarregada
+                st.session_state.bulk_results = None
+                st.session_state.bulk_job_messages = []
+                st.session_state.bulk_job_id = start_bulk_job(
+                    urls_list,
+                    uploaded_items,
+                    selector_plan,
+                    manual_config,
+                    use_ai_selectors,
+                    {
+                        'max_workers': st.session_state.get('fetch_max_workers', DEFAULT_MAX_WORKERS),
+                        'max_per_host': st.session_state.get('fetch_max_per_host', DEFAULT_MAX_PER_HOST),
+                        'processes': st.session_state.get('extract_processes', 1),
+                        'force_refresh': st.session_state.get('force_refresh', False)
+                    },
+                    owner=st.session_state.get('user_name')
+                )
+                st.rerun()
+        
+        # Jobs interrompidos (app reiniciado, job parado) podem ser retomados do checkpoint
+        if not st.session_state.get('bulk_job_id'):
+            resumed_job_id = render_resumable_jobs('bulk')
+            if resumed_job_id:
+                st.session_state.bulk_results = None
+                st.session_state.bulk_job_messages = []
+                st.session_state.bulk_job_id = resumed_job_id
+                st.rerun()
+        
+        # Acompanhar o job em segundo plano
+        bulk_job_id = st.session_state.get('bulk_job_id')
+        if bulk_job_id:
+            bulk_job = job_registry.snapshot(bulk_job_id)
+            if bulk_job is None:
+                st.session_state.bulk_job_id = None
+            elif bulk_job['status'] in FINISHED_STATUSES:
+                # Job terminou: trazer o resultado (parcial, se foi interrompido) para a página
+                st.session_state.bulk_job_id = None
+                st.session_state.bulk_results = bulk_job['result'] or []
+                st.session_state.bulk_total_sources = bulk_job['total']
+                st.session_state.bulk_job_messages = [msg for msg in bulk_job['messages'] if msg['level'] in ('warning', 'error')]
+                # SEMPRE reinicializar seleção em cada scraping (todas marcadas por padrão)
+                st.session_state.bulk_selected_sources = list(dict.fromkeys(row['Fonte'] for row in st.session_state.bulk_results))
+                # Linhas gravadas em Parquet pelo job: a sessão não precisa guardar a lista inteira
+                st.session_state.bulk_results_job = bulk_job_id
+                if has_results(bulk_job_id):
+                    st.session_state.bulk_results = []
+                if bulk_job['status'] == STATUS_STOPPED:
+                    st.warning(f"⏹️ Scraping interrompido em {bulk_job['done']}/{bulk_job['total']}")
+                elif bulk_job['status'] == STATUS_ERROR:
+                    st.error(f"❌ Erro no scraping: {bulk_job['error']}")
+            else:
+                st.markdown("### ⏳ Scraping em segundo plano")
+                render_job_panel(bulk_job_id)
+        
+        # Mensagens de erro/aviso do último scraping
+        for msg in st.session_state.get('bulk_job_messages', [])[-20:]:
+            if msg['level'] == 'error':
+                st.error(msg['message'])
+            else:
+                st.warning(msg['message'])
+        
+        if st.session_state.get('bulk_results') is not None and not st.session_state.get('bulk_job_id'):
+            total = st.session_state.get('bulk_total_sources', 0)
+            # Linhas do armazenamento colunar (colunas Arrow); sem pyarrow, as linhas da sessão
+            bulk_results_job = st.session_state.get('bulk_results_job')
+            df = load_results(bulk_results_job) if has_results(bulk_results_job) else None
+            if df is None:
+                df = pd.DataFrame(st.session_state.bulk_results)
+            if not df.empty:
+                # Agrupar dados por fonte (URL ou arquivo)
+                fontes_unicas = df['Fonte'].unique()
+            
+                # Detectar URLs com problemas (campos vazios ou com "erro")
+                urls_com_problemas = []
+                urls_completas = []
+            
+                for fonte in fontes_unicas:
+                    dados_fonte = df[df['Fonte'] == fonte]
+                    # Verificar se há campos vazios ou com erro
+                    tem_problema = False
+                    for _, row in dados_fonte.iterrows():
+                        for col in row.index:
+                            if col != 'Fonte' and col != '#':
+                                valor = str(row[col]).lower()
+                                if valor in ['', 'nan', 'none', '<na>'] or 'erro' in valor or len(valor.strip()) == 0:
+                                    tem_problema = True
+                                    break
                         if tem_problema:
-                            urls_com_problemas.append(fonte)
-                        else:
-                            urls_completas.append(fonte)
-                    
-                    # SEMPRE reinicializar seleção em cada scraping (todas marcadas por padrão)
-                    st.session_state.bulk_selected_sources = list(fontes_unicas)
-                    
-                    st.success(f"✅ Scraping concluído! {len(all_data)} elementos extraídos de {total} fonte(s)")
-                    
-                    # Resumo com indicadores
-                    col_info1, col_info2, col_info3 = st.columns(3)
-                    with col_info1:
-                        st.metric("Total de URLs", len(fontes_unicas))
-                    with col_info2:
-                        st.metric("✅ URLs Completas", len(urls_completas))
-                    with col_info3:
-                        st.metric("⚠️ URLs com Problemas", len(urls_com_problemas))
-                    
-                    st.divider()
-                    
-                    # Filtros
-                    st.markdown("**Filtrar Resultados:**")
-                    filtro = st.radio(
-                        "Mostrar:",
-                        ["📋 Todas as URLs", "✅ Apenas URLs Completas", "⚠️ Apenas URLs com Problemas"],
-                        horizontal=True,
-                        key="bulk_filter"
-                    )
-                    
-                    # Aplicar filtro
-                    if filtro == "✅ Apenas URLs Completas":
-                        fontes_filtradas = urls_completas
-                    elif filtro == "⚠️ Apenas URLs com Problemas":
-                        fontes_filtradas = urls_com_problemas
+                            break
+                
+                    if tem_problema:
+                        urls_com_problemas.append(fonte)
                     else:
-                        fontes_filtradas = list(fontes_unicas)
-                    
-                    st.divider()
-                    
-                    # Seleção de URLs para download
-                    st.markdown("**Selecione as URLs para baixar:**")
-                    
-                    col_select_all, col_deselect_all = st.columns(2)
-                    with col_select_all:
-                        if st.button("✅ Marcar Todas (Filtradas)", key="select_all_bulk", use_container_width=True):
-                            st.session_state.bulk_selected_sources = fontes_filtradas.copy()
-                            st.rerun()
-                    with col_deselect_all:
-                        if st.button("❌ Desmarcar Todas", key="deselect_all_bulk", use_container_width=True):
-                            st.session_state.bulk_selected_sources = []
-                            st.rerun()
-                    
-                    # Mostrar checkboxes para cada URL
-                    for fonte in fontes_filtradas:
-                        dados_fonte = df[df['Fonte'] == fonte]
-                        
-                        # Indicador de problema
-                        is_problema = fonte in urls_com_problemas
-                        status_icon = "⚠️" if is_problema else "✅"
-                        
-                        col_check, col_url, col_preview = st.columns([1, 6, 3])
-                        
-                        with col_check:
-                            is_selected = fonte in st.session_state.bulk_selected_sources
-                            if st.checkbox("", value=is_selected, key=f"bulk_select_{fonte}", label_visibility="collapsed"):
-                                if fonte not in st.session_state.bulk_selected_sources:
-                                    st.session_state.bulk_selected_sources.append(fonte)
-                            else:
-                                if fonte in st.session_state.bulk_selected_sources:
-                                    st.session_state.bulk_selected_sources.remove(fonte)
-                        
-                        with col_url:
-                            url_display = fonte[:80] + "..." if len(fonte) > 80 else fonte
-                            st.text(f"{status_icon} {url_display}")
-                        
-                        with col_preview:
-                            st.caption(f"{len(dados_fonte)} registro(s)")
-                        
-                        # Mostrar detalhes se tiver problemas
-                        if is_problema:
-                            with st.expander(f"🔍 Ver problemas - {fonte[:50]}..."):
-                                for _, row in dados_fonte.iterrows():
-                                    problemas = []
-                                    for col in row.index:
-                                        if col != 'Fonte' and col != '#':
-                                            valor = str(row[col]).lower()
-                                            if valor in ['', 'nan', 'none'] or 'erro' in valor or len(valor.strip()) == 0:
-                                                problemas.append(f"**{col}**: {valor if valor else '(vazio)'}")
-                                    if problemas:
-                                        st.warning(" • " + "\n • ".join(problemas))
-                    
-                    st.divider()
-                    
-                    # Contador de selecionados
-                    st.info(f"📊 **{len(st.session_state.bulk_selected_sources)} URL(s) selecionada(s)** de {len(fontes_filtradas)} ({len(fontes_unicas)} total)")
-                    
-                    # Preview dos dados selecionados
-                    if st.session_state.bulk_selected_sources:
-                        df_selecionado = df[df['Fonte'].isin(st.session_state.bulk_selected_sources)]
-                        
-                        with st.expander("👁️ Preview dos Dados Selecionados", expanded=False):
-                            st.dataframe(df_selecionado, use_container_width=True)
+                        urls_completas.append(fonte)
+            
+                st.success(f"✅ Scraping concluído! {len(df)} elementos extraídos de {total} fonte(s)")
+            
+                # Resumo com indicadores
+                col_info1, col_info2, col_info3 = st.columns(3)
+                with col_info1:
+                    st.metric("Total de URLs", len(fontes_unicas))
+                with col_info2:
+                    st.metric("✅ URLs Completas", len(urls_completas))
+                with col_info3:
+                    st.metric("⚠️ URLs com Problemas", len(urls_com_problemas))
+            
+                st.divider()
+            
+                # Filtros
+                st.markdown("**Filtrar Resultados:**")
+                filtro = st.radio(
+                    "Mostrar:",
+                    ["📋 Todas as URLs", "✅ Apenas URLs Completas", "⚠️ Apenas URLs com Problemas"],
+                    horizontal=True,
+                    key="bulk_filter"
+                )
+            
+                # Aplicar filtro
+                if filtro == "✅ Apenas URLs Completas":
+                    fontes_filtradas = urls_completas
+                elif filtro == "⚠️ Apenas URLs com Problemas":
+                    fontes_filtradas = urls_com_problemas
+                else:
+                    fontes_filtradas = list(fontes_unicas)
+            
+                st.divider()
+            
+                # Seleção de URLs para download
+                st.markdown("**Selecione as URLs para baixar:**")
+            
+                col_select_all, col_deselect_all = st.columns(2)
+                with col_select_all:
+                    if st.button("✅ Marcar Todas (Filtradas)", key="select_all_bulk", use_container_width=True):
+                        st.session_state.bulk_selected_sources = fontes_filtradas.copy()
+                        st.rerun()
+                with col_deselect_all:
+                    if st.button("❌ Desmarcar Todas", key="deselect_all_bulk", use_container_width=True):
+                        st.session_state.bulk_selected_sources = []
+                        st.rerun()
+            
+                # Mostrar checkboxes para cada URL
+                for fonte in fontes_filtradas:
+                    dados_fonte = df[df['Fonte'] == fonte]
+                
+                    # Indicador de problema
+                    is_problema = fonte in urls_com_problemas
+                    status_icon = "⚠️" if is_problema else "✅"
+                
+                    col_check, col_url, col_preview = st.columns([1, 6, 3])
+                
+                    with col_check:
+                        is_selected = fonte in st.session_state.bulk_selected_sources
+                        if st.checkbox("", value=is_selected, key=f"bulk_select_{fonte}", label_visibility="collapsed"):
+                            if fonte not in st.session_state.bulk_selected_sources:
+                                st.session_state.bulk_selected_sources.append(fonte)
+                        else:
+                            if fonte in st.session_state.bulk_selected_sources:
+                                st.session_state.bulk_selected_sources.remove(fonte)
+                
+                    with col_url:
+                        url_display = fonte[:80] + "..." if len(fonte) > 80 else fonte
+                        st.text(f"{status_icon} {url_display}")
+                
+                    with col_preview:
+                        st.caption(f"{len(dados_fonte)} registro(s)")
+                
+                    # Mostrar detalhes se tiver problemas
+                    if is_problema:
+                        with st.expander(f"🔍 Ver problemas - {fonte[:50]}..."):
+                            for _, row in dados_fonte.iterrows():
+                                problemas = []
+                                for col in row.index:
+                                    if col != 'Fonte' and col != '#':
+                                        valor = str(row[col]).lower()
+                                        if valor in ['', 'nan', 'none', '<na>'] or 'erro' in valor or len(valor.strip()) == 0:
+                                            problemas.append(f"**{col}**: {valor if valor else '(vazio)'}")
+                                if problemas:
+                                    st.warning(" • " + "\n • ".join(problemas))
+            
+                st.divider()
+            
+                # Contador de selecionados
+                st.info(f"📊 **{len(st.session_state.bulk_selected_sources)} URL(s) selecionada(s)** de {len(fontes_filtradas)} ({len(fontes_unicas)} total)")
+            
+                # Preview dos dados selecionados
+                if st.session_state.bulk_selected_sources:
+                    df_selecionado = df[df['Fonte'].isin(st.session_state.bulk_selected_sources)]
+                
+                    with st.expander("👁️ Preview dos Dados Selecionados", expanded=False):
+                        st.dataframe(df_selecionado, use_container_width=True)
+                
+                    # Botões de download
+                    col1, col2, col3 = st.columns(3)
+                
+                    with col1:
+                        csv = df_selecionado.to_csv(index=False).encode('utf-8')
+                        st.download_button(
+                            "📥 Download CSV Selecionados",
+                            csv,
+                            f"scraping_massa_{len(st.session_state.bulk_selected_sources)}_urls.csv",
+                            "text/csv",
+                            key='bulk_csv_selected',
+                            use_container_width=True
+                        )
+                
+                    with col2:
+                        json_str = df_selecionado.to_json(orient='records', force_ascii=False, indent=2)
+                        st.download_button(
+                            "📥 Download JSON Selecionados",
+                            json_str,
+                            f"scraping_massa_{len(st.session_state.bulk_selected_sources)}_urls.json",
+                            "application/json",
+                            key='bulk_json_selected',
+                            use_container_width=True
+                        )
+                
+                    with col3:
+                        # Download individual por URL
+                        if len(st.session_state.bulk_selected_sources) == 1:
+                            fonte_individual = st.session_state.bulk_selected_sources[0]
+                            df_individual = df[df['Fonte'] == fonte_individual]
+                            csv_individual = df_individual.to_csv(index=False).encode('utf-8')
                         
-                        # Botões de download
-                        col1, col2, col3 = st.columns(3)
+                            # Nome de arquivo limpo
+                            nome_arquivo = fonte_individual.split('/')[-1].replace('.html', '').replace('https://', '').replace('http://', '')[:30]
                         
-                        with col1:
-                            csv = df_selecionado.to_csv(index=False).encode('utf-8')
                             st.download_button(
-                                "📥 Download CSV Selecionados",
-                                csv,
-                                f"scraping_massa_{len(st.session_state.bulk_selected_sources)}_urls.csv",
+                                "📥 Download Individual",
+                                csv_individual,
+                                f"{nome_arquivo}.csv",
                                 "text/csv",
-                                key='bulk_csv_selected',
-                                use_container_width=True
-                            )
-                        
-                        with col2:
-                            json_str = df_selecionado.to_json(orient='records', force_ascii=False, indent=2)
-                            st.download_button(
-                                "📥 Download JSON Selecionados",
-                                json_str,
-                                f"scraping_massa_{len(st.session_state.bulk_selected_sources)}_urls.json",
-                                "application/json",
-                                key='bulk_json_selected',
+                                key='bulk_csv_individual',
                                 use_container_width=True
                             )
-                        
-                        with col3:
-                            # Download individual por URL
-                            if len(st.session_state.bulk_selected_sources) == 1:
-                                fonte_individual = st.session_state.bulk_selected_sources[0]
-                                df_individual = df[df['Fonte'] == fonte_individual]
-                                csv_individual = df_individual.to_csv(index=False).encode('utf-8')
-                                
-                                # Nome de arquivo limpo
-                                nome_arquivo = fonte_individual.split('/')[-1].replace('.html', '').replace('https://', '').replace('http://', '')[:30]
-                                
-                                st.download_button(
-                                    "📥 Download Individual",
-                                    csv_individual,
-                                    f"{nome_arquivo}.csv",
-                                    "text/csv",
-                                    key='bulk_csv_individual',
-                                    use_container_width=True
-                                )
-                    else:
-                        st.warning("⚠️ Selecione pelo menos uma URL para baixar")
-                    
-                    # Opção de baixar TUDO (não filtrado)
-                    st.divider()
-                    with st.expander("📦 Download de TODOS os Dados (não filtrado)", expanded=False):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            csv_all = df.to_csv(index=False).encode('utf-8')
-                            st.download_button(
-                                "📥 Download CSV (TODAS as URLs)",
-                                csv_all,
-                                "scraping_massa_completo.csv",
-                                "text/csv",
-                                key='bulk_csv_all'
-                            )
-                        with col2:
-                            json_all = df.to_json(orient='records', force_ascii=False, indent=2)
-                            st.download_button(
-                                "📥 Download JSON (TODAS as URLs)",
-                                json_all,
-                                "scraping_massa_completo.json",
-                                "application/json",
-                                key='bulk_json_all'
-                            )
                 else:
-                    st.warning("⚠️ Nenhum dado foi extraído")
+                    st.warning("⚠️ Selecione pelo menos uma URL para baixar")
+            
+                # Opção de baixar TUDO (não filtrado)
+                st.divider()
+                with st.expander("📦 Download de TODOS os Dados (não filtrado)", expanded=False):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        # CSV gerado direto da tabela Arrow quando os resultados estão no armazenamento colunar
+                        csv_all = export_results_csv(bulk_results_job) if has_results(bulk_results_job) else df.to_csv(index=False).encode('utf-8')
+                        st.download_button(
+                            "📥 Download CSV (TODAS as URLs)",
+                            csv_all,
+                            "scraping_massa_completo.csv",
+                            "text/csv",
+                            key='bulk_csv_all'
+                        )
+                    with col2:
+                        json_all = df.to_json(orient='records', force_ascii=False, indent=2)
+                        st.download_button(
+                            "📥 Download JSON (TODAS as URLs)",
+                            json_all,
+                            "scraping_massa_completo.json",
+                            "application/json",
+                            key='bulk_json_all'
+                        )
+                    if has_results(bulk_results_job):
+                        st.download_button(
+                            "📥 Download Parquet (TODAS as URLs)",
+                            export_results_parquet(bulk_results_job),
+                            "scraping_massa_completo.parquet",
+                            "application/octet-stream",
+                            key='bulk_parquet_all'
+                        )
+            else:
+                st.warning("⚠️ Nenhum dado foi extraído")
     
     # Tab 5: Validador de Seletores
     with tab5:
@@ -3163,6 +3612,7 @@ if st.session_state.soup is not None:
                 selectors_list = [s.strip() for s in selectors_text.strip().split('\n') if s.strip()]
                 if selectors_list:
                     all_results = []
+                    session_doc = get_session_document()
                     for idx, selector in enumerate(selectors_list, 1):
                         try:
                             # Detectar tipo de seletor - tenta XPath primeiro
@@ -3181,8 +3631,7 @@ if st.session_state.soup is not None:
                                 is_xpath = True
                             if is_xpath:
                                 # XPath
-                                tree = lxml_html.fromstring(st.session_state.html_content)
-                                elements = tree.xpath(selector)
+                                elements = session_doc.xpath(selector)
                                 tipo = "XPath"
                                 is_xpath_attr = isinstance(elements[0], str) if elements else False
                                 valores = []
@@ -3192,7 +3641,7 @@ if st.session_state.soup is not None:
                                         valores.append(valor)
                             else:
                                 # CSS
-                                elements = st.session_state.soup.select(selector)
+                                elements = session_doc.select(selector)
                                 tipo = "CSS"
                                 valores = []
                                 for elem in elements:
@@ -3251,16 +3700,13 @@ with tab6:
     st.subheader("🤖 Scraping Automático de Lançamentos")
     st.caption("Configure scraping periódico de lançamentos de produtos com notificação por email")
     
-    # Aviso de funcionalidade futura
-    st.warning(
-        "⚠️ **FUNCIONALIDADE FUTURA** - Esta funcionalidade está em desenvolvimento.\n\n"
-        "**Limitação do Streamlit Community Cloud:** O Streamlit Cloud não possui suporte nativo para tarefas agendadas (cron jobs). "
-        "Para implementar esta funcionalidade completamente, será necessário:\n\n"
-        "1. **Integrar banco de dados externo** (ex: Supabase) para persistir tarefas cadastradas\n"
-        "2. **Configurar execução externa** via GitHub Actions ou serviço de cron (cron-job.org)\n"
-        "3. **Adaptar arquitetura** para separar agendamento da interface\n\n"
-        "Por enquanto, a interface está disponível para visualização e testes, mas o agendamento automático não funcionará até essas mudanças serem implementadas.",
-        icon="⚠️"
+    st.info(
+        "⏰ As tarefas rodam nos horários configurados pelo **agendador**, um processo separado do app:\n\n"
+        "`python task_scheduler.py`\n\n"
+        "Ele lê as tarefas cadastradas aqui periodicamente, guarda os agendamentos em disco "
+        "(execuções perdidas com o processo parado rodam ao voltar) e nunca roda a mesma tarefa duas vezes ao mesmo tempo. "
+        "Se a página de origem não mudou desde a última execução, a tarefa para logo após o download (⏭️), sem chamar a IA.",
+        icon="⏰"
     )
     
     # Verificar se usuário é admin
@@ -3291,6 +3737,12 @@ with tab6:
                 placeholder="Título\nPreço\nDisponibilidade\nLink\nImagem",
                 height=100
             )
+            identity_field = st.text_input(
+                "Campo de Identidade (opcional)",
+                placeholder="Link",
+                help="Campo que identifica o mesmo produto entre execuções. Só produtos novos, alterados "
+                     "ou removidos são gravados e enviados por email. Padrão: o primeiro campo da lista"
+            )
             
             st.divider()
             st.markdown("**4️⃣ Agendamento**")
@@ -3299,7 +3751,11 @@ with tab6:
                 frequency = st.selectbox("Frequência", ["Diário", "Semanal", "Mensal", "Personalizado"])
             with col_freq2:
                 if frequency == "Personalizado":
-                    custom_schedule = st.text_input("Cron Expression", placeholder="0 10 * * 1")
+                    custom_schedule = st.text_input(
+                        "Cron Expression",
+                        placeholder="0 10 * * 1",
+                        help="Expressão cron (minuto hora dia mês dia-da-semana) ou intervalo: 30m, 6h, 2d"
+                    )
                 else:
                     custom_schedule = ""
             
@@ -3337,6 +3793,7 @@ with tab6:
                         'target_site': target_site,
                         'search_method': search_method,
                         'fields': [f.strip() for f in fields_to_extract.split('\n') if f.strip()],
+                        'identity_field': identity_field.strip(),
                         'frequency': frequency,
                         'custom_schedule': custom_schedule,
                         'email_provider': email_provider,
@@ -3369,52 +3826,37 @@ with tab6:
                     st.text(f"⏰ Frequência: {task['frequency']}")
                     st.text(f"📧 Email: {task['recipient_email']}")
                     st.text(f"📊 Campos: {len(task['fields'])} campos")
+                    st.text(f"🔑 Identidade: {task_identity_field(task) or 'linha inteira'}")
                     
                     if st.button("▶️ Executar Agora", key=f"run_{task['id']}", use_container_width=True):
                         with st.spinner("⚙️ Executando scraping..."):
-                            result = execute_scraping_task(task)
+                            # Scraping + email + histórico (o mesmo fluxo do agendador)
+                            result, email_result = run_scraping_task(task, progress=st.info)
                             
                             if result['success']:
                                 st.success(f"✅ {result['total']} produto(s) encontrado(s)!")
                                 
-                                # Exibir produtos encontrados
-                                if result.get('products'):
+                                changes = result.get('changes')
+                                if changes is not None:
+                                    # Exibir só o que mudou desde a execução anterior
+                                    st.info(
+                                        f"🆕 {len(changes['new'])} novo(s) | ✏️ {len(changes['changed'])} alterado(s) | "
+                                        f"🗑️ {len(changes['removed'])} removido(s) | {changes['unchanged']} sem mudança"
+                                    )
+                                    if has_changes(changes):
+                                        st.dataframe(pd.DataFrame(change_rows(changes)), use_container_width=True)
+                                elif result.get('products'):
                                     st.dataframe(pd.DataFrame(result['products']), use_container_width=True)
                                 
-                                # Enviar email
-                                email_result = send_email_notification(task, result)
                                 if email_result == True:
                                     st.success("📧 Email enviado com sucesso!")
                                 elif isinstance(email_result, str):
                                     st.info(f"📧 {email_result}")
-                                
-                                # Salvar no histórico
-                                history = load_scraping_history()
-                                history.append({
-                                    'task_id': task['id'],
-                                    'task_name': task['name'],
-                                    'timestamp': pd.Timestamp.now().isoformat(),
-                                    'success': True,
-                                    'products_found': result['total']
-                                })
-                                save_scraping_history(history)
                             else:
                                 st.error(f"❌ Erro: {result['error']}")
-                                
-                                # Salvar erro no histórico
-                                history = load_scraping_history()
-                                history.append({
-                                    'task_id': task['id'],
-                                    'task_name': task['name'],
-                                    'timestamp': pd.Timestamp.now().isoformat(),
-                                    'success': False,
-                                    'error': result['error']
-                                })
-                                save_scraping_history(history)
                     
                     if st.button("🗑️ Excluir", key=f"del_{task['id']}", use_container_width=True):
-                        tasks_updated = [t for t in tasks if t['id'] != task['id']]
-                        if save_scraping_tasks(tasks_updated):
+                        if delete_scraping_task(task['id']):
                             st.success("✅ Tarefa excluída!")
                             st.rerun()
         else:
@@ -3426,13 +3868,37 @@ with tab6:
         
         if tasks:
             st.markdown("### 📜 Histórico")
-            history = load_scraping_history()
-            if history:
-                # Mostrar apenas os últimos 5
-                recent_history = sorted(history, key=lambda x: x['timestamp'], reverse=True)[:5]
+            # Mostrar apenas os últimos 5 (consulta paginada no banco, não lê o histórico inteiro)
+            recent_history = load_scraping_history(limit=5)
+            if recent_history:
                 for h in recent_history:
-                    status_icon = "✅" if h['success'] else "❌"
-                    st.caption(f"{status_icon} {h['task_name']} - {pd.Timestamp(h['timestamp']).strftime('%d/%m %H:%M')}")
+                    status_icon = "⏭️" if h.get('unchanged') else "✅" if h['success'] else "❌"
+                    trigger_icon = " ⏰" if h.get('trigger') == RUN_SCHEDULED else ""
+                    changes_label = f" (+{h['new']} ~{h['changed']} -{h['removed']})" if 'new' in h else ""
+                    st.caption(f"{status_icon}{trigger_icon} {h['task_name']}{changes_label} - {pd.Timestamp(h['timestamp']).strftime('%d/%m %H:%M')}")
+                
+                total_history = count_scraping_history()
+                if total_history > len(recent_history):
+                    with st.expander(f"📜 Histórico completo ({total_history} execuções)", expanded=False):
+                        page_size = 20
+                        total_pages = (total_history + page_size - 1) // page_size
+                        page = st.number_input("Página", min_value=1, max_value=total_pages, value=1, key="history_page")
+                        history_page = load_scraping_history(limit=page_size, offset=(page - 1) * page_size)
+                        st.dataframe(pd.DataFrame([
+                            {
+                                'Status': "⏭️ sem mudança" if h.get('unchanged') else "✅" if h['success'] else "❌",
+                                'Tarefa': h['task_name'],
+                                'Data': pd.Timestamp(h['timestamp']).strftime('%d/%m/%Y %H:%M'),
+                                'Origem': h.get('trigger', 'manual'),
+                                'Produtos': h.get('products_found', ''),
+                                'Novos': h.get('new', ''),
+                                'Alterados': h.get('changed', ''),
+                                'Removidos': h.get('removed', ''),
+                                'Erro': h.get('error', '')
+                            }
+                            for h in history_page
+                        ]), use_container_width=True, hide_index=True)
+                        st.caption(f"Página {page} de {total_pages}")
             else:
                 st.caption("Nenhuma execução ainda")
 
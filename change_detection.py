@@ -0,0 +1,129 @@
+"""
+Detecção de mudanças entre execuções de uma tarefa de Scraping Automático.
+
+Cada execução devolvia a lista completa de produtos, e o email mandava os
+10 primeiros mesmo quando nada tinha mudado. Aqui cada linha recebe:
+
+- uma chave de identidade: o valor do campo de identidade da tarefa
+  (ex: "Link" ou "Título"); sem ele, o hash da própria linha
+- um hash do conteúdo (todos os campos)
+
+Comparando com o snapshot da execução anterior (chave -> hash, guardado no
+task_store), saem três conjuntos: novos, alterados e removidos. Só eles são
+gravados e notificados.
+
+Antes disso, page_content_hash() diz se a própria página de origem mudou:
+sem mudança, a execução nem chega a pedir seletores à IA.
+"""
+import hashlib
+import json
+import re
+
+# Tipo de mudança (coluna 'Mudança' nos resultados gravados)
+CHANGE_NEW = 'novo'
+CHANGE_CHANGED = 'alterado'
+CHANGE_REMOVED = 'removido'
+
+# Trechos que mudam a cada carregamento sem mudar o conteúdo (nonces, tokens, analytics)
+_VOLATILE_HTML = re.compile(r'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->', re.S | re.I)
+
+
+def page_content_hash(html_content):
+    """Hash do HTML sem scripts, estilos, comentários e diferenças de espaçamento"""
+    content = ' '.join(_VOLATILE_HTML.sub(' ', html_content).split())
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def row_hash(row):
+    """Hash do conteúdo da linha (independe da ordem das colunas)"""
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def task_identity_field(task):
+    """Campo de identidade da tarefa: o configurado ou, sem ele, o primeiro campo extraído"""
+    return task.get('identity_field') or (task.get('fields') or [None])[0]
+
+
+def keyed_rows(rows, identity_field):
+    """
+    Chave de identidade de cada linha.
+
+    Valores repetidos do campo de identidade recebem um sufixo "#2", "#3"...
+    (na ordem da página), para que nenhuma linha sobrescreva outra.
+
+    Returns:
+        dict: chave -> linha
+    """
+    keyed = {}
+    for row in rows:
+        identity = row.get(identity_field) if identity_field else None
+        identity = ' '.join(str(identity).split()) if identity not in (None, '') else ''
+        base_key = f"{identity_field}={identity}" if identity else f"#{row_hash(row)}"
+        key, occurrence = base_key, 1
+        while key in keyed:
+            occurrence += 1
+            key = f"{base_key}#{occurrence}"
+        keyed[key] = row
+    return keyed
+
+
+def diff_rows(snapshot, rows, identity_field):
+    """
+    Compara as linhas da execução atual com o snapshot da anterior.
+
+    Args:
+        snapshot: dict chave -> {'hash': ..., 'row': ...} da execução anterior
+        rows: Linhas extraídas agora
+        identity_field: Campo que identifica uma linha entre execuções
+
+    Returns:
+        dict: {
+            'new': [linha], 'changed': [{'row': atual, 'previous': anterior}], 'removed': [linha],
+            'unchanged': int,
+            'upserts': [(chave, hash, linha)], 'deleted_keys': [chave]  # para atualizar o snapshot
+        }
+    """
+    changes = {'new': [], 'changed': [], 'removed': [], 'unchanged': 0, 'upserts': [], 'deleted_keys': []}
+    current = keyed_rows(rows, identity_field)
+
+    for key, row in current.items():
+        digest = row_hash(row)
+        previous = snapshot.get(key)
+        if previous is None:
+            changes['new'].append(row)
+        elif previous['hash'] != digest:
+            changes['changed'].append({'row': row, 'previous': previous['row']})
+        else:
+            changes['unchanged'] += 1
+            continue
+        changes['upserts'].append((key, digest, row))
+
+    for key, previous in snapshot.items():
+        if key not in current:
+            changes['removed'].append(previous['row'])
+            changes['deleted_keys'].append(key)
+    return changes
+
+
+def has_changes(changes):
+    """True se a execução trouxe algum produto novo, alterado ou removido"""
+    return bool(changes and (changes['new'] or changes['changed'] or changes['removed']))
+
+
+def changed_fields(previous, row):
+    """Campos cujo valor mudou: [(campo, antes, depois)]"""
+    return [
+        (field, previous.get(field), row.get(field))
+        for field in dict.fromkeys([*previous, *row])
+        if previous.get(field) != row.get(field)
+    ]
+
+
+def change_rows(changes):
+    """Linhas novas/alteradas/removidas, com a coluna 'Mudança' (para gravar ou exibir)"""
+    return (
+        [{'Mudança': CHANGE_NEW, **row} for row in changes['new']]
+        + [{'Mudança': CHANGE_CHANGED, **item['row']} for item in changes['changed']]
+        + [{'Mudança': CHANGE_REMOVED, **row} for row in changes['removed']]
+    )
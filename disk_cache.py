@@ -0,0 +1,210 @@
+"""
+Cache persistente em disco com TTL e limite de tamanho (LRU).
+
+Cada entrada é endereçada pelo hash SHA-256 da chave e gravada como dois
+arquivos: <hash>.json (metadados) e <hash>.gz (conteúdo comprimido).
+O último acesso é registrado no mtime do arquivo de metadados, e as
+entradas menos usadas recentemente são removidas quando o cache passa do
+tamanho máximo.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def make_cache_key(*parts):
+    """Gera uma chave estável (hash SHA-256) a partir de várias partes"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, ensure_ascii=False, default=str)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Cache chave → conteúdo (str ou bytes) em disco.
+
+    Args:
+        directory: Pasta onde as entradas são gravadas
+        max_bytes: Tamanho máximo total (conteúdo comprimido); acima disso remove as menos usadas
+        default_ttl: Validade padrão das entradas em segundos (None = sem expiração)
+    """
+
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024, default_ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._total_bytes = None  # calculado sob demanda
+
+    def _paths(self, key):
+        name = make_cache_key(key)
+        return os.path.join(self.directory, name + '.json'), os.path.join(self.directory, name + '.gz')
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key, allow_stale=False):
+        """
+        Busca uma entrada.
+
+        Args:
+            key: Chave da entrada
+            allow_stale: Se True, retorna também entradas expiradas (para revalidação)
+
+        Returns:
+            dict: {'value': conteúdo, 'meta': metadados, 'expired': bool} ou None
+        """
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                raw = gzip.decompress(f.read())
+        except (OSError, ValueError):
+            return None
+
+        expires_at = meta.get('expires_at')
+        expired = expires_at is not None and time.time() > expires_at
+        if expired and not allow_stale:
+            return None
+
+        value = raw.decode('utf-8') if meta.get('is_text') else raw
+        try:
+            os.utime(meta_path, None)  # marca acesso para o LRU
+        except OSError:
+            pass
+        return {'value': value, 'meta': meta.get('extra', {}), 'expired': expired}
+
+    def set(self, key, value, meta=None, ttl=None):
+        """
+        Grava uma entrada (sobrescreve se já existir).
+
+        Args:
+            key: Chave da entrada
+            value: Conteúdo (str ou bytes)
+            meta: Dict opcional de metadados (serializável em JSON)
+            ttl: Validade em segundos (None usa default_ttl)
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        is_text = isinstance(value, str)
+        raw = value.encode('utf-8') if is_text else value
+        body = gzip.compress(raw, compresslevel=6)
+        record = {
+            'created_at': time.time(),
+            'expires_at': time.time() + ttl if ttl is not None else None,
+            'is_text': is_text,
+            'size': len(body),
+            'extra': meta or {}
+        }
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            previous_size = self._entry_size(meta_path)
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(record, ensure_ascii=False).encode('utf-8'))
+            if self._total_bytes is not None:
+                self._total_bytes += len(body) - previous_size
+            self._evict_if_needed()
+
+    def touch(self, key, ttl=None, meta=None):
+        """Renova a validade de uma entrada existente (ex: após resposta 304)"""
+        ttl = self.default_ttl if ttl is None else ttl
+        meta_path, _ = self._paths(key)
+        with self._lock:
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                return False
+            record['expires_at'] = time.time() + ttl if ttl is not None else None
+            if meta:
+                record.setdefault('extra', {}).update(meta)
+            self._write_atomic(meta_path, json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        return True
+
+    def delete(self, key):
+        """Remove uma entrada"""
+        meta_path, body_path = self._paths(key)
+        with self._lock:
+            size = self._entry_size(meta_path)
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            for meta_path, body_path, _, _ in self._scan():
+                for path in (meta_path, body_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._total_bytes = 0
+
+    def stats(self):
+        """Retorna {'entries': n, 'bytes': total} do cache"""
+        with self._lock:
+            entries = self._scan()
+            self._total_bytes = sum(size for _, _, size, _ in entries)
+            return {'entries': len(entries), 'bytes': self._total_bytes}
+
+    def _entry_size(self, meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('size', 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _scan(self):
+        """Lista (meta_path, body_path, tamanho, último_acesso) de todas as entradas"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[:-len('.json')] + '.gz'
+            try:
+                size = os.path.getsize(body_path)
+                last_access = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((meta_path, body_path, size, last_access))
+        return entries
+
+    def _evict_if_needed(self):
+        """Remove as entradas menos usadas recentemente até caber em max_bytes (chamar com lock)"""
+        if self.max_bytes is None:
+            return
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size, _ in self._scan())
+        if self._total_bytes <= self.max_bytes:
+            return
+        entries = sorted(self._scan(), key=lambda entry: entry[3])
+        total = sum(size for _, _, size, _ in entries)
+        for meta_path, body_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+        self._total_bytes = total
@@ -0,0 +1,491 @@
+"""
+Motor de extração de valores com seletores CSS/XPath.
+
+Contém a função unificada extract_element_value e o "plano de seletores":
+os seletores de um scraping são classificados (CSS ou XPath), compilados
+(etree.XPath / cssselect) e têm o modo de extração definido UMA vez por
+execução. Depois, o mesmo plano é aplicado em todas as páginas, sem
+repetir heurísticas nem recompilar seletores.
+
+Todas as abas (Multi-URL, Scraping em Massa, apply_selectors_to_url,
+apply_ai_per_url) passam por extract_document / extract_batch, que
+devolvem os valores em formato colunar ({campo: [valores]}) e têm helpers
+para montar o preview, as linhas completas e as linhas do Scraping em Massa.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from html_document import ParsedDocument, compile_css, element_tag, element_text, element_html
+
+# Pool de processos para parse + extração em lotes grandes
+DEFAULT_EXTRACT_PROCESSES = os.cpu_count() or 1
+PROCESS_POOL_MIN_PAGES = 20  # abaixo disso, o custo de iniciar processos não compensa
+
+# Palavras na descrição do campo que indicam que o HTML completo deve ser extraído
+HTML_FIELD_KEYWORDS = ['imagem', 'imagens', 'gif', 'gifs', 'completa', 'completo', 'html', 'screenshot', 'media']
+
+# Palavras no próprio seletor (Método Universal) que indicam extração de HTML
+HTML_SELECTOR_KEYWORDS = ['img', 'src', 'screenshot', 'image', 'description', 'game_area_description']
+
+
+def is_xpath_selector(selector):
+    """Detecta se um seletor digitado pelo usuário é XPath (senão é tratado como CSS)"""
+    return any([
+        selector.startswith('//'),
+        selector.startswith('/'),
+        selector.startswith('./'),
+        selector.startswith('(//'),
+        selector.startswith('(./'),
+        '::' in selector,  # eixos como descendant::, child::
+        '@' in selector and '/' in selector,  # atributos com path
+    ])
+
+
+def wants_html_for_field(descricao):
+    """True se a descrição do campo pede HTML completo (imagens, descrições completas, etc)"""
+    return any(palavra in descricao.lower() for palavra in HTML_FIELD_KEYWORDS)
+
+
+def _selector_hints(selector):
+    """Calcula (wants_img, wants_href) a partir do texto do seletor"""
+    selector_lower = selector.lower()
+    wants_src = '/@src' in selector or 'src' in selector_lower
+    wants_href = '/@href' in selector or 'href' in selector_lower
+    wants_img = 'img' in selector_lower or wants_src
+    return wants_img, wants_href
+
+
+def _extract_value(elem, tipo, is_xpath_attr, extrair_html, wants_img, wants_href):
+    """Núcleo de extract_element_value, com as dicas do seletor já calculadas"""
+    # 1. Se for atributo XPath (string), retornar direto
+    if is_xpath_attr and isinstance(elem, str):
+        return elem
+
+    # 2. CSS: Extrair de forma inteligente (elemento lxml ou BeautifulSoup)
+    tag_name = element_tag(elem)
+    if tipo == 'css' and tag_name is not None:
+        # Se for tag IMG ou seletor pede SRC
+        if tag_name == 'img' or wants_img:
+            src = elem.get('src', '') or elem.get('data-src', '')
+            if src:
+                return src
+
+        # Se for tag A ou seletor pede HREF
+        if tag_name == 'a' or wants_href:
+            href = elem.get('href', '')
+            if href:
+                return href
+
+        # Se deve extrair HTML completo (descrições com imagens/GIFs)
+        if extrair_html:
+            return element_html(elem)
+
+        # Extração padrão de texto
+        return element_text(elem)
+
+    # 3. XPath: Extrair de forma inteligente
+    elif tipo == 'xpath':
+        # Se deve extrair HTML completo
+        if extrair_html and hasattr(elem, 'tag'):
+            return lxml_html.tostring(elem, encoding='unicode')
+
+        # Extração padrão de texto
+        if hasattr(elem, 'text_content'):
+            return elem.text_content().strip()
+        else:
+            return str(elem)
+
+    # 4. Fallback padrão
+    if tipo == 'css':
+        return element_text(elem)
+    else:
+        return elem.text_content().strip() if hasattr(elem, 'text_content') else str(elem)
+
+
+# 🔧 FUNÇÃO UNIFICADA DE EXTRAÇÃO (usada em todas as abas)
+def extract_element_value(elem, selector, tipo='css', is_xpath_attr=False, extrair_html=False):
+    """
+    Função unificada para extrair valores de elementos HTML de forma inteligente.
+    Usada por todas as abas para garantir consistência.
+
+    Args:
+        elem: Elemento BeautifulSoup ou lxml (CSS via ParsedDocument retorna lxml)
+        selector: O seletor usado (para detecção automática)
+        tipo: 'css' ou 'xpath'
+        is_xpath_attr: True se for atributo XPath (ex: /@src)
+        extrair_html: True para forçar extração de HTML completo
+
+    Returns:
+        str: Valor extraído (texto, atributo ou HTML)
+    """
+    try:
+        # Se for atributo XPath (string), retornar direto
+        if is_xpath_attr and isinstance(elem, str):
+            return elem
+
+        # Detectar automaticamente o tipo de extração baseado no seletor
+        wants_img, wants_href = _selector_hints(selector)
+        return _extract_value(elem, tipo, is_xpath_attr, extrair_html, wants_img, wants_href)
+    except Exception as e:
+        # Em caso de erro, retornar string vazia ao invés de gerar exceção
+        return ''
+
+
+class CompiledSelector:
+    """
+    Um seletor já classificado e compilado, pronto para ser aplicado em várias páginas.
+
+    Os objetos compilados (etree.XPath / CSSSelector) não são serializáveis, então
+    são recriados sob demanda depois de um pickle (ex: envio para outro processo).
+
+    Args:
+        selector: Texto do seletor
+        tipo: 'css' ou 'xpath'
+        column: Nome da coluna/campo no resultado
+        extrair_html: True para extrair o HTML completo do elemento
+    """
+
+    def __init__(self, selector, tipo, column, extrair_html=False):
+        self.selector = selector
+        self.tipo = tipo
+        self.column = column
+        self.extrair_html = extrair_html
+        self.wants_img, self.wants_href = _selector_hints(selector)
+        self._compiled = None
+        self._compile_error = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_compiled'] = None
+        state['_compile_error'] = None
+        return state
+
+    def _compile(self):
+        if self._compiled is not None or self._compile_error is not None:
+            return
+        try:
+            if self.tipo == 'xpath':
+                self._compiled = etree.XPath(self.selector)
+            elif self.tipo == 'css':
+                # None = cssselect não suporta; cai no BeautifulSoup do documento
+                self._compiled = compile_css(self.selector) or False
+            else:
+                self._compiled = False
+        except Exception as e:
+            self._compile_error = e
+
+    def find(self, doc):
+        """Retorna os elementos (ou strings, para XPath de atributo) encontrados no documento"""
+        self._compile()
+        if self._compile_error is not None:
+            raise self._compile_error
+        if self.tipo == 'xpath':
+            return self._compiled(doc.tree)
+        if self.tipo == 'css':
+            if self._compiled:
+                return self._compiled(doc.tree)
+            return doc.soup.select(self.selector)
+        return []
+
+    def evaluate(self, doc):
+        """
+        Aplica o seletor no documento e extrai os valores não vazios.
+
+        Raises:
+            Exception: Se o seletor for inválido (para o chamador registrar o erro do campo)
+        """
+        elements = self.find(doc)
+        is_xpath_attr = isinstance(elements[0], str) if (self.tipo == 'xpath' and elements) else False
+        valores = []
+        for elem in elements:
+            try:
+                valor = _extract_value(elem, self.tipo, is_xpath_attr, self.extrair_html, self.wants_img, self.wants_href)
+            except Exception:
+                valor = ''
+            if valor is not None and str(valor).strip() != '':
+                valores.append(valor)
+        return valores
+
+
+class SelectorPlan:
+    """Lista ordenada de CompiledSelector aplicada igualmente a todas as páginas"""
+
+    def __init__(self, selectors):
+        self.selectors = list(selectors)
+
+    def __len__(self):
+        return len(self.selectors)
+
+    def __iter__(self):
+        return iter(self.selectors)
+
+    @property
+    def columns(self):
+        return [sel.column for sel in self.selectors]
+
+    @property
+    def unique_columns(self):
+        """Colunas sem repetição (campos com o mesmo nome viram uma coluna só)"""
+        return list(dict.fromkeys(self.columns))
+
+    def to_spec(self):
+        """Forma serializável em JSON do plano (para checkpoints de jobs)"""
+        return [
+            {'selector': sel.selector, 'tipo': sel.tipo, 'column': sel.column, 'extrair_html': sel.extrair_html}
+            for sel in self.selectors
+        ]
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Reconstrói o plano a partir de to_spec()"""
+        return cls(
+            CompiledSelector(item['selector'], item['tipo'], item['column'], extrair_html=item.get('extrair_html', False))
+            for item in spec
+        )
+
+
+def compile_selector_plan(seletores=None, selector_lines=None):
+    """
+    Monta o plano de seletores de uma execução.
+
+    Args:
+        seletores: Lista de dicts da IA ({'seletor', 'tipo', 'descricao'}); o modo HTML
+                   vem da descrição do campo e a coluna é a descrição
+        selector_lines: Texto com um seletor por linha (Método Universal); o tipo
+                        é detectado pelo formato, o modo HTML pelo próprio seletor
+                        e a coluna é o seletor completo
+
+    Returns:
+        SelectorPlan
+    """
+    compiled = []
+    for sel in seletores or []:
+        descricao = sel.get('descricao', 'Campo')
+        compiled.append(CompiledSelector(
+            sel.get('seletor', ''),
+            sel.get('tipo', 'css'),
+            descricao,
+            extrair_html=wants_html_for_field(descricao)
+        ))
+    if selector_lines:
+        for selector in [s.strip() for s in selector_lines.strip().split('\n') if s.strip()]:
+            compiled.append(CompiledSelector(
+                selector,
+                'xpath' if is_xpath_selector(selector) else 'css',
+                selector,
+                extrair_html=any(palavra in selector.lower() for palavra in HTML_SELECTOR_KEYWORDS)
+            ))
+    return SelectorPlan(compiled)
+
+
+def ensure_plan(seletores):
+    """Aceita um SelectorPlan pronto ou a lista de seletores da IA"""
+    if isinstance(seletores, SelectorPlan):
+        return seletores
+    return compile_selector_plan(seletores=seletores)
+
+
+def extract_document(doc, plan):
+    """
+    Aplica todos os seletores do plano em um documento.
+
+    Args:
+        doc: ParsedDocument ou HTML (str)
+        plan: SelectorPlan
+
+    Returns:
+        dict: {'valores': {campo: [valores]}, 'errors': {campo: mensagem}}
+    """
+    if not isinstance(doc, ParsedDocument):
+        doc = ParsedDocument(doc)
+    valores_por_campo = {}
+    errors = {}
+    for compiled_sel in plan:
+        try:
+            valores_por_campo[compiled_sel.column] = compiled_sel.evaluate(doc)
+        except Exception as e:
+            valores_por_campo[compiled_sel.column] = []
+            errors[compiled_sel.column] = str(e)
+    return {'valores': valores_por_campo, 'errors': errors}
+
+
+def _extract_page(content, plan):
+    """
+    Extrai uma página e devolve uma tupla compacta (fácil de enviar entre processos).
+
+    Returns:
+        tuple: (valores por coluna na ordem do plano, {campo: erro}, erro da página ou None)
+    """
+    columns = plan.unique_columns
+    if content is None:
+        return tuple([] for _ in columns), {}, 'HTML vazio ou inválido'
+    try:
+        extracted = extract_document(content, plan)
+    except Exception as e:
+        # Falha no parse da página inteira
+        return tuple([] for _ in columns), {}, str(e)
+    return tuple(extracted['valores'].get(column, []) for column in columns), extracted['errors'], None
+
+
+# Plano recebido por cada processo do pool (enviado uma vez por processo, não por página)
+_worker_plan = None
+
+
+def _init_worker(plan):
+    global _worker_plan
+    _worker_plan = plan
+
+
+def _extract_page_in_worker(content):
+    return _extract_page(content, _worker_plan)
+
+
+def _extract_pages_in_processes(contents, plan, processes, on_result):
+    """Distribui parse + extração num pool de processos, preservando a ordem das páginas"""
+    # spawn: não herda threads/estado do Streamlit e funciona igual em Linux, macOS e Windows
+    context = multiprocessing.get_context('spawn')
+    chunksize = max(1, len(contents) // (processes * 4))
+    results = []
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=_init_worker, initargs=(plan,)) as executor:
+        for result in executor.map(_extract_page_in_worker, contents, chunksize=chunksize):
+            results.append(result)
+            if on_result:
+                on_result(len(results), len(contents))
+    return results
+
+
+def extract_batch(pages, plan, on_result=None, processes=1):
+    """
+    Aplica o mesmo plano de seletores em várias páginas (API em lote).
+
+    Com processes > 1 e lotes grandes, o parse + extração (CPU) roda num pool
+    de processos: só o HTML e o plano de seletores vão para os processos, e
+    voltam apenas tuplas compactas com os valores.
+
+    Args:
+        pages: Lista de (fonte, html_ou_ParsedDocument); html None = página com erro
+        plan: SelectorPlan (ou lista de seletores da IA)
+        on_result: Callback opcional on_result(done, total) para progresso
+        processes: Número de processos para a extração (1 = na thread atual)
+
+    Returns:
+        dict colunar: {
+            'sources': [fonte, ...],
+            'columns': {campo: [[valores da página 0], [valores da página 1], ...]},
+            'errors': [{campo: mensagem} por página],
+            'page_errors': [mensagem ou None por página]
+        }
+    """
+    plan = ensure_plan(plan)
+    pages = list(pages)
+    columns = plan.unique_columns
+    batch = {
+        'sources': [source for source, _ in pages],
+        'columns': {column: [] for column in columns},
+        'errors': [],
+        'page_errors': []
+    }
+
+    page_results = None
+    if processes and processes > 1 and len(pages) >= PROCESS_POOL_MIN_PAGES:
+        # Documentos já analisados não são serializáveis: enviar só o HTML
+        contents = [content.html_content if isinstance(content, ParsedDocument) else content for _, content in pages]
+        try:
+            page_results = _extract_pages_in_processes(contents, plan, processes, on_result)
+        except Exception:
+            # Pool indisponível (ex: ambiente sem suporte a processos): extrair na thread atual
+            page_results = None
+
+    if page_results is None:
+        page_results = []
+        for _, content in pages:
+            page_results.append(_extract_page(content, plan))
+            if on_result:
+                on_result(len(page_results), len(pages))
+
+    for values, errors, page_error in page_results:
+        for column, column_values in zip(columns, values):
+            batch['columns'][column].append(column_values)
+        batch['errors'].append(errors)
+        batch['page_errors'].append(page_error)
+    return batch
+
+
+def batch_page(batch, index):
+    """Extrai de um lote colunar o resultado de uma página no formato de extract_document"""
+    return {
+        'valores': {column: values[index] for column, values in batch['columns'].items()},
+        'errors': batch['errors'][index]
+    }
+
+
+def build_preview(extracted):
+    """
+    Monta o preview (uma linha por campo) exibido na tela.
+
+    Returns:
+        list: [{'Campo', 'Valor', 'Total Encontrado'}]
+    """
+    data_preview = []
+    for descricao, valores in extracted['valores'].items():
+        if descricao in extracted['errors']:
+            data_preview.append({
+                'Campo': descricao,
+                'Valor': f"Erro: {extracted['errors'][descricao]}",
+                'Total Encontrado': 0
+            })
+        elif valores:
+            data_preview.append({
+                'Campo': descricao,
+                'Valor': valores[0] if len(valores) == 1 else ', '.join(str(v)[:100] for v in valores[:3]) + ('...' if len(valores) > 3 else ''),
+                'Total Encontrado': len(valores)
+            })
+        else:
+            data_preview.append({
+                'Campo': descricao,
+                'Valor': 'Nenhum resultado',
+                'Total Encontrado': 0
+            })
+    return data_preview
+
+
+def build_rows(extracted):
+    """
+    Estrutura os valores em linhas: cada linha junta os valores de mesmo índice de cada campo.
+
+    Returns:
+        list: [{campo: valor}] com '' onde o campo tem menos valores
+    """
+    valores_por_campo = extracted['valores']
+    data_full = []
+    if valores_por_campo:
+        max_len = max(len(v) for v in valores_por_campo.values())
+        for i in range(max_len):
+            row = {}
+            for descricao, valores in valores_por_campo.items():
+                row[descricao] = valores[i] if i < len(valores) else ''
+            data_full.append(row)
+    return data_full
+
+
+def build_summary_row(source, extracted, error_template=None):
+    """
+    Monta uma linha por fonte (Scraping em Massa): até 5 valores por campo, separados por vírgula.
+
+    Args:
+        source: URL ou nome do arquivo (coluna 'Fonte')
+        extracted: Resultado de extract_document
+        error_template: Formato do valor quando o seletor falha (ex: "ERRO: {}"); None = vazio
+    """
+    row = {'Fonte': source}
+    for descricao, valores in extracted['valores'].items():
+        if descricao in extracted['errors']:
+            row[descricao] = error_template.format(extracted['errors'][descricao]) if error_template else ''
+        else:
+            row[descricao] = valores[0] if len(valores) == 1 else ', '.join(str(v) for v in valores[:5]) + ('...' if len(valores) > 5 else '')
+    return row
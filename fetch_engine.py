@@ -0,0 +1,128 @@
+"""
+Motor de download concorrente de URLs.
+
+Distribui os downloads em um pool de threads respeitando dois limites:
+um limite global de requisições simultâneas e um limite por host, para
+não sobrecarregar uma única origem. Os resultados voltam na MESMA ordem
+das URLs de entrada; iter_fetch() entrega cada página assim que termina,
+para quem quer processar em streaming sem guardar todas em memória.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+# Limites padrão (podem ser sobrescritos em cada chamada)
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_MAX_PER_HOST = 4
+
+
+def get_host(url):
+    """Retorna o host (netloc) de uma URL, em minúsculas"""
+    try:
+        return urlparse(url).netloc.lower()
+    except Exception:
+        return ''
+
+
+def iter_fetch(urls, fetch_fn, max_workers=DEFAULT_MAX_WORKERS, max_per_host=DEFAULT_MAX_PER_HOST):
+    """
+    Versão geradora de fetch_concurrently: entrega cada download assim que termina.
+
+    Novos downloads só são disparados quando quem consome pede o próximo
+    resultado, então no máximo `max_workers` páginas ficam em memória ao
+    mesmo tempo (backpressure natural para pipelines em streaming).
+
+    Args:
+        urls: Lista (ou iterável) de URLs
+        fetch_fn: Função fetch_fn(url) -> dict no formato de fetch_html
+        max_workers: Máximo de downloads simultâneos no total
+        max_per_host: Máximo de downloads simultâneos para o mesmo host
+
+    Yields:
+        tuple: (índice da URL na entrada, resultado de fetch_fn), em ordem de conclusão
+    """
+    urls = list(urls)
+    if not urls:
+        return
+
+    max_workers = max(1, int(max_workers))
+    max_per_host = max(1, int(max_per_host))
+
+    # Fila de pendentes por host (mantém a ordem de entrada dentro de cada host)
+    pending_by_host = {}
+    host_order = []
+    for idx, url in enumerate(urls):
+        host = get_host(url)
+        if host not in pending_by_host:
+            pending_by_host[host] = deque()
+            host_order.append(host)
+        pending_by_host[host].append(idx)
+
+    in_flight_by_host = {host: 0 for host in host_order}
+    running = {}  # future -> (idx, host)
+
+    def _safe_fetch(url):
+        try:
+            return fetch_fn(url)
+        except Exception as e:
+            return {'url': url, 'html_content': None, 'status': 'error', 'error': str(e)}
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _fill_slots():
+        # Round-robin entre hosts para não privilegiar a primeira origem da lista
+        progressed = True
+        while progressed and len(running) < max_workers:
+            progressed = False
+            for host in host_order:
+                if len(running) >= max_workers:
+                    break
+                queue = pending_by_host[host]
+                if queue and in_flight_by_host[host] < max_per_host:
+                    idx = queue.popleft()
+                    future = executor.submit(_safe_fetch, urls[idx])
+                    running[future] = (idx, host)
+                    in_flight_by_host[host] += 1
+                    progressed = True
+
+    try:
+        _fill_slots()
+        while running:
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                idx, host = running.pop(future)
+                in_flight_by_host[host] -= 1
+                yield idx, future.result()
+            _fill_slots()
+    finally:
+        # Consumidor parou antes do fim: não disparar os downloads pendentes
+        for future in running:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def fetch_concurrently(urls, fetch_fn, max_workers=DEFAULT_MAX_WORKERS,
+                       max_per_host=DEFAULT_MAX_PER_HOST, on_result=None):
+    """
+    Baixa várias URLs em paralelo, com limite global e limite por host.
+
+    Args:
+        urls: Lista de URLs (a ordem é preservada no resultado)
+        fetch_fn: Função fetch_fn(url) -> dict no formato de fetch_html
+        max_workers: Máximo de downloads simultâneos no total
+        max_per_host: Máximo de downloads simultâneos para o mesmo host
+        on_result: Callback opcional on_result(done, total, result), chamado na
+                   thread de quem chamou (seguro para atualizar a UI do Streamlit)
+
+    Returns:
+        list: Resultados de fetch_fn, na mesma ordem de `urls`
+    """
+    total = len(urls)
+    results = [None] * total
+    done_count = 0
+    for idx, result in iter_fetch(urls, fetch_fn, max_workers=max_workers, max_per_host=max_per_host):
+        results[idx] = result
+        done_count += 1
+        if on_result:
+            on_result(done_count, total, result)
+    return results
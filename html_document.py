@@ -0,0 +1,148 @@
+"""
+Documento HTML analisado UMA única vez.
+
+ParsedDocument faz o parse com lxml uma vez e atende tanto seletores CSS
+quanto XPath na mesma árvore. O BeautifulSoup só é construído se alguém
+realmente pedir (doc.soup) ou se o seletor CSS usar algo que o cssselect
+não suporta (ex: :-soup-contains).
+"""
+from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxml_html
+
+try:
+    from lxml.cssselect import CSSSelector
+    from cssselect import SelectorError
+    CSSSELECT_AVAILABLE = True
+except ImportError:
+    CSSSELECT_AVAILABLE = False
+
+# Tags cujo conteúdo não é texto visível (mesmo critério do get_text do BeautifulSoup)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Seletores CSS já compilados (evita recompilar o mesmo seletor em cada página)
+_css_cache = {}
+_CSS_CACHE_MAX = 512
+
+
+def compile_css(selector):
+    """
+    Compila um seletor CSS para lxml (com cache).
+
+    Returns:
+        CSSSelector ou None se o cssselect não suportar o seletor
+    """
+    if not CSSSELECT_AVAILABLE:
+        return None
+    if selector in _css_cache:
+        return _css_cache[selector]
+    try:
+        compiled = CSSSelector(selector, translator='html')
+    except (SelectorError, etree.XPathError, ValueError):
+        compiled = None
+    if len(_css_cache) >= _CSS_CACHE_MAX:
+        _css_cache.clear()
+    _css_cache[selector] = compiled
+    return compiled
+
+
+def is_lxml_element(elem):
+    """True se for um elemento lxml (não string de atributo/texto)"""
+    return isinstance(elem, etree._Element) and isinstance(elem.tag, str)
+
+
+def element_tag(elem):
+    """Nome da tag de um elemento lxml ou BeautifulSoup (None se não for elemento)"""
+    if is_lxml_element(elem):
+        return elem.tag.lower()
+    return getattr(elem, 'name', None)
+
+
+def element_text(elem):
+    """
+    Texto do elemento no mesmo formato de BeautifulSoup.get_text(strip=True):
+    cada trecho de texto sem espaços nas pontas, concatenados, ignorando
+    comentários e conteúdo de <script>/<style>.
+    """
+    if hasattr(elem, 'get_text'):
+        return elem.get_text(strip=True)
+    if not is_lxml_element(elem):
+        return str(elem).strip()
+
+    parts = []
+    # Percurso em profundidade sem recursão (páginas podem ter DOM muito profundo)
+    stack = [(elem, False)]
+    while stack:
+        node, is_tail = stack.pop()
+        if is_tail:
+            if node.tail:
+                parts.append(node.tail.strip())
+            continue
+        if node is not elem:
+            stack.append((node, True))
+        if isinstance(node.tag, str) and node.tag.lower() not in NON_TEXT_TAGS:
+            if node.text:
+                parts.append(node.text.strip())
+            for child in reversed(node):
+                stack.append((child, False))
+    return ''.join(parts)
+
+
+def element_html(elem):
+    """HTML externo do elemento (sem o texto que vem depois dele)"""
+    if is_lxml_element(elem):
+        return lxml_html.tostring(elem, encoding='unicode', with_tail=False)
+    return str(elem)
+
+
+class ParsedDocument:
+    """
+    Página HTML analisada uma única vez, com CSS e XPath na mesma árvore lxml.
+
+    Args:
+        html_content: HTML da página
+        soup: BeautifulSoup já existente (opcional, evita um segundo parse)
+    """
+
+    def __init__(self, html_content, soup=None):
+        self.html_content = html_content
+        self._tree = None
+        self._soup = soup
+
+    @property
+    def tree(self):
+        """Árvore lxml (parse feito na primeira vez que é usada)"""
+        if self._tree is None:
+            try:
+                self._tree = lxml_html.fromstring(self.html_content)
+            except ValueError:
+                # lxml recusa str com <?xml encoding=...?> (páginas XHTML): parse dos bytes em UTF-8,
+                # forçando o encoding (senão lxml usaria o charset declarado e embaralharia os acentos)
+                self._tree = lxml_html.fromstring(
+                    self.html_content.encode('utf-8'), parser=lxml_html.HTMLParser(encoding='utf-8')
+                )
+        return self._tree
+
+    @property
+    def soup(self):
+        """BeautifulSoup construído só quando necessário"""
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html_content, 'lxml')
+        return self._soup
+
+    def select(self, selector):
+        """
+        Aplica um seletor CSS.
+        Usa a árvore lxml quando o cssselect suporta o seletor; senão cai no BeautifulSoup.
+
+        Returns:
+            list: Elementos encontrados (lxml ou BeautifulSoup)
+        """
+        compiled = compile_css(selector)
+        if compiled is not None:
+            return compiled(self.tree)
+        return self.soup.select(selector)
+
+    def xpath(self, selector):
+        """Aplica uma expressão XPath na árvore lxml"""
+        return self.tree.xpath(selector)
@@ -0,0 +1,378 @@
+"""
+Limpeza e redução do HTML enviado para a IA dentro de um orçamento de tokens.
+
+clean_html faz a limpeza (scripts, estilos, comentários, iframes e atributos
+inúteis) numa única passada pela árvore lxml, sem montar um BeautifulSoup
+nem serializar com str(soup) - cerca de 10x mais rápido em páginas grandes.
+
+Substitui o corte cego em 200 mil caracteres (que muitas vezes jogava fora
+justamente a parte da página que o usuário pediu). As etapas são aplicadas
+em ordem, parando assim que o HTML cabe no orçamento:
+
+1. Deduplicar classes e encurtar atributos enormes (srcset, JSON em data-*)
+2. Encurtar textos longos (menos os que têm palavras do pedido)
+3. Colapsar irmãos repetidos: de 200 cards iguais ficam 3 + um comentário
+   dizendo quantos foram omitidos
+4. Remover os maiores blocos sem relação com o pedido
+5. Último recurso: corte no tamanho do orçamento
+
+No modo 'selectors' (IA identifica seletores) a etapa 3 sempre roda: a IA
+só precisa ver a estrutura de alguns itens. No modo 'data' (IA extrai os
+valores) ela só roda se necessário, porque os itens repetidos podem ser
+justamente os dados pedidos.
+"""
+import copy
+import os
+import re
+import unicodedata
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from page_fingerprint import element_signature
+
+# Estimativa de tokens: HTML tem ~3.5 caracteres por token nos tokenizadores atuais
+CHARS_PER_TOKEN = 3.5
+
+# Orçamento padrão de tokens do HTML por provedor (o resto do contexto fica para prompt e resposta)
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('AI_HTML_TOKEN_BUDGET', 50000))
+PROVIDER_TOKEN_BUDGETS = {
+    "OpenAI (ChatGPT)": int(os.environ.get('OPENAI_HTML_TOKEN_BUDGET', 50000)),
+    "Anthropic (Claude)": int(os.environ.get('ANTHROPIC_HTML_TOKEN_BUDGET', 50000)),
+    "Google (Gemini)": int(os.environ.get('GEMINI_HTML_TOKEN_BUDGET', 100000)),
+}
+
+MAX_SIBLING_REPEATS = 3  # irmãos iguais mantidos ao colapsar
+DATA_SIBLING_REPEATS = (50, 20, 10)  # no modo 'data', tenta manter mais itens antes de cair para 3
+MAX_RELEVANT_REPEATS = 2  # irmãos extras mantidos por conterem palavras do pedido
+MAX_TEXT_CHARS = 300  # textos maiores são encurtados
+MAX_RELEVANT_TEXT_CHARS = 1500  # limite para textos com palavras do pedido
+MAX_ATTR_CHARS = 200  # atributos maiores são encurtados
+
+# Regras de limpeza (as mesmas da versão antiga com BeautifulSoup)
+CLEAN_REMOVE_TAGS = {'script', 'style', 'noscript'}
+CLEAN_VIDEO_DOMAINS = ('youtube.com', 'vimeo.com', 'dailymotion.com')  # iframes mantidos
+CLEAN_REMOVE_ATTRS = {'style', 'data-gtm', 'data-analytics', 'data-track'}  # além dos on* (eventos)
+
+# Palavras do pedido que não ajudam a achar o conteúdo
+_STOPWORDS = {
+    'quero', 'extrair', 'pegar', 'obter', 'todos', 'todas', 'cada', 'para', 'com', 'sem', 'dos', 'das',
+    'do', 'da', 'de', 'e', 'o', 'a', 'os', 'as', 'um', 'uma', 'que', 'por', 'na', 'no', 'nas', 'nos',
+    'the', 'and', 'of', 'all', 'get', 'extract', 'pagina', 'page', 'site', 'dados', 'campo', 'campos'
+}
+
+# Sinônimos comuns nos pedidos (português → como aparece no HTML)
+_QUERY_SYNONYMS = {
+    'preco': ['price', 'valor', 'r$', 'discount', 'desconto'],
+    'valor': ['price', 'preco'],
+    'titulo': ['title', 'name', 'nome', 'h1'],
+    'nome': ['name', 'title', 'titulo'],
+    'imagem': ['img', 'image', 'src', 'foto', 'photo'],
+    'imagens': ['img', 'image', 'src', 'foto', 'photo', 'gallery'],
+    'foto': ['img', 'image', 'photo'],
+    'descricao': ['description', 'desc', 'detalhes', 'details'],
+    'avaliacao': ['rating', 'review', 'stars', 'nota'],
+    'avaliacoes': ['rating', 'review', 'reviews', 'stars'],
+    'link': ['href', 'url'],
+    'links': ['href', 'url'],
+    'data': ['date', 'time', 'datetime'],
+    'autor': ['author', 'by'],
+    'categoria': ['category', 'breadcrumb'],
+    'estoque': ['stock', 'availability', 'disponivel'],
+    'tags': ['tag', 'label'],
+}
+
+
+def estimate_tokens(text):
+    """Estimativa rápida de tokens de um texto/HTML"""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def token_budget_for(ai_provider):
+    """Orçamento de tokens do HTML para o provedor (DEFAULT_TOKEN_BUDGET se desconhecido)"""
+    return PROVIDER_TOKEN_BUDGETS.get(ai_provider, DEFAULT_TOKEN_BUDGET)
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return text.lower()
+
+
+def query_keywords(user_query):
+    """Palavras-chave do pedido (sem acentos/stopwords) + sinônimos usados em HTML"""
+    words = set()
+    for word in re.findall(r'[a-z0-9$]+', _normalize(user_query)):
+        if len(word) < 3 or word in _STOPWORDS:
+            continue
+        words.add(word)
+        words.update(_QUERY_SYNONYMS.get(word, []))
+    return words
+
+
+def _is_relevant(elem, keywords):
+    """Elemento cujo texto próprio, classe/id ou tag menciona alguma palavra do pedido"""
+    if not keywords:
+        return False
+    haystack = _normalize(' '.join([
+        elem.tag if isinstance(elem.tag, str) else '',
+        elem.get('class', '') or '',
+        elem.get('id', '') or '',
+        elem.get('itemprop', '') or '',
+        (elem.text or '')[:MAX_RELEVANT_TEXT_CHARS]
+    ]))
+    return any(keyword in haystack for keyword in keywords)
+
+
+def _drop(elem, replacement=None):
+    """Remove um elemento preservando o texto que vem depois dele (tail)"""
+    parent = elem.getparent()
+    if parent is None:
+        return
+    tail = elem.tail
+    if replacement is not None:
+        replacement.tail = tail
+        elem.addprevious(replacement)
+    elif tail and tail.strip():
+        previous = elem.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + tail
+        else:
+            parent.text = (parent.text or '') + tail
+    parent.remove(elem)
+
+
+def _clean_tree(root):
+    """
+    Limpa a árvore: scripts/estilos/comentários saem direto no lxml (em C, preservando
+    o texto que vem depois deles) e uma única passada em Python cuida dos iframes e
+    dos atributos inúteis de cada elemento.
+    """
+    etree.strip_elements(root, *CLEAN_REMOVE_TAGS, etree.Comment, with_tail=False)
+    to_remove = []
+    for elem in root.iter(etree.Element):
+        if elem.tag == 'iframe' and not any(domain in (elem.get('src') or '') for domain in CLEAN_VIDEO_DOMAINS):
+            to_remove.append(elem)
+            continue
+        keys = elem.keys()
+        if keys:
+            attrib = elem.attrib
+            for attr in keys:
+                if attr.startswith('on') or attr in CLEAN_REMOVE_ATTRS:
+                    del attrib[attr]
+    for elem in to_remove:
+        _drop(elem)
+
+
+def _parse_document(html_content):
+    """Parse do documento inteiro (aceita str com declaração de encoding)"""
+    try:
+        return lxml_html.document_fromstring(html_content)
+    except ValueError:
+        # lxml recusa str com <?xml encoding=...?>; parse dos bytes resolve
+        return lxml_html.document_fromstring(html_content.encode('utf-8'))
+
+
+def clean_html(html_content):
+    """
+    Remove do HTML o que não serve para a IA, mantendo links, imagens, textos,
+    classes/IDs e data-*.
+
+    Remove scripts, estilos, <noscript>, comentários, iframes que não são de vídeo
+    e os atributos de eventos (on*), style e de tracking (data-gtm, data-analytics,
+    data-track).
+
+    Args:
+        html_content: HTML da página
+
+    Returns:
+        dict: {'html': HTML limpo, 'bytes_in': tamanho original, 'bytes_out': tamanho limpo}
+              (em caso de erro de parse, o HTML original é devolvido sem alterações)
+    """
+    bytes_in = len(html_content.encode('utf-8'))
+    try:
+        root = _parse_document(html_content)
+    except (etree.ParserError, ValueError):
+        return {'html': html_content, 'bytes_in': bytes_in, 'bytes_out': bytes_in}
+    _clean_tree(root)
+    cleaned = _serialize(root)
+    return {'html': cleaned, 'bytes_in': bytes_in, 'bytes_out': len(cleaned.encode('utf-8'))}
+
+
+def _shorten(text, limit):
+    if text and len(text) > limit:
+        return text[:limit].rstrip() + '…'
+    return text
+
+
+def _serialize(root):
+    return lxml_html.tostring(root, encoding='unicode')
+
+
+def _compact_attributes(root):
+    """Etapa 1: classes sem repetição e atributos enormes encurtados"""
+    for elem in root.iter():
+        if not isinstance(elem.tag, str):
+            continue
+        for attr, value in list(elem.attrib.items()):
+            if attr == 'class':
+                unique = list(dict.fromkeys(value.split()))
+                elem.set('class', ' '.join(unique))
+            elif attr == 'srcset':
+                # src já diz qual é a imagem
+                del elem.attrib[attr]
+            elif len(value) > MAX_ATTR_CHARS and attr not in ('href', 'src'):
+                elem.set(attr, _shorten(value, MAX_ATTR_CHARS))
+
+
+def _shorten_texts(root, keywords):
+    """Etapa 2: textos longos encurtados (os que têm palavras do pedido ficam maiores)"""
+    for elem in root.iter():
+        if not isinstance(elem.tag, str):
+            continue
+        for attr in ('text', 'tail'):
+            value = getattr(elem, attr)
+            if not value or len(value) <= MAX_TEXT_CHARS:
+                continue
+            relevant = any(keyword in _normalize(value[:MAX_RELEVANT_TEXT_CHARS]) for keyword in keywords)
+            setattr(elem, attr, _shorten(value, MAX_RELEVANT_TEXT_CHARS if relevant else MAX_TEXT_CHARS))
+
+
+def _collapse_repeated_siblings(root, keywords, max_repeats=MAX_SIBLING_REPEATS):
+    """Etapa 3: de cada grupo de irmãos com a mesma assinatura, manter só `max_repeats`"""
+    collapsed = 0
+    for parent in list(root.iter()):
+        if not isinstance(parent.tag, str):
+            continue
+        groups = {}
+        for child in parent:
+            if isinstance(child.tag, str):
+                groups.setdefault(element_signature(child), []).append(child)
+        for signature, children in groups.items():
+            if len(children) <= max_repeats:
+                continue
+            extras = 0
+            omitted = []
+            for child in children[max_repeats:]:
+                if extras < MAX_RELEVANT_REPEATS and _is_relevant(child, keywords):
+                    extras += 1
+                    continue
+                omitted.append(child)
+            if not omitted:
+                continue
+            for child in omitted[:-1]:
+                _drop(child)
+            _drop(omitted[-1], etree.Comment(f" +{len(omitted)} elementos {signature} semelhantes omitidos "))
+            collapsed += len(omitted)
+    return collapsed
+
+
+def _prune_irrelevant(root, keywords, max_chars):
+    """Etapa 4: remover os maiores blocos sem nenhuma relação com o pedido até caber no orçamento"""
+    # Tamanho aproximado e relevância de cada subárvore (pré-ordem invertida = filhos antes dos pais)
+    elements = [elem for elem in root.iter() if isinstance(elem.tag, str)]
+    size = {}
+    relevant = {}
+    for elem in reversed(elements):
+        own = 2 * len(elem.tag) + 5 + len(elem.text or '') + len(elem.tail or '')
+        own += sum(len(k) + len(v) + 4 for k, v in elem.attrib.items())
+        children = [child for child in elem if isinstance(child.tag, str)]
+        size[elem] = own + sum(size[child] for child in children)
+        relevant[elem] = _is_relevant(elem, keywords) or any(relevant[child] for child in children)
+
+    total = size.get(root, 0)
+    if total <= max_chars:
+        return 0
+    # Blocos irrelevantes máximos (o pai é relevante) - os maiores saem primeiro
+    candidates = [
+        elem for elem in elements
+        if elem is not root and not relevant[elem] and relevant.get(elem.getparent(), True)
+        and elem.tag not in ('html', 'body', 'head')
+    ]
+    candidates.sort(key=lambda elem: size[elem], reverse=True)
+    removed = 0
+    for elem in candidates:
+        if total <= max_chars:
+            break
+        total -= size[elem]
+        _drop(elem, etree.Comment(f" {element_signature(elem)} omitido "))
+        removed += 1
+    return removed
+
+
+def reduce_html_for_ai(html_content, user_query='', token_budget=DEFAULT_TOKEN_BUDGET, mode='selectors'):
+    """
+    Reduz o HTML (já limpo) para caber em `token_budget` tokens preservando o que o pedido precisa.
+
+    Args:
+        html_content: HTML limpo (saída de clean_html_for_ai)
+        user_query: Pedido do usuário (define o que é relevante)
+        token_budget: Máximo de tokens estimados para o HTML
+        mode: 'selectors' (estrutura basta, colapsa repetições sempre) ou 'data' (valores importam)
+
+    Returns:
+        dict: {'html': HTML reduzido, 'tokens_in': estimativa antes, 'tokens_out': estimativa depois,
+               'steps': etapas aplicadas}
+    """
+    tokens_in = estimate_tokens(html_content)
+    result = {'html': html_content, 'tokens_in': tokens_in, 'tokens_out': tokens_in, 'steps': []}
+    max_chars = int(token_budget * CHARS_PER_TOKEN)
+    if tokens_in <= token_budget and mode != 'selectors':
+        return result
+
+    try:
+        root = lxml_html.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        result['html'] = html_content[:max_chars]
+        result['tokens_out'] = estimate_tokens(result['html'])
+        result['steps'].append('truncate')
+        return result
+
+    keywords = query_keywords(user_query)
+    steps = result['steps']
+
+    def _fits():
+        html_out = _serialize(root)
+        return html_out if len(html_out) <= max_chars else None
+
+    _compact_attributes(root)
+    steps.append('attributes')
+
+    if mode == 'selectors':
+        # A IA só precisa da estrutura de alguns itens repetidos
+        if _collapse_repeated_siblings(root, keywords):
+            steps.append('collapse')
+
+    html_out = _fits()
+    if html_out is None:
+        _shorten_texts(root, keywords)
+        steps.append('texts')
+        html_out = _fits()
+
+    if html_out is None and mode != 'selectors':
+        # Manter o máximo de itens repetidos que couber (eles podem ser os dados pedidos)
+        for max_repeats in DATA_SIBLING_REPEATS:
+            candidate = copy.deepcopy(root)
+            _collapse_repeated_siblings(candidate, keywords, max_repeats)
+            html_candidate = _serialize(candidate)
+            if len(html_candidate) <= max_chars:
+                root, html_out = candidate, html_candidate
+                steps.append('collapse')
+                break
+        else:
+            if _collapse_repeated_siblings(root, keywords):
+                steps.append('collapse')
+            html_out = _fits()
+
+    if html_out is None:
+        if _prune_irrelevant(root, keywords, max_chars):
+            steps.append('prune')
+        html_out = _fits()
+
+    if html_out is None:
+        # Último recurso: o que sobrou ainda passa do orçamento
+        html_out = _serialize(root)[:max_chars]
+        steps.append('truncate')
+
+    result['html'] = html_out
+    result['tokens_out'] = estimate_tokens(html_out)
+    return result
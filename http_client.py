@@ -0,0 +1,204 @@
+"""
+Camada HTTP compartilhada.
+
+Todas as requisições do app (fetch_html, load_page_with_browser, botão
+"Carregar Página", Scraping em Massa e proxy_server) passam por uma única
+requests.Session com pool de conexões keep-alive e retry automático, para
+não pagar um handshake TCP/TLS novo a cada página do mesmo site.
+
+cached_get_text() adiciona um cache de respostas em disco com revalidação
+condicional (If-None-Match / If-Modified-Since): dentro do TTL a página vem
+do disco; depois dele, uma resposta 304 reaproveita o conteúdo salvo.
+"""
+import http.cookiejar
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from disk_cache import DiskCache
+
+# Configuração padrão (pode ser sobrescrita por variáveis de ambiente)
+DEFAULT_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 32))  # hosts diferentes mantidos no pool
+DEFAULT_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 8))  # conexões por host
+DEFAULT_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))
+DEFAULT_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', 0.5))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Cache de respostas HTTP em disco
+HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', os.path.join('.cache', 'http'))
+HTTP_CACHE_TTL = int(os.environ.get('HTTP_CACHE_TTL', 600))  # segundos sem nenhuma requisição
+HTTP_CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_MB', 500)) * 1024 * 1024
+
+response_cache = DiskCache(HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES, default_ttl=HTTP_CACHE_TTL)
+
+_session = None
+_session_config = None
+_session_lock = threading.Lock()
+
+
+def _build_session(pool_connections, pool_maxsize, max_retries, backoff_factor):
+    """Cria uma Session com adapters de pool e retry para http e https"""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry,
+        pool_block=False
+    )
+    session = requests.Session()
+    # A sessão é compartilhada entre usuários, sites e threads: nunca guarda Set-Cookie,
+    # só vão os cookies passados explicitamente (que fazem parte da chave do cache)
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def configure_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                      max_retries=DEFAULT_MAX_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR):
+    """
+    (Re)configura a sessão compartilhada.
+    Só recria a sessão se a configuração mudou, para preservar as conexões abertas.
+
+    Args:
+        pool_connections: Quantos hosts diferentes manter no pool
+        pool_maxsize: Máximo de conexões keep-alive por host
+        max_retries: Tentativas extras em erros de conexão e status 429/5xx
+        backoff_factor: Fator de espera exponencial entre tentativas
+    """
+    global _session, _session_config
+    config = (int(pool_connections), int(pool_maxsize), int(max_retries), float(backoff_factor))
+    with _session_lock:
+        if _session is not None and _session_config == config:
+            return _session
+        old_session = _session
+        _session = _build_session(*config)
+        _session_config = config
+    if old_session is not None:
+        old_session.close()
+    return _session
+
+
+def get_session():
+    """Retorna a sessão HTTP compartilhada (cria na primeira chamada)"""
+    if _session is None:
+        return configure_session()
+    return _session
+
+
+def http_get(url, headers=None, cookies=None, timeout=10, **kwargs):
+    """
+    GET usando a sessão compartilhada.
+    Mesma assinatura básica de requests.get (retorna requests.Response).
+    """
+    return get_session().get(url, headers=headers, cookies=cookies, timeout=timeout, **kwargs)
+
+
+def cached_get_text(url, method='python', request_url=None, headers=None, cookies=None, timeout=10,
+                    ttl=None, force_refresh=False, use_cache=True):
+    """
+    GET com cache em disco e revalidação por ETag/Last-Modified.
+
+    A chave do cache é URL + método ('python'/'proxy') + cookies, então a mesma
+    página buscada por caminhos diferentes não se mistura.
+
+    Args:
+        url: URL lógica da página (usada na chave do cache)
+        method: 'python' ou 'proxy' (faz parte da chave)
+        request_url: URL efetivamente requisitada (ex: via corsproxy.io); padrão = url
+        headers: Headers da requisição
+        cookies: Cookies da requisição (fazem parte da chave)
+        timeout: Timeout da requisição
+        ttl: Segundos em que a entrada vale sem revalidar (padrão HTTP_CACHE_TTL)
+        force_refresh: Ignora o cache e baixa a página completa novamente
+        use_cache: False desativa totalmente o cache (nem lê, nem grava)
+
+    Returns:
+        str: Conteúdo da resposta
+
+    Raises:
+        requests.exceptions.RequestException: Em erros de rede ou status HTTP de erro
+    """
+    request_url = request_url or url
+    if not use_cache:
+        response = http_get(request_url, headers=headers, cookies=cookies, timeout=timeout)
+        response.raise_for_status()
+        return response.text
+
+    cache_key = ('GET', method, url, sorted((cookies or {}).items()))
+    entry = None if force_refresh else response_cache.get(cache_key, allow_stale=True)
+    if entry and not entry['expired']:
+        return entry['value']
+
+    request_headers = dict(headers or {})
+    if entry:
+        # Requisição condicional: servidor responde 304 se nada mudou
+        if entry['meta'].get('etag'):
+            request_headers['If-None-Match'] = entry['meta']['etag']
+        if entry['meta'].get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['meta']['last_modified']
+
+    response = http_get(request_url, headers=request_headers, cookies=cookies, timeout=timeout)
+    if response.status_code == 304 and entry:
+        response_cache.touch(cache_key, ttl=ttl)
+        return entry['value']
+
+    response.raise_for_status()
+    text = response.text
+    if response.status_code == 200:
+        response_cache.set(cache_key, text, meta={
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }, ttl=ttl)
+    return text
+
+
+def conditional_get_text(url, etag=None, last_modified=None, headers=None, cookies=None, timeout=10):
+    """
+    GET condicional sem o cache em disco, para quem guarda os validadores por conta própria
+    (ex: tarefas agendadas, que precisam saber se a página mudou desde a última execução).
+
+    Args:
+        url: URL requisitada
+        etag: ETag da última resposta (envia If-None-Match)
+        last_modified: Last-Modified da última resposta (envia If-Modified-Since)
+        headers: Headers da requisição
+        cookies: Cookies da requisição
+        timeout: Timeout da requisição
+
+    Returns:
+        dict: {'not_modified': bool (resposta 304), 'text': str ou None, 'etag': ..., 'last_modified': ...}
+
+    Raises:
+        requests.exceptions.RequestException: Em erros de rede ou status HTTP de erro
+    """
+    request_headers = dict(headers or {})
+    if etag:
+        request_headers['If-None-Match'] = etag
+    if last_modified:
+        request_headers['If-Modified-Since'] = last_modified
+
+    response = http_get(url, headers=request_headers, cookies=cookies, timeout=timeout)
+    if response.status_code == 304:
+        return {'not_modified': True, 'text': None, 'etag': etag, 'last_modified': last_modified}
+    response.raise_for_status()
+    return {
+        'not_modified': False,
+        'text': response.text,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
@@ -0,0 +1,263 @@
+"""
+Checkpoints persistentes dos jobs em segundo plano.
+
+Cada job grava em disco os parâmetros necessários para recomeçar e, a cada
+URL concluída, uma linha no arquivo de progresso (JSON Lines, só append):
+índice, fonte, linhas extraídas ou erro. Se o app cair ou for reiniciado no
+meio de uma lista grande, o job é retomado pulando o que já foi feito, sem
+baixar de novo nem pagar a IA de novo pelas URLs já concluídas.
+
+Estrutura em disco:
+    <JOB_CHECKPOINT_DIR>/<id>/meta.json       parâmetros, status, dono, contadores done/failed
+    <JOB_CHECKPOINT_DIR>/<id>/progress.jsonl  uma linha por URL processada
+"""
+import json
+import os
+import shutil
+import threading
+import time
+
+JOB_CHECKPOINT_DIR = os.environ.get('JOB_CHECKPOINT_DIR', os.path.join('.cache', 'jobs'))
+JOB_CHECKPOINT_KEEP_FINISHED = 20  # checkpoints concluídos mantidos (os mais antigos são apagados)
+COUNTS_WRITE_INTERVAL = 1.0  # segundos entre gravações dos contadores done/failed em meta.json
+
+# Status gravados no checkpoint (um job que estava 'running' quando o app caiu continua 'running' no disco)
+RESUMABLE_STATUSES = {'running', 'paused', 'stopped', 'error'}
+
+
+class JobCheckpoint:
+    """
+    Checkpoint de um job.
+
+    Args:
+        checkpoint_id: Identificador (o mesmo ID do job)
+        directory: Pasta raiz dos checkpoints
+    """
+
+    def __init__(self, checkpoint_id, directory=JOB_CHECKPOINT_DIR):
+        self.id = checkpoint_id
+        self.path = os.path.join(directory, checkpoint_id)
+        self._meta_path = os.path.join(self.path, 'meta.json')
+        self._progress_path = os.path.join(self.path, 'progress.jsonl')
+        self._lock = threading.Lock()
+        self._line_checked = False
+        self._statuses = None  # {índice: falhou?} - carregado do progresso no primeiro record()
+        self._counts_written_at = 0
+
+    @classmethod
+    def create(cls, checkpoint_id, kind, title, params, total, owner=None, directory=JOB_CHECKPOINT_DIR):
+        """
+        Cria um checkpoint novo.
+
+        Args:
+            checkpoint_id: Identificador (o mesmo ID do job)
+            kind: Tipo do job ('bulk', 'multi_url_ai', ...)
+            title: Título exibido na interface
+            params: Dict serializável em JSON com tudo que o job precisa para recomeçar
+            total: Número de URLs do job
+            owner: Usuário dono do job
+        """
+        checkpoint = cls(checkpoint_id, directory)
+        os.makedirs(checkpoint.path, exist_ok=True)
+        checkpoint._write_meta({
+            'id': checkpoint_id,
+            'kind': kind,
+            'title': title,
+            'owner': owner,
+            'params': params,
+            'total': total,
+            'done': 0,
+            'failed': 0,
+            'status': 'running',
+            'created_at': time.time(),
+            'updated_at': time.time()
+        })
+        return checkpoint
+
+    def _write_meta(self, meta):
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path)
+
+    def load_meta(self):
+        """Retorna os metadados do checkpoint (ou None se não existir)"""
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set_status(self, status):
+        """Atualiza o status gravado ('running', 'paused', 'stopped', 'completed', 'error')"""
+        with self._lock:
+            meta = self.load_meta()
+            if meta is None:
+                return
+            meta['status'] = status
+            meta['updated_at'] = time.time()
+            self._write_meta(self._with_current_counts(meta))
+
+    def update_meta(self, **fields):
+        """Grava campos extras nos metadados (ex: o lote enviado à IA, para retomar sem reenviar)"""
+        with self._lock:
+            meta = self.load_meta()
+            if meta is None:
+                return
+            meta.update(fields)
+            meta['updated_at'] = time.time()
+            self._write_meta(self._with_current_counts(meta))
+
+    def _with_current_counts(self, meta):
+        """Atualiza done/failed no meta com o que este processo já registrou (chamar com o lock)"""
+        if self._statuses is not None:
+            failed = sum(1 for has_error in self._statuses.values() if has_error)
+            meta['done'] = len(self._statuses) - failed
+            meta['failed'] = failed
+            self._counts_written_at = time.time()
+        return meta
+
+    def record(self, index, source, data=None, error=None):
+        """
+        Registra uma URL concluída (ou que falhou).
+
+        Args:
+            index: Posição da URL na lista do job
+            source: URL ou nome do arquivo
+            data: Resultado da URL (linhas extraídas, dict de resultado...) - serializável em JSON
+            error: Mensagem de erro (URL com falha é tentada de novo ao retomar)
+        """
+        line = json.dumps({
+            'index': index,
+            'source': source,
+            'data': data,
+            'error': error,
+            'time': time.time()
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._line_checked:
+                self._discard_partial_line()
+                self._line_checked = True
+            if self._statuses is None:
+                self._statuses = {idx: bool(entry.get('error')) for idx, entry in self.load_progress().items()}
+            with open(self._progress_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+            self._statuses[index] = bool(error)
+            # Contadores no meta.json para a interface não reler o progresso inteiro;
+            # gravados no máximo a cada COUNTS_WRITE_INTERVAL (o meta traz a lista de URLs)
+            if time.time() - self._counts_written_at >= COUNTS_WRITE_INTERVAL:
+                meta = self.load_meta()
+                if meta is not None:
+                    self._write_meta(self._with_current_counts(meta))
+
+    def _discard_partial_line(self):
+        """Remove uma última linha incompleta (app caiu no meio da escrita) antes de voltar a gravar"""
+        try:
+            with open(self._progress_path, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if size == 0:
+                    return
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) == b'\n':
+                    return
+                # Procurar o último fim de linha completo
+                position = size
+                while position > 0:
+                    step = min(4096, position)
+                    position -= step
+                    f.seek(position)
+                    newline = f.read(step).rfind(b'\n')
+                    if newline != -1:
+                        f.truncate(position + newline + 1)
+                        return
+                f.truncate(0)
+        except OSError:
+            pass
+
+    def load_progress(self):
+        """
+        Lê o progresso gravado.
+
+        Returns:
+            dict: {índice: registro}; o último registro de cada índice vale
+                  (uma linha truncada por queda do app é ignorada)
+        """
+        progress = {}
+        try:
+            with open(self._progress_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    progress[entry['index']] = entry
+        except OSError:
+            pass
+        return progress
+
+    def count_progress(self):
+        """Conta no arquivo de progresso as URLs concluídas e com erro: {'done': ..., 'failed': ...}"""
+        progress = self.load_progress()
+        failed = sum(1 for entry in progress.values() if entry.get('error'))
+        return {'done': len(progress) - failed, 'failed': failed}
+
+    def summary(self):
+        """
+        Resumo para a interface.
+
+        Returns:
+            dict: metadados + done (URLs concluídas) e failed (URLs com erro), ou None
+        """
+        meta = self.load_meta()
+        if meta is None:
+            return None
+        if 'done' not in meta or 'failed' not in meta:
+            # Checkpoint gravado antes dos contadores existirem no meta
+            meta.update(self.count_progress())
+        return meta
+
+    def delete(self):
+        """Apaga o checkpoint do disco"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def list_checkpoints(owner=None, kind=None, resumable_only=True, with_counts=True, directory=JOB_CHECKPOINT_DIR):
+    """
+    Lista os checkpoints gravados (mais recentes primeiro).
+
+    Args:
+        owner: Filtra pelo dono (None = todos)
+        kind: Filtra pelo tipo de job (None = todos)
+        resumable_only: Só os que não foram concluídos
+        with_counts: Garantir done/failed (checkpoints antigos sem contadores no meta releem o progresso)
+    """
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in os.listdir(directory):
+        checkpoint = JobCheckpoint(name, directory)
+        meta = checkpoint.load_meta()
+        if meta is None:
+            continue
+        if owner is not None and meta.get('owner') != owner:
+            continue
+        if kind is not None and meta.get('kind') != kind:
+            continue
+        if resumable_only and meta.get('status') not in RESUMABLE_STATUSES:
+            continue
+        if with_counts and ('done' not in meta or 'failed' not in meta):
+            meta.update(checkpoint.count_progress())
+        summaries.append(meta)
+    return sorted(summaries, key=lambda meta: meta.get('updated_at', 0), reverse=True)
+
+
+def prune_finished_checkpoints(keep=JOB_CHECKPOINT_KEEP_FINISHED, directory=JOB_CHECKPOINT_DIR):
+    """Apaga os checkpoints concluídos mais antigos, mantendo os `keep` mais recentes"""
+    finished = [
+        meta for meta in list_checkpoints(resumable_only=False, with_counts=False, directory=directory)
+        if meta.get('status') == 'completed'
+    ]
+    for meta in finished[keep:]:
+        JobCheckpoint(meta['id'], directory).delete()
@@ -0,0 +1,297 @@
+"""
+Execução de scrapings em segundo plano.
+
+Os jobs rodam em threads do próprio processo, fora do ciclo de reruns do
+Streamlit: clicar em qualquer widget não interrompe mais um scraping longo.
+O registro de jobs fica no módulo (sobrevive aos reruns) e a interface só
+consulta o estado de cada job (progresso, mensagens, resultado).
+
+Controle de pausa/retomada/parada: a função do job chama job.checkpoint()
+entre uma página e outra; é ali que ela espera enquanto pausada e é
+interrompida quando o usuário pede para parar.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Quantos jobs rodam ao mesmo tempo (os demais ficam na fila)
+JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 4))
+JOB_MAX_MESSAGES = 200  # mensagens guardadas por job
+JOB_MAX_FINISHED = 50  # jobs finalizados mantidos no registro
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))  # intervalo de atualização do painel na interface
+
+# Status possíveis de um job
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_PAUSED = 'paused'
+STATUS_COMPLETED = 'completed'
+STATUS_STOPPED = 'stopped'
+STATUS_ERROR = 'error'
+FINISHED_STATUSES = {STATUS_COMPLETED, STATUS_STOPPED, STATUS_ERROR}
+
+STATUS_LABELS = {
+    STATUS_QUEUED: '🕒 Na fila',
+    STATUS_RUNNING: '▶️ Executando',
+    STATUS_PAUSED: '⏸️ Pausado',
+    STATUS_COMPLETED: '✅ Concluído',
+    STATUS_STOPPED: '⏹️ Interrompido',
+    STATUS_ERROR: '❌ Erro',
+}
+
+
+class JobStopped(Exception):
+    """Levantada em job.checkpoint() quando o usuário pede para parar o job"""
+
+
+def new_job_id():
+    """Gera um ID novo de job"""
+    return uuid.uuid4().hex[:12]
+
+
+def _copy_partial(partial):
+    """Cópia rasa do resultado parcial (a thread do job continua adicionando itens)"""
+    return list(partial) if isinstance(partial, list) else partial
+
+
+class Job:
+    """
+    Um scraping executando em segundo plano.
+
+    A função do job recebe este objeto e o usa para reportar progresso
+    (update/log), guardar resultados parciais (partial_result) e
+    respeitar pausa/parada (checkpoint).
+    """
+
+    def __init__(self, kind, title, owner=None):
+        self.id = new_job_id()
+        self.kind = kind
+        self.title = title
+        self.owner = owner
+        self.status = STATUS_QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ''
+        self.messages = []
+        self.result = None
+        self.partial_result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._stop_event = threading.Event()
+
+    # ---- Usado pela função do job (thread em segundo plano) ----
+
+    def update(self, done=None, total=None, message=None):
+        """Atualiza o progresso do job"""
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+
+    def log(self, level, message):
+        """
+        Registra uma mensagem para a interface exibir.
+
+        Args:
+            level: 'info', 'warning' ou 'error'
+            message: Texto da mensagem
+        """
+        with self._lock:
+            self.messages.append({'level': level, 'message': message, 'time': time.time()})
+            if len(self.messages) > JOB_MAX_MESSAGES:
+                del self.messages[:len(self.messages) - JOB_MAX_MESSAGES]
+
+    def checkpoint(self):
+        """
+        Ponto de controle entre uma unidade de trabalho e outra.
+        Bloqueia enquanto o job estiver pausado e levanta JobStopped se foi parado.
+        """
+        while not self._resume_event.wait(timeout=0.5):
+            if self._stop_event.is_set():
+                break
+        if self._stop_event.is_set():
+            raise JobStopped()
+
+    @property
+    def stop_requested(self):
+        return self._stop_event.is_set()
+
+    # ---- Usado pela interface ----
+
+    def pause(self):
+        with self._lock:
+            if self.status in (STATUS_QUEUED, STATUS_RUNNING):
+                self._resume_event.clear()
+                self.status = STATUS_PAUSED
+
+    def resume(self):
+        with self._lock:
+            if self.status == STATUS_PAUSED:
+                self.status = STATUS_RUNNING if self.started_at else STATUS_QUEUED
+                self._resume_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._resume_event.set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    def snapshot(self):
+        """Cópia do estado atual (segura para a interface ler enquanto o job roda)"""
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'title': self.title,
+                'owner': self.owner,
+                'status': self.status,
+                'status_label': STATUS_LABELS.get(self.status, self.status),
+                'done': self.done,
+                'total': self.total,
+                'progress': (self.done / self.total) if self.total else 0.0,
+                'message': self.message,
+                'messages': list(self.messages),
+                'result': self.result if self.result is not None else _copy_partial(self.partial_result),
+                'error': self.error,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobRegistry:
+    """
+    Registro de jobs + pool de threads que os executa.
+
+    Args:
+        max_workers: Quantos jobs podem rodar ao mesmo tempo
+    """
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scraping-job')
+
+    def submit(self, kind, title, fn, *args, owner=None, job_id=None, on_finish=None, **kwargs):
+        """
+        Agenda fn(job, *args, **kwargs) para rodar em segundo plano.
+        O retorno de fn vira job.result.
+
+        Args:
+            job_id: ID fixo (ex: ao retomar um job a partir do checkpoint); padrão = novo ID
+            on_finish: Callback opcional on_finish(status) chamado quando o job termina
+
+        Returns:
+            str: ID do job
+        """
+        job = Job(kind, title, owner=owner)
+        if job_id:
+            job.id = job_id
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, fn, args, kwargs, on_finish)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs, on_finish=None):
+        try:
+            # Pausado/parado antes de começar
+            job.checkpoint()
+            with job._lock:
+                job.status = STATUS_PAUSED if not job._resume_event.is_set() else STATUS_RUNNING
+                job.started_at = time.time()
+            result = fn(job, *args, **kwargs)
+            with job._lock:
+                job.result = result
+                job.status = STATUS_STOPPED if job.stop_requested else STATUS_COMPLETED
+        except JobStopped:
+            with job._lock:
+                job.result = job.partial_result
+                job.status = STATUS_STOPPED
+        except Exception as e:
+            with job._lock:
+                job.result = job.partial_result
+                job.error = str(e)
+                job.status = STATUS_ERROR
+        finally:
+            job.finished_at = time.time()
+            if on_finish:
+                try:
+                    on_finish(job.status)
+                except Exception:
+                    pass
+
+    def _prune(self):
+        """Remove os jobs finalizados mais antigos (chamar com lock)"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished),
+            key=lambda job: job.finished_at or 0
+        )
+        for job in finished[:max(0, len(finished) - JOB_MAX_FINISHED)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        """Retorna o Job (ou None)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def snapshot(self, job_id):
+        """Retorna o estado atual do job como dict (ou None)"""
+        job = self.get(job_id)
+        return job.snapshot() if job else None
+
+    def list(self, owner=None, kind=None):
+        """Lista os jobs (mais recentes primeiro), opcionalmente filtrando por dono/tipo"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        jobs = [
+            job for job in jobs
+            if (owner is None or job.owner == owner) and (kind is None or job.kind == kind)
+        ]
+        return [job.snapshot() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
+
+    def pause(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.pause()
+
+    def resume(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.resume()
+
+    def stop(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.stop()
+
+    def remove(self, job_id):
+        """Remove um job finalizado do registro"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.finished:
+                del self._jobs[job_id]
+
+    def is_active(self, job_id):
+        """True se o job existe e ainda não terminou"""
+        job = self.get(job_id)
+        return job is not None and not job.finished
+
+    def has_active(self, owner=None):
+        """True se houver algum job na fila, rodando ou pausado"""
+        return any(job['status'] not in FINISHED_STATUSES for job in self.list(owner=owner))
+
+
+# Registro único do processo (o módulo não é reexecutado nos reruns do Streamlit)
+job_registry = JobRegistry()
@@ -0,0 +1,83 @@
+"""
+Parser incremental de JSON para respostas da IA em streaming.
+
+A IA responde algo como {"dados": [{...}, {...}], "resumo": "..."} aos
+poucos. JsonArrayStream recebe os pedaços de texto conforme chegam e
+devolve cada item das listas de interesse ("dados", "seletores") assim
+que o objeto do item se fecha - a interface mostra a linha sem esperar
+o resto da resposta. Texto antes do primeiro "{" (ex: ```json) é ignorado.
+"""
+import json
+
+
+class JsonArrayStream:
+    """
+    Extrai os itens completos das listas `keys` do objeto JSON de topo, em streaming.
+
+    Args:
+        keys: Nomes das listas de topo a acompanhar (ex: ('dados',) ou ('seletores',))
+    """
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None  # última string completa no nível do objeto de topo
+        self._current_key = None
+        self._array_key = None  # lista de interesse aberta no momento
+        self._item_start = None
+
+    @property
+    def text(self):
+        """Texto recebido até agora"""
+        return self._buffer
+
+    def feed(self, chunk):
+        """
+        Recebe mais um pedaço da resposta.
+
+        Returns:
+            list: Itens que ficaram completos com este pedaço, como tuplas (lista, item)
+        """
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start + 1:i]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char == ':' and self._depth == 1:
+                self._current_key = self._last_string
+            elif char in '{[':
+                self._depth += 1
+                if char == '[' and self._depth == 2 and self._current_key in self.keys:
+                    self._array_key = self._current_key
+                elif self._depth == 3 and self._array_key is not None:
+                    self._item_start = i
+            elif char in '}]':
+                if self._depth == 3 and self._item_start is not None:
+                    try:
+                        items.append((self._array_key, json.loads(buffer[self._item_start:i + 1])))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+                elif self._depth == 2 and char == ']':
+                    self._array_key = None
+                self._depth -= 1
+        self._pos = len(buffer)
+        return items
@@ -0,0 +1,226 @@
+"""
+Impressão digital estrutural de páginas HTML.
+
+Páginas geradas pelo mesmo template (ex: todas as páginas de produto de uma
+loja) têm o mesmo esqueleto de tags e classes, mesmo com textos, imagens e
+quantidade de itens diferentes. structural_fingerprint() resume esse
+esqueleto num hash curto: o conjunto de caminhos tag.classe da raiz até
+cada elemento, sem texto, sem atributos variáveis e sem contar repetições.
+
+Para agrupar páginas PARECIDAS (não idênticas) em templates, page_signature()
+gera também assinaturas aproximadas sobre o conjunto de caminhos + classes:
+SimHash (64 bits, compara por distância de Hamming) e MinHash (estima a
+similaridade de Jaccard). cluster_signatures() usa o SimHash como filtro
+rápido e o MinHash para confirmar.
+"""
+import hashlib
+import re
+from urllib.parse import urlparse
+
+from html_document import ParsedDocument, NON_TEXT_TAGS
+
+# Agrupamento por template
+SIMHASH_BITS = 64
+MINHASH_PERMUTATIONS = 64
+SIMHASH_MAX_DISTANCE = 10  # bits diferentes aceitos entre páginas do mesmo template
+MINHASH_MIN_SIMILARITY = 0.6  # Jaccard estimado mínimo entre páginas do mesmo template
+
+_MAX_HASH = (1 << 64) - 1
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Profundidade máxima considerada (abaixo disso o conteúdo varia demais entre páginas)
+FINGERPRINT_MAX_DEPTH = 14
+
+# Tags que não fazem parte do esqueleto visível
+SKELETON_SKIP_TAGS = NON_TEXT_TAGS | {'noscript', 'svg', 'path', 'head', 'meta', 'link', 'br', 'wbr'}
+
+# Classes geradas automaticamente (CSS-in-JS, hashes, IDs) mudam de página para página
+_VOLATILE_CLASS = re.compile(r'\d|^css-|^sc-|^jsx-', re.IGNORECASE)
+
+
+def stable_classes(class_attr):
+    """Classes de um elemento que servem para identificar o template (ordenadas, sem as voláteis)"""
+    if not class_attr:
+        return ()
+    return tuple(sorted({cls for cls in class_attr.split() if not _VOLATILE_CLASS.search(cls)}))
+
+
+def element_signature(elem):
+    """Assinatura de um elemento: tag + classes estáveis (ex: 'div.price.sale')"""
+    classes = stable_classes(elem.get('class'))
+    return elem.tag.lower() + ''.join('.' + cls for cls in classes)
+
+
+def iter_tag_paths(doc, max_depth=FINGERPRINT_MAX_DEPTH):
+    """
+    Percorre o esqueleto da página.
+
+    Yields:
+        str: Caminho de assinaturas da raiz até cada elemento (ex: 'html>body>div.product>h1.title')
+    """
+    if not isinstance(doc, ParsedDocument):
+        doc = ParsedDocument(doc)
+    root = doc.tree
+    # Percurso em profundidade sem recursão (páginas podem ter DOM muito profundo)
+    stack = [(root, element_signature(root), 0)]
+    while stack:
+        elem, path, depth = stack.pop()
+        yield path
+        if depth >= max_depth:
+            continue
+        for child in elem:
+            if not isinstance(child.tag, str) or child.tag.lower() in SKELETON_SKIP_TAGS:
+                continue
+            stack.append((child, path + '>' + element_signature(child), depth + 1))
+
+
+def structural_fingerprint(doc, max_depth=FINGERPRINT_MAX_DEPTH):
+    """
+    Hash do esqueleto tag/classe da página.
+
+    Duas páginas do mesmo template geram o mesmo hash mesmo que uma tenha 3
+    itens numa lista e a outra 30 (caminhos repetidos contam uma vez só).
+
+    Args:
+        doc: ParsedDocument ou HTML (str)
+        max_depth: Profundidade máxima considerada
+
+    Returns:
+        str: Hash hexadecimal de 16 caracteres
+    """
+    paths = sorted(set(iter_tag_paths(doc, max_depth)))
+    return hashlib.sha256('\n'.join(paths).encode('utf-8')).hexdigest()[:16]
+
+
+def page_domain(url):
+    """Domínio de uma URL sem 'www.' (páginas de www.loja.com e loja.com compartilham template)"""
+    try:
+        host = urlparse(url).netloc.lower()
+    except Exception:
+        return ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def page_features(doc, max_depth=FINGERPRINT_MAX_DEPTH):
+    """
+    Conjunto de características estruturais da página: caminhos tag.classe e classes usadas.
+
+    Returns:
+        set: Strings 'path:...' e 'class:...'
+    """
+    if not isinstance(doc, ParsedDocument):
+        doc = ParsedDocument(doc)
+    features = set()
+    for path in iter_tag_paths(doc, max_depth):
+        features.add('path:' + path)
+        last = path.rsplit('>', 1)[-1]
+        for cls in last.split('.')[1:]:
+            features.add('class:' + cls)
+    return features
+
+
+def simhash(features, bits=SIMHASH_BITS):
+    """SimHash das características (conjuntos parecidos geram hashes com poucos bits diferentes)"""
+    weights = [0] * bits
+    for feature in features:
+        value = _feature_hash(feature)
+        for bit in range(bits):
+            weights[bit] += 1 if (value >> bit) & 1 else -1
+    result = 0
+    for bit in range(bits):
+        if weights[bit] > 0:
+            result |= 1 << bit
+    return result
+
+
+def hamming_distance(a, b):
+    """Número de bits diferentes entre dois SimHash"""
+    return bin(a ^ b).count('1')
+
+
+# Coeficientes fixos das permutações do MinHash (mesma assinatura em qualquer execução)
+_MINHASH_COEFFICIENTS = [
+    (_feature_hash(f'a{i}') % (_MERSENNE_PRIME - 1) + 1, _feature_hash(f'b{i}') % _MERSENNE_PRIME)
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+
+def minhash(features, num_perm=MINHASH_PERMUTATIONS):
+    """Assinatura MinHash (lista de inteiros) das características"""
+    hashes = [_feature_hash(feature) for feature in features]
+    if not hashes:
+        return [_MAX_HASH] * num_perm
+    return [
+        min(((a * value + b) % _MERSENNE_PRIME) for value in hashes)
+        for a, b in _MINHASH_COEFFICIENTS[:num_perm]
+    ]
+
+
+def minhash_similarity(a, b):
+    """Similaridade de Jaccard estimada a partir de duas assinaturas MinHash"""
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / min(len(a), len(b))
+
+
+def page_signature(doc, max_depth=FINGERPRINT_MAX_DEPTH):
+    """
+    Assinaturas estruturais de uma página (serializáveis em JSON).
+
+    Returns:
+        dict: {'fingerprint': hash exato do esqueleto, 'simhash': int, 'minhash': [int], 'features': quantidade}
+    """
+    if not isinstance(doc, ParsedDocument):
+        doc = ParsedDocument(doc)
+    features = page_features(doc, max_depth)
+    paths = sorted(feature[len('path:'):] for feature in features if feature.startswith('path:'))
+    return {
+        'fingerprint': hashlib.sha256('\n'.join(paths).encode('utf-8')).hexdigest()[:16],
+        'simhash': simhash(features),
+        'minhash': minhash(features),
+        'features': len(features)
+    }
+
+
+def same_template(sig_a, sig_b, max_distance=SIMHASH_MAX_DISTANCE, min_similarity=MINHASH_MIN_SIMILARITY):
+    """True se duas assinaturas de page_signature parecem do mesmo template"""
+    if sig_a['fingerprint'] == sig_b['fingerprint']:
+        return True
+    if hamming_distance(sig_a['simhash'], sig_b['simhash']) > max_distance:
+        return False
+    return minhash_similarity(sig_a['minhash'], sig_b['minhash']) >= min_similarity
+
+
+def cluster_signatures(signatures, max_distance=SIMHASH_MAX_DISTANCE, min_similarity=MINHASH_MIN_SIMILARITY):
+    """
+    Agrupa páginas em templates.
+
+    Cada página entra no primeiro grupo cujo líder (primeira página do grupo)
+    for do mesmo template; senão abre um grupo novo. Páginas sem assinatura
+    (erro no download) ficam fora dos grupos.
+
+    Args:
+        signatures: Lista de assinaturas de page_signature (None = página sem assinatura)
+
+    Returns:
+        list: Índice do grupo de cada página (None para páginas sem assinatura)
+    """
+    leaders = []  # (índice do grupo, assinatura do líder)
+    assignment = []
+    for signature in signatures:
+        if not signature:
+            assignment.append(None)
+            continue
+        for cluster_id, leader in leaders:
+            if same_template(signature, leader, max_distance, min_similarity):
+                assignment.append(cluster_id)
+                break
+        else:
+            cluster_id = len(leaders)
+            leaders.append((cluster_id, signature))
+            assignment.append(cluster_id)
+    return assignment
@@ -0,0 +1,155 @@
+"""
+Pipeline em streaming: download → parse → extração → destino.
+
+Os estágios são ligados por filas de tamanho limitado, então um estágio
+rápido espera o mais lento em vez de acumular páginas. Assim a memória fica
+estável qualquer que seja o número de URLs: só o que o destino decide
+guardar (linhas extraídas e, opcionalmente, uma referência ao HTML
+comprimido em disco) sobrevive ao processamento de cada página.
+"""
+import os
+import queue
+import threading
+
+from disk_cache import DiskCache
+from fetch_engine import iter_fetch, DEFAULT_MAX_WORKERS, DEFAULT_MAX_PER_HOST
+
+# Tamanho das filas entre estágios (páginas em trânsito por estágio)
+DEFAULT_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 8))
+DEFAULT_EXTRACT_WORKERS = 2
+
+# Páginas carregadas no Multi-URL: HTML comprimido em disco, só a referência fica na sessão
+PAGE_STORE_DIR = os.environ.get('PAGE_STORE_DIR', os.path.join('.cache', 'pages'))
+PAGE_STORE_TTL = int(os.environ.get('PAGE_STORE_TTL', 24 * 3600))
+PAGE_STORE_MAX_BYTES = int(os.environ.get('PAGE_STORE_MAX_MB', 1024)) * 1024 * 1024
+
+page_store = DiskCache(PAGE_STORE_DIR, max_bytes=PAGE_STORE_MAX_BYTES, default_ttl=PAGE_STORE_TTL)
+
+_END = object()
+
+
+def store_page(url, html_content, method='python'):
+    """
+    Grava o HTML comprimido no disco e retorna a referência para recuperá-lo.
+
+    Returns:
+        list: Referência [url, método] (serializável, cabe no session_state)
+    """
+    ref = [url, method]
+    page_store.set(ref, html_content)
+    return ref
+
+
+def load_page(ref):
+    """Recupera o HTML de uma referência de store_page (None se já foi removido)"""
+    if not ref:
+        return None
+    entry = page_store.get(ref, allow_stale=True)
+    return entry['value'] if entry else None
+
+
+class _Failure:
+    """Exceção de um estágio, repassada para a thread de quem consome"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(q, item, stop_event):
+    """put() que desiste se o pipeline foi cancelado (evita threads presas na fila cheia)"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def stream_pipeline(urls, fetch_fn, process_fn, max_workers=DEFAULT_MAX_WORKERS,
+                    max_per_host=DEFAULT_MAX_PER_HOST, extract_workers=DEFAULT_EXTRACT_WORKERS,
+                    queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Baixa e processa URLs em streaming com filas limitadas entre os estágios.
+
+    O download usa iter_fetch (limite global e por host); o parse/extração roda
+    em `extract_workers` threads; os resultados são entregues a quem itera,
+    na thread dele (seguro para atualizar a UI do Streamlit).
+
+    Args:
+        urls: Lista de URLs
+        fetch_fn: Função fetch_fn(url) -> dict no formato de fetch_html
+        process_fn: Função process_fn(fetch_result) -> resultado a guardar
+                    (deve descartar o HTML; só o retorno sai do pipeline)
+        max_workers: Máximo de downloads simultâneos no total
+        max_per_host: Máximo de downloads simultâneos para o mesmo host
+        extract_workers: Threads de parse/extração
+        queue_size: Capacidade de cada fila entre estágios
+
+    Yields:
+        tuple: (índice da URL na entrada, retorno de process_fn), em ordem de conclusão
+    """
+    urls = list(urls)
+    if not urls:
+        return
+
+    extract_workers = max(1, int(extract_workers))
+    fetched_q = queue.Queue(maxsize=max(1, int(queue_size)))
+    output_q = queue.Queue(maxsize=max(1, int(queue_size)))
+    stop_event = threading.Event()
+
+    def _fetch_stage():
+        try:
+            for idx, fetch_result in iter_fetch(urls, fetch_fn, max_workers=max_workers, max_per_host=max_per_host):
+                if not _put(fetched_q, (idx, fetch_result), stop_event):
+                    return
+        except Exception as e:
+            _put(output_q, _Failure(e), stop_event)
+        finally:
+            for _ in range(extract_workers):
+                _put(fetched_q, _END, stop_event)
+
+    def _extract_stage():
+        try:
+            while not stop_event.is_set():
+                try:
+                    item = fetched_q.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    return
+                idx, fetch_result = item
+                try:
+                    processed = process_fn(fetch_result)
+                except Exception as e:
+                    processed = {'url': fetch_result.get('url'), 'error': str(e)}
+                # Solta o HTML antes de esperar vaga na fila de saída
+                del item, fetch_result
+                if not _put(output_q, (idx, processed), stop_event):
+                    return
+        finally:
+            _put(output_q, _END, stop_event)
+
+    threads = [threading.Thread(target=_fetch_stage, name='pipeline-fetch', daemon=True)]
+    threads += [
+        threading.Thread(target=_extract_stage, name=f'pipeline-extract-{n}', daemon=True)
+        for n in range(extract_workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    finished_workers = 0
+    try:
+        while finished_workers < extract_workers:
+            item = output_q.get()
+            if item is _END:
+                finished_workers += 1
+                continue
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Consumidor parou (break/erro) ou terminou: liberar os estágios
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=1)
@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import requests
+from http_client import http_get
 
 app = Flask(__name__)
 CORS(app)  # Permitir todas as origens
@@ -35,7 +35,7 @@ def proxy():
                 'mature_content': '1'
             }
         
-        response = requests.get(proxy_url, headers=headers, cookies=cookies, timeout=15)
+        response = http_get(proxy_url, headers=headers, cookies=cookies, timeout=15)
         response.raise_for_status()
         
         # Retornar HTML com headers CORS corretos
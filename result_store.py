@@ -0,0 +1,204 @@
+"""
+Armazenamento colunar (Parquet) das linhas extraídas pelos jobs.
+
+Os resultados do Scraping em Massa só existiam como lista de dicts na
+sessão, e cada download remontava um DataFrame a partir dela. Aqui cada job
+grava suas linhas em arquivos Parquet (comprimidos, em colunas) conforme
+são extraídas:
+
+    results/<job_id>/date=<AAAA-MM-DD>/part-<ms>-<n>.parquet
+
+- append: cada lote de linhas vira um arquivo novo (nada é reescrito), o
+  que também serve às tarefas agendadas, que acumulam uma execução por dia
+- leitura com pyarrow direto para um DataFrame com colunas Arrow
+  (pd.ArrowDtype), sem passar por dicts Python
+- exportação CSV/Parquet direto da tabela Arrow
+
+Todos os valores são gravados como texto (listas/dicts em JSON): as páginas
+trazem tipos misturados na mesma coluna e os arquivos de um job precisam ter
+esquemas compatíveis. Sem pyarrow instalado, nada é gravado e a interface
+continua usando as linhas da sessão.
+"""
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as pa_ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR', 'results')
+RESULT_FLUSH_ROWS = int(os.environ.get('RESULT_FLUSH_ROWS', 1000))  # linhas por arquivo Parquet
+RESULT_STORE_MAX_JOBS = int(os.environ.get('RESULT_STORE_MAX_JOBS', 50))  # jobs mantidos (os mais antigos saem)
+RESULT_COMPRESSION = 'zstd'
+
+_prune_lock = threading.Lock()
+
+
+def _job_dir(job_id):
+    return os.path.join(RESULT_STORE_DIR, str(job_id))
+
+
+def _cell(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict, tuple)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+class ResultWriter:
+    """
+    Grava as linhas de um job em Parquet, em lotes de RESULT_FLUSH_ROWS.
+
+    Args:
+        job_id: ID do job (pasta dos resultados)
+        reset: Apagar resultados anteriores do job (ex: job retomado, que regrava tudo);
+               False para acumular execuções (tarefas agendadas)
+    """
+
+    def __init__(self, job_id, reset=True):
+        self.job_id = job_id
+        self.enabled = PYARROW_AVAILABLE
+        self.rows_written = 0
+        self._buffer = []
+        self._columns = {}  # ordem de aparição das colunas
+        self._parts = 0
+        if self.enabled and reset:
+            shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+    def add(self, rows):
+        """Acrescenta linhas (dicts); grava um arquivo a cada RESULT_FLUSH_ROWS"""
+        if not self.enabled:
+            return
+        for row in rows:
+            self._columns.update(dict.fromkeys(row))
+            self._buffer.append(row)
+        if len(self._buffer) >= RESULT_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Grava as linhas pendentes num novo arquivo Parquet"""
+        if not self.enabled or not self._buffer:
+            return
+        columns = [str(column) for column in self._columns]
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        table = pa.Table.from_pylist(
+            [{str(key): _cell(value) for key, value in row.items()} for row in self._buffer],
+            schema=schema
+        )
+        directory = os.path.join(_job_dir(self.job_id), f"date={datetime.now().strftime('%Y-%m-%d')}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{self._parts:05d}.parquet")
+        tmp_path = path + '.tmp'
+        pq.write_table(table, tmp_path, compression=RESULT_COMPRESSION)
+        os.replace(tmp_path, path)  # leitores nunca veem um arquivo pela metade
+        os.utime(_job_dir(self.job_id))  # última gravação do job (usada por prune_results)
+        self._parts += 1
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        """Grava o que falta (chamar também quando o job é parado)"""
+        self.flush()
+
+
+def write_results(job_id, rows, reset=True):
+    """Grava todas as linhas de uma vez (atalho para ResultWriter)"""
+    writer = ResultWriter(job_id, reset=reset)
+    writer.add(rows)
+    writer.close()
+    return writer.rows_written
+
+
+def _part_files(job_id):
+    directory = _job_dir(job_id)
+    if not os.path.isdir(directory):
+        return []
+    files = []
+    for partition in sorted(os.listdir(directory)):
+        partition_dir = os.path.join(directory, partition)
+        if os.path.isdir(partition_dir):
+            files.extend(os.path.join(partition_dir, name) for name in sorted(os.listdir(partition_dir))
+                         if name.endswith('.parquet'))
+    return files
+
+
+def has_results(job_id):
+    """True se o job tem linhas gravadas"""
+    return PYARROW_AVAILABLE and bool(job_id) and bool(_part_files(job_id))
+
+
+def load_results_table(job_id, columns=None):
+    """
+    Tabela Arrow com as linhas do job, na ordem em que foram gravadas (ou None).
+    Colunas que só aparecem em parte dos arquivos ficam nulas nos demais.
+    """
+    if not PYARROW_AVAILABLE or not job_id:
+        return None
+    files = _part_files(job_id)
+    if not files:
+        return None
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files])
+    dataset = pa_ds.dataset(files, schema=schema, format='parquet')
+    return dataset.to_table(columns=columns)
+
+
+def load_results(job_id, columns=None):
+    """DataFrame com colunas Arrow (pd.ArrowDtype) com as linhas do job, ou None"""
+    table = load_results_table(job_id, columns=columns)
+    if table is None:
+        return None
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def export_results_csv(job_id):
+    """CSV (bytes) de todas as linhas do job, gerado direto da tabela Arrow (ou None)"""
+    table = load_results_table(job_id)
+    if table is None:
+        return None
+    buffer = io.BytesIO()
+    pa_csv.write_csv(table, buffer)
+    return buffer.getvalue()
+
+
+def export_results_parquet(job_id):
+    """Um único arquivo Parquet (bytes) com todas as linhas do job (ou None)"""
+    table = load_results_table(job_id)
+    if table is None:
+        return None
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=RESULT_COMPRESSION)
+    return buffer.getvalue()
+
+
+def prune_results(max_jobs=RESULT_STORE_MAX_JOBS, keep_prefix=None):
+    """
+    Remove os resultados dos jobs mais antigos (pela última gravação), mantendo max_jobs.
+
+    Args:
+        max_jobs: Quantos jobs manter
+        keep_prefix: Jobs com este prefixo nunca são removidos nem contados (ex: tarefas agendadas)
+    """
+    if not os.path.isdir(RESULT_STORE_DIR):
+        return
+    with _prune_lock:
+        job_dirs = [os.path.join(RESULT_STORE_DIR, name) for name in os.listdir(RESULT_STORE_DIR)
+                    if not (keep_prefix and name.startswith(keep_prefix))]
+        job_dirs = [path for path in job_dirs if os.path.isdir(path)]
+        job_dirs.sort(key=lambda path: os.path.getmtime(path), reverse=True)
+        for path in job_dirs[max_jobs:]:
+            shutil.rmtree(path, ignore_errors=True)
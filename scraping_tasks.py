@@ -0,0 +1,583 @@
+"""
+Tarefas de Scraping Automático (aba 6) fora do script do Streamlit.
+
+A execução de uma tarefa (baixar a página de lançamentos, pedir os seletores
+à IA, extrair os produtos, mandar o email e registrar no histórico) ficava
+dentro do app.py, presa ao ciclo de reruns da interface. Aqui ela não
+depende do Streamlit e é a mesma para:
+
+- o botão "▶️ Executar Agora" da interface (app.py)
+- o processo agendador (task_scheduler.py), que roda as tarefas nos horários
+  configurados mesmo sem ninguém com a página aberta
+
+Cada execução é comparada com a anterior (change_detection): o histórico, os
+resultados gravados e o email trazem só os produtos novos, alterados e removidos.
+Nas execuções agendadas, se a própria página de origem não mudou (304 ou mesmo
+hash de conteúdo), a execução para logo após o download, sem chamar a IA.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import uuid
+from datetime import datetime
+
+import requests
+from bs4 import BeautifulSoup
+
+from ai_providers import call_text, provider_available
+from change_detection import (
+    diff_rows, has_changes, changed_fields, change_rows, task_identity_field, page_content_hash
+)
+from http_client import cached_get_text, conditional_get_text
+from result_store import write_results
+from task_store import task_store
+
+# Provedores usados pelas tarefas agendadas, em ordem de prioridade (provedor, secret da API key)
+TASK_AI_PROVIDERS = [
+    ("Google (Gemini)", 'GEMINI_API_KEY'),
+    ("OpenAI (ChatGPT)", 'OPENAI_API_KEY'),
+    ("Anthropic (Claude)", 'ANTHROPIC_API_KEY'),
+]
+# Modelos mais baratos para a identificação de seletores das tarefas (os demais usam AI_MODELS)
+TASK_AI_MODELS = {
+    "Google (Gemini)": 'gemini-2.0-flash-exp',
+    "OpenAI (ChatGPT)": "gpt-4o-mini",
+}
+
+# Origem de uma execução no histórico
+RUN_MANUAL = 'manual'
+RUN_SCHEDULED = 'agendada'
+TASK_RESULTS_PREFIX = 'task-'  # job_id das tarefas no armazenamento de resultados
+EMAIL_MAX_PRODUCTS = 10  # produtos listados no email (por tipo de mudança)
+
+logger = logging.getLogger('scraping_tasks')
+
+
+# 🔑 SECRETS
+def get_secret(key_name, default=None):
+    """
+    Obtém secret de forma compatível com Replit e Streamlit Cloud
+    Tenta st.secrets primeiro (Streamlit Cloud), depois os.environ (Replit)
+    """
+    try:
+        # Streamlit Cloud: usa st.secrets (também lido fora do app, pelo agendador)
+        import streamlit as st
+        return st.secrets.get(key_name, default)
+    except Exception:
+        # Replit: usa variáveis de ambiente
+        return os.environ.get(key_name, default)
+
+
+# 💾 TAREFAS E HISTÓRICO (SQLite - ver task_store)
+def load_scraping_tasks():
+    """Carrega tarefas de scraping automático"""
+    try:
+        return task_store.list_tasks()
+    except sqlite3.Error:
+        return []
+
+
+def add_scraping_task(task_config):
+    """Adiciona nova tarefa de scraping automático"""
+    task_config['id'] = str(uuid.uuid4())[:8]  # UUID único e curto
+    task_config['created_at'] = datetime.now().isoformat()
+    task_config['enabled'] = True
+    try:
+        task_store.save_task(task_config)
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def delete_scraping_task(task_id):
+    """Exclui uma tarefa (o histórico dela é mantido)"""
+    try:
+        return task_store.delete_task(task_id)
+    except sqlite3.Error:
+        return False
+
+
+def get_scraping_task(task_id):
+    """Tarefa pelo id (ou None se foi excluída)"""
+    return task_store.get_task(task_id)
+
+
+def load_scraping_history(limit=20, offset=0, task_id=None):
+    """
+    Página do histórico de execuções (mais recentes primeiro).
+
+    Args:
+        limit: Execuções por página
+        offset: Quantas pular
+        task_id: Só as execuções desta tarefa (opcional)
+    """
+    try:
+        return task_store.history_page(limit=limit, offset=offset, task_id=task_id)
+    except sqlite3.Error:
+        return []
+
+
+def count_scraping_history(task_id=None):
+    """Total de execuções registradas"""
+    try:
+        return task_store.history_count(task_id=task_id)
+    except sqlite3.Error:
+        return 0
+
+
+def append_scraping_history(entry):
+    """Registra uma execução no histórico"""
+    try:
+        task_store.append_history(entry)
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def detect_task_changes(task, products):
+    """
+    Compara os produtos extraídos com o snapshot da execução anterior (sem alterá-lo:
+    ver commit_task_changes). Na primeira execução todos os produtos são novos.
+
+    Args:
+        task: Configuração da tarefa ('identity_field' opcional; padrão: o primeiro campo)
+        products: Produtos extraídos agora
+
+    Returns:
+        dict: Resultado de change_detection.diff_rows, ou None se o snapshot não pôde ser lido
+    """
+    try:
+        return diff_rows(task_store.load_snapshot(task['id']), products, task_identity_field(task))
+    except sqlite3.Error as e:
+        logger.warning("Snapshot da tarefa %s indisponível: %s", task['id'], e)
+        return None
+
+
+def commit_task_changes(task, changes):
+    """Aplica as mudanças ao snapshot da tarefa (depois de registradas: senão seriam perdidas)"""
+    try:
+        task_store.update_snapshot(task['id'], changes['upserts'], changes['deleted_keys'])
+        return True
+    except sqlite3.Error as e:
+        logger.warning("Snapshot da tarefa %s não atualizado: %s", task['id'], e)
+        return False
+
+
+def load_source_state(task):
+    """Estado da página de origem na última execução bem-sucedida da tarefa (ou None)"""
+    try:
+        return task_store.get_source_state(task['id'], task['source_url'])
+    except sqlite3.Error:
+        return None
+
+
+def save_source_state(task, state):
+    """Guarda ETag/Last-Modified/hash da página de origem para a próxima execução"""
+    try:
+        task_store.save_source_state(task['id'], task['source_url'], {**state, 'updated_at': datetime.now().isoformat()})
+        return True
+    except sqlite3.Error:
+        return False
+
+
+# 🌐 DOWNLOAD DA PÁGINA
+def _proxy_request(url):
+    """URL via corsproxy.io, headers de navegador e cookies (ex: verificação de idade da Steam) para carregar url"""
+    # Usar corsproxy.io para contornar bloqueios
+    proxy_url = f'https://corsproxy.io/?{url}'
+
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7'
+    }
+
+    # Se for Steam, adicionar cookies de verificação de idade
+    cookies = {}
+    if 'steampowered.com' in url:
+        # Cookies para pular verificação de idade
+        cookies = {
+            'wants_mature_content': '1',
+            'birthtime': '631152000',
+            'lastagecheckage': '1-0-1990'
+        }
+    return proxy_url, headers, cookies
+
+
+def load_page_with_browser(url, force_refresh=False):
+    """
+    Carrega página usando proxy CORS direto no Python.
+    Contorna bloqueios que sites fazem ao Python puro.
+    Usa o cache HTTP em disco (force_refresh=True ignora o cache).
+    """
+    try:
+        proxy_url, headers, cookies = _proxy_request(url)
+        html_content = cached_get_text(
+            url, method='proxy', request_url=proxy_url, headers=headers, cookies=cookies,
+            timeout=20, force_refresh=force_refresh
+        )
+
+        if len(html_content) < 100:
+            return 'ERROR:Resposta muito curta ou vazia'
+
+        return html_content
+
+    except requests.exceptions.Timeout:
+        return 'ERROR:Tempo esgotado ao carregar página'
+    except requests.exceptions.RequestException as e:
+        return f'ERROR:{str(e)}'
+    except Exception as e:
+        return f'ERROR:{str(e)}'
+
+
+def fetch_source_page(url, source_state=None):
+    """
+    Baixa a página de origem de uma tarefa (pelo mesmo proxy de load_page_with_browser, sem o
+    cache em disco) e diz se ela mudou desde a última execução bem-sucedida.
+
+    Args:
+        url: URL da página de origem
+        source_state: Estado salvo na última execução (etag, last_modified, content_hash) ou None
+
+    Returns:
+        dict: {
+            'unchanged': bool (304 ou mesmo hash de conteúdo),
+            'html': str ou None, 'error': str ou None,
+            'state': etag / last_modified / content_hash desta resposta (para a próxima execução)
+        }
+    """
+    source_state = source_state or {}
+    try:
+        proxy_url, headers, cookies = _proxy_request(url)
+        response = conditional_get_text(
+            proxy_url, etag=source_state.get('etag'), last_modified=source_state.get('last_modified'),
+            headers=headers, cookies=cookies, timeout=20
+        )
+    except requests.exceptions.Timeout:
+        return {'unchanged': False, 'html': None, 'error': 'ERROR:Tempo esgotado ao carregar página', 'state': None}
+    except requests.exceptions.RequestException as e:
+        return {'unchanged': False, 'html': None, 'error': f'ERROR:{str(e)}', 'state': None}
+
+    if response['not_modified']:
+        return {'unchanged': True, 'html': None, 'error': None, 'state': dict(source_state)}
+
+    html_content = response['text']
+    if len(html_content) < 100:
+        return {'unchanged': False, 'html': None, 'error': 'ERROR:Resposta muito curta ou vazia', 'state': None}
+
+    state = {
+        'etag': response['etag'],
+        'last_modified': response['last_modified'],
+        'content_hash': page_content_hash(html_content)
+    }
+    unchanged = bool(source_state.get('content_hash')) and state['content_hash'] == source_state['content_hash']
+    return {'unchanged': unchanged, 'html': html_content, 'error': None, 'state': state}
+
+
+# 🤖 EXECUÇÃO
+def execute_scraping_task(task, progress=None, source_state=None):
+    """
+    Executa uma tarefa de scraping
+
+    Args:
+        task: Configuração da tarefa
+        progress: Callback opcional progress(mensagem) - ex: st.info na interface, log no agendador
+        source_state: Estado da página na última execução bem-sucedida (load_source_state); se informado,
+                      a página é pedida com If-None-Match/If-Modified-Since e, sem mudança, a execução
+                      termina logo após o download (sem IA nem extração), com 'unchanged': True
+
+    Returns:
+        dict: success, products, total e 'source' (estado da página, para a próxima execução) - ou error
+    """
+    progress = progress or (lambda message: None)
+    try:
+        # 1. Buscar produtos na fonte
+        progress(f"🔍 Carregando página: {task['source_url']}")
+        page = fetch_source_page(task['source_url'], source_state)
+
+        if page['error']:
+            return {'success': False, 'error': page['error']}
+        if source_state and page['unchanged']:
+            progress("⏭️ Página sem mudanças desde a última execução - nada a extrair")
+            return {'success': True, 'unchanged': True, 'products': [], 'total': 0, 'source': page['state']}
+        html_content = page['html']
+
+        soup = BeautifulSoup(html_content, 'lxml')
+
+        # 2. Extrair lançamentos usando IA
+        progress(f"🤖 Identificando lançamentos usando IA...")
+
+        # Preparar prompt para IA identificar produtos
+        ai_prompt = f"""Analise este HTML de uma página de lançamentos e identifique os seletores CSS para extrair:
+{', '.join(task['fields'])}
+
+HTML (primeiros 5000 caracteres):
+{html_content[:5000]}
+
+Retorne APENAS um JSON com este formato:
+{{"selectors": [{{"field": "nome_campo", "selector": "seletor_css", "type": "text/attribute/html"}}]}}"""
+
+        # Usar API disponível (prioridade: Gemini > OpenAI > Claude)
+        ai_response = None
+        for provider, key_name in TASK_AI_PROVIDERS:
+            provider_key = get_secret(key_name)
+            if not provider_key or not provider_available(provider):
+                continue
+            try:
+                ai_response = call_text(provider, provider_key, ai_prompt, model=TASK_AI_MODELS.get(provider))
+            except Exception:
+                ai_response = None
+            if ai_response:
+                break
+
+        if not ai_response:
+            return {'success': False, 'error': 'Nenhuma API de IA disponível'}
+
+        # Parse resposta IA
+        json_match = re.search(r'\{.*\}', ai_response, re.DOTALL)
+        if json_match:
+            selectors_data = json.loads(json_match.group())
+            selectors = selectors_data.get('selectors', [])
+        else:
+            return {'success': False, 'error': 'Erro ao parsear resposta da IA'}
+
+        # 3. Extrair dados usando seletores identificados
+        # Extrair cada campo separadamente
+        all_fields = {}
+        max_items = 0
+
+        for selector_info in selectors:
+            field_name = selector_info['field']
+            selector = selector_info['selector']
+            elements = soup.select(selector)
+
+            values = []
+            for elem in elements:
+                if selector_info['type'] == 'attribute':
+                    attr_name = selector.split('@')[-1] if '@' in selector else 'href'
+                    values.append(elem.get(attr_name, ''))
+                else:
+                    values.append(elem.get_text(strip=True))
+
+            all_fields[field_name] = values
+            max_items = max(max_items, len(values))
+
+        # Alinhar produtos: cada produto pega valores do mesmo índice
+        products = []
+        for i in range(max_items):
+            product = {}
+            for field_name, values in all_fields.items():
+                product[field_name] = values[i] if i < len(values) else ''
+            products.append(product)
+
+        # 4. Buscar produtos no site alvo (se configurado)
+        if task.get('target_site'):
+            progress(f"🔎 Buscando produtos em {task['target_site']}...")
+            # Esta parte será implementada na próxima iteração
+
+        return {
+            'success': True,
+            'products': products,
+            'total': len(products),
+            'source': page['state']
+        }
+
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def send_email_notification(task, result):
+    """Envia email com resultados do scraping"""
+    try:
+        email_config = task.get('smtp_config')
+        provider = task.get('email_provider', 'SMTP Customizado')
+
+        # Preparar conteúdo do email
+        subject = f"🤖 Scraping Automático: {task['name']}"
+
+        changes = result.get('changes')
+        if result['success'] and changes is not None:
+            # Só as mudanças desde a execução anterior
+            body = f"""
+            <h2>Scraping Concluído - Mudanças Detectadas</h2>
+            <p><strong>Tarefa:</strong> {task['name']}</p>
+            <p><strong>Total de produtos na página:</strong> {result['total']}</p>
+            <p><strong>Novos:</strong> {len(changes['new'])} | <strong>Alterados:</strong> {len(changes['changed'])}
+            | <strong>Removidos:</strong> {len(changes['removed'])}</p>
+            <p><strong>Data:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
+            """
+            identity_field = task_identity_field(task)
+            sections = [
+                ("🆕 Novos", [str(row) for row in changes['new']]),
+                ("✏️ Alterados", [
+                    f"{item['row'].get(identity_field, '')} - " + '; '.join(
+                        f"{field}: {before} → {after}" for field, before, after in changed_fields(item['previous'], item['row'])
+                    )
+                    for item in changes['changed']
+                ]),
+                ("🗑️ Removidos", [str(row) for row in changes['removed']]),
+            ]
+            for title, items in sections:
+                if not items:
+                    continue
+                body += f"<h3>{title} ({len(items)}):</h3><ul>"
+                for item in items[:EMAIL_MAX_PRODUCTS]:
+                    body += f"<li>{item}</li>"
+                if len(items) > EMAIL_MAX_PRODUCTS:
+                    body += f"<li>... e mais {len(items) - EMAIL_MAX_PRODUCTS}</li>"
+                body += "</ul>"
+        elif result['success']:
+            body = f"""
+            <h2>Scraping Concluído!</h2>
+            <p><strong>Tarefa:</strong> {task['name']}</p>
+            <p><strong>Total de produtos encontrados:</strong> {result['total']}</p>
+            <p><strong>Data:</strong> {datetime.now().strftime('%d/%m/%Y %H:%M')}</p>
+
+            <h3>Produtos Encontrados:</h3>
+            <ul>
+            """
+
+            for product in result.get('products', [])[:EMAIL_MAX_PRODUCTS]:
+                body += f"<li>{product}</li>"
+
+            body += "</ul>"
+        else:
+            body = f"""
+            <h2>Erro no Scraping</h2>
+            <p><strong>Tarefa:</strong> {task['name']}</p>
+            <p><strong>Erro:</strong> {result['error']}</p>
+            """
+
+        # Enviar email baseado no provedor
+        if provider == "SMTP Customizado" and email_config:
+            try:
+                import smtplib
+                from email.mime.text import MIMEText
+                from email.mime.multipart import MIMEMultipart
+
+                msg = MIMEMultipart()
+                msg['From'] = email_config['user']
+                msg['To'] = task['recipient_email']
+                msg['Subject'] = subject
+                msg.attach(MIMEText(body, 'html'))
+
+                server = smtplib.SMTP(email_config['server'], email_config['port'])
+                server.starttls()
+                server.login(email_config['user'], email_config['pass'])
+                server.send_message(msg)
+                server.quit()
+                return True
+            except Exception as e:
+                return f"Erro SMTP: {str(e)}"
+        elif provider in ["SendGrid", "Resend", "Gmail"]:
+            # Para integrations Replit, salvar resultado e avisar usuário
+            return f"⚠️ {provider}: Configure a integração no Replit para envio automático"
+        else:
+            return "Provedor de email não configurado"
+
+    except Exception as e:
+        return f"Erro ao enviar email: {str(e)}"
+
+
+def run_scraping_task(task, progress=None, trigger=RUN_MANUAL, skip_unchanged=None):
+    """
+    Executa a tarefa completa: scraping, comparação com a execução anterior,
+    email (se algo mudou) e registro no histórico.
+
+    Args:
+        task: Configuração da tarefa
+        progress: Callback opcional progress(mensagem)
+        trigger: RUN_MANUAL ("Executar Agora") ou RUN_SCHEDULED (agendador)
+        skip_unchanged: Parar logo após o download se a página de origem não mudou desde a última
+                        execução bem-sucedida (padrão: só nas execuções agendadas)
+
+    Returns:
+        tuple: (resultado de execute_scraping_task + 'changes', resultado do email ou None)
+    """
+    if skip_unchanged is None:
+        skip_unchanged = trigger == RUN_SCHEDULED
+    source_state = load_source_state(task) if skip_unchanged else None
+    result = execute_scraping_task(task, progress=progress, source_state=source_state)
+
+    if result.get('unchanged'):
+        # Registro barato: sem IA, sem extração, sem snapshot, resultados ou email
+        append_scraping_history({
+            'task_id': task['id'],
+            'task_name': task['name'],
+            'timestamp': datetime.now().isoformat(),
+            'success': True,
+            'trigger': trigger,
+            'unchanged': True
+        })
+        return result, None
+
+    if result['success']:
+        result['changes'] = detect_task_changes(task, result['products'])
+    changes = result.get('changes')
+    # Email só quando algo mudou (sem snapshot, notifica a lista completa como antes)
+    notify = result['success'] and (changes is None or has_changes(changes))
+    email_result = send_email_notification(task, result) if notify else None
+
+    entry = {
+        'task_id': task['id'],
+        'task_name': task['name'],
+        'timestamp': datetime.now().isoformat(),
+        'success': result['success'],
+        'trigger': trigger
+    }
+    if result['success']:
+        entry['products_found'] = result['total']
+        if changes is not None:
+            entry.update(new=len(changes['new']), changed=len(changes['changed']), removed=len(changes['removed']))
+        # Só as mudanças de cada execução são acumuladas em Parquet (results/task-<id>/date=.../)
+        try:
+            write_results(
+                TASK_RESULTS_PREFIX + task['id'],
+                [{'Execução': entry['timestamp'], **row}
+                 for row in (change_rows(changes) if changes is not None else result['products'])],
+                reset=False
+            )
+        except Exception as e:
+            # Falha de armazenamento (disco cheio, esquema...) não pode perder o registro da execução
+            logger.warning("Resultados da tarefa %s não gravados: %s", task['id'], e)
+            entry['results_error'] = str(e)
+    else:
+        entry['error'] = result['error']
+    recorded = append_scraping_history(entry)
+
+    # Snapshot e estado da página só depois do histórico gravado: se algo falhar antes,
+    # as mesmas mudanças são detectadas (e notificadas) de novo na próxima execução
+    if result['success'] and recorded and (changes is None or commit_task_changes(task, changes)):
+        save_source_state(task, result['source'])
+    return result, email_result
+
+
+def run_scheduled_task(task_id, schedule=None):
+    """
+    Job do agendador (task_scheduler.py): relê a tarefa (pode ter sido alterada/excluída) e executa.
+
+    Args:
+        task_id: ID da tarefa
+        schedule: Agendamento com que o job foi criado (só usado por sync_jobs para detectar mudanças)
+    """
+    task = get_scraping_task(task_id)
+    if task is None or not task.get('enabled', True):
+        logger.info("Tarefa %s excluída ou desabilitada - execução ignorada", task_id)
+        return
+    logger.info("▶️ Executando tarefa '%s' (%s)", task['name'], task_id)
+    result, email_result = run_scraping_task(
+        task,
+        progress=lambda message: logger.info("[%s] %s", task_id, message),
+        trigger=RUN_SCHEDULED
+    )
+    if result.get('unchanged'):
+        logger.info("⏭️ Tarefa '%s': página de origem sem mudanças - execução encerrada após o download", task['name'])
+    elif result['success']:
+        changes = result.get('changes')
+        summary = (f"{len(changes['new'])} novo(s), {len(changes['changed'])} alterado(s), "
+                   f"{len(changes['removed'])} removido(s)") if changes is not None else "sem comparação"
+        logger.info("✅ Tarefa '%s': %s produto(s), %s; email: %s", task['name'], result['total'], summary, email_result)
+    else:
+        logger.warning("❌ Tarefa '%s': %s", task['name'], result['error'])
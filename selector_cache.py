@@ -0,0 +1,59 @@
+"""
+Cache dos seletores identificados pela IA, por template de página.
+
+Páginas do mesmo site com o mesmo esqueleto (mesma impressão digital
+estrutural) aceitam os mesmos seletores. A chave do cache é
+domínio + impressão digital + pedido do usuário: só a primeira página de
+cada template paga uma chamada à IA, as demais reaproveitam os seletores.
+"""
+import json
+import os
+
+from disk_cache import DiskCache
+
+SELECTOR_CACHE_DIR = os.environ.get('SELECTOR_CACHE_DIR', os.path.join('.cache', 'selectors'))
+SELECTOR_CACHE_TTL = int(os.environ.get('SELECTOR_CACHE_TTL', 7 * 24 * 3600))  # sites mudam de layout
+SELECTOR_CACHE_MAX_BYTES = int(os.environ.get('SELECTOR_CACHE_MAX_MB', 20)) * 1024 * 1024
+
+selector_cache = DiskCache(SELECTOR_CACHE_DIR, max_bytes=SELECTOR_CACHE_MAX_BYTES, default_ttl=SELECTOR_CACHE_TTL)
+
+
+def normalize_query(user_query):
+    """Pedido do usuário sem diferença de maiúsculas/espaços (mesmo pedido = mesma chave)"""
+    return ' '.join((user_query or '').lower().split())
+
+
+def _cache_key(domain, fingerprint, user_query):
+    return ('selectors', domain, fingerprint, normalize_query(user_query))
+
+
+def get_cached_selectors(domain, fingerprint, user_query):
+    """
+    Busca seletores já identificados para este template.
+
+    Returns:
+        dict: Resultado da IA ({'seletores', 'explicacao'}) ou None
+    """
+    entry = selector_cache.get(_cache_key(domain, fingerprint, user_query))
+    if not entry:
+        return None
+    try:
+        return json.loads(entry['value'])
+    except ValueError:
+        return None
+
+
+def store_selectors(domain, fingerprint, user_query, ai_result, source_url=None):
+    """Grava os seletores identificados pela IA para este template"""
+    if not ai_result or 'error' in ai_result or not ai_result.get('seletores'):
+        return
+    selector_cache.set(
+        _cache_key(domain, fingerprint, user_query),
+        json.dumps({'seletores': ai_result['seletores'], 'explicacao': ai_result.get('explicacao', '')}, ensure_ascii=False),
+        meta={'domain': domain, 'fingerprint': fingerprint, 'source_url': source_url}
+    )
+
+
+def forget_selectors(domain, fingerprint, user_query):
+    """Remove a entrada (ex: seletores em cache não encontraram nada nesta página)"""
+    selector_cache.delete(_cache_key(domain, fingerprint, user_query))
@@ -0,0 +1,164 @@
+"""
+Agendador das tarefas de Scraping Automático (processo separado do Streamlit).
+
+A aba "Scraping Automático" só gravava frequency/custom_schedule: as tarefas
+rodavam apenas quando alguém clicava em "▶️ Executar Agora". Este processo
+roda cada tarefa habilitada nos horários configurados:
+
+    python task_scheduler.py
+
+- Diário / Semanal / Mensal: cron no horário TASK_SCHEDULE_HOUR
+- Personalizado: expressão cron ("0 10 * * 1") ou intervalo ("30m", "6h", "2d")
+- job store persistente (SQLite via SQLAlchemy): as próximas execuções
+  sobrevivem a reinícios, e execuções perdidas com o processo parado rodam
+  ao voltar se estiverem dentro de SCHEDULER_MISFIRE_GRACE
+- coalesce: várias execuções perdidas da mesma tarefa viram uma só
+- max_instances: uma tarefa nunca roda duas vezes ao mesmo tempo
+- as tarefas rodam num pool de threads (SCHEDULER_MAX_WORKERS)
+
+As tarefas criadas/excluídas na interface são lidas de novo a cada
+SCHEDULER_SYNC_SECONDS, sem reiniciar o processo.
+"""
+import logging
+import os
+import re
+from datetime import datetime
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+try:
+    from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    SQLALCHEMY_AVAILABLE = False
+
+from scraping_tasks import load_scraping_tasks
+
+SCHEDULER_DB_URL = os.environ.get('SCHEDULER_DB_URL', 'sqlite:///scheduler_jobs.sqlite')
+SCHEDULER_MAX_WORKERS = int(os.environ.get('SCHEDULER_MAX_WORKERS', 4))  # tarefas rodando ao mesmo tempo
+SCHEDULER_MAX_INSTANCES = int(os.environ.get('SCHEDULER_MAX_INSTANCES', 1))  # execuções simultâneas da mesma tarefa
+SCHEDULER_MISFIRE_GRACE = int(os.environ.get('SCHEDULER_MISFIRE_GRACE', 3600))  # segundos de atraso tolerados
+SCHEDULER_SYNC_SECONDS = int(os.environ.get('SCHEDULER_SYNC_SECONDS', 30))  # releitura das tarefas cadastradas
+SCHEDULER_TIMEZONE = os.environ.get('SCHEDULER_TIMEZONE', 'America/Sao_Paulo')
+TASK_SCHEDULE_HOUR = int(os.environ.get('TASK_SCHEDULE_HOUR', 8))  # horário das frequências pré-definidas
+
+TASK_JOB_PREFIX = 'task-'
+
+# Frequências da interface -> campos do cron
+FREQUENCY_CRON = {
+    "Diário": {},
+    "Semanal": {'day_of_week': 'mon'},
+    "Mensal": {'day': 1},
+}
+_INTERVAL_PATTERN = re.compile(r'^(?:a cada\s+)?(\d+)\s*(m|min|h|d)$', re.I)
+_INTERVAL_UNITS = {'m': 'minutes', 'min': 'minutes', 'h': 'hours', 'd': 'days'}
+
+logger = logging.getLogger('task_scheduler')
+
+
+def trigger_for_task(task):
+    """
+    Trigger do APScheduler para a frequência configurada na tarefa.
+
+    Raises:
+        ValueError: Frequência desconhecida ou agendamento personalizado inválido
+    """
+    frequency = task.get('frequency')
+    if frequency in FREQUENCY_CRON:
+        return CronTrigger(hour=TASK_SCHEDULE_HOUR, minute=0, timezone=SCHEDULER_TIMEZONE, **FREQUENCY_CRON[frequency])
+    if frequency == "Personalizado":
+        schedule = (task.get('custom_schedule') or '').strip()
+        match = _INTERVAL_PATTERN.match(schedule)
+        if match:
+            return IntervalTrigger(timezone=SCHEDULER_TIMEZONE, **{_INTERVAL_UNITS[match.group(2).lower()]: int(match.group(1))})
+        if not schedule:
+            raise ValueError("Agendamento personalizado vazio")
+        return CronTrigger.from_crontab(schedule, timezone=SCHEDULER_TIMEZONE)
+    raise ValueError(f"Frequência desconhecida: {frequency}")
+
+
+def schedule_spec(task):
+    """
+    Agendamento da tarefa como texto estável (frequência, personalizado, horário, fuso).
+    Guardado no job para comparação: o repr de um IntervalTrigger inclui o start_date
+    (agora + intervalo), então nunca seria igual ao de um trigger recriado.
+    """
+    return '|'.join(str(part) for part in (
+        task.get('frequency'), (task.get('custom_schedule') or '').strip(), TASK_SCHEDULE_HOUR, SCHEDULER_TIMEZONE
+    ))
+
+
+def sync_jobs(scheduler):
+    """
+    Deixa os jobs do agendador iguais às tarefas cadastradas: cria os das tarefas novas,
+    remove os das excluídas/desabilitadas e só recria um job quando o agendamento mudou
+    (recriar sempre perderia a próxima execução guardada no job store).
+    """
+    tasks = {task['id']: task for task in load_scraping_tasks() if task.get('enabled', True) and task.get('id')}
+
+    for job in scheduler.get_jobs(jobstore='default'):
+        if job.id.startswith(TASK_JOB_PREFIX) and job.id[len(TASK_JOB_PREFIX):] not in tasks:
+            logger.info("🗑️ Removendo agendamento de %s", job.name)
+            job.remove()
+
+    for task_id, task in tasks.items():
+        try:
+            trigger = trigger_for_task(task)
+        except ValueError as e:
+            logger.warning("⚠️ Tarefa '%s' sem agendamento válido: %s", task.get('name'), e)
+            continue
+        job_id = TASK_JOB_PREFIX + task_id
+        spec = schedule_spec(task)
+        job = scheduler.get_job(job_id, jobstore='default')
+        if job is not None and job.kwargs.get('schedule') == spec:
+            continue
+        # Referência textual: o job persistido aponta para scraping_tasks, não para este script (__main__)
+        scheduler.add_job(
+            'scraping_tasks:run_scheduled_task', trigger, args=[task_id], kwargs={'schedule': spec}, id=job_id,
+            name=task['name'], jobstore='default', replace_existing=True
+        )
+        logger.info("⏰ Tarefa '%s' agendada: %s", task['name'], trigger)
+
+
+def create_scheduler():
+    """BlockingScheduler com job store persistente, pool de threads e os limites por tarefa"""
+    if SQLALCHEMY_AVAILABLE:
+        default_store = SQLAlchemyJobStore(url=SCHEDULER_DB_URL)
+    else:
+        logger.warning("SQLAlchemy não instalado: agendamentos ficam só em memória (perdidos ao reiniciar)")
+        default_store = MemoryJobStore()
+    return BlockingScheduler(
+        # 'internal': job de sincronização (não é persistido - depende do próprio agendador)
+        jobstores={'default': default_store, 'internal': MemoryJobStore()},
+        executors={'default': ThreadPoolExecutor(max_workers=SCHEDULER_MAX_WORKERS)},
+        job_defaults={
+            'coalesce': True,
+            'max_instances': SCHEDULER_MAX_INSTANCES,
+            'misfire_grace_time': SCHEDULER_MISFIRE_GRACE,
+        },
+        timezone=SCHEDULER_TIMEZONE
+    )
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    scheduler = create_scheduler()
+    # Sincroniza logo ao iniciar (o job store persistente só é lido depois do start) e
+    # depois periodicamente, para pegar as tarefas criadas/excluídas na interface
+    scheduler.add_job(
+        sync_jobs, IntervalTrigger(seconds=SCHEDULER_SYNC_SECONDS, timezone=SCHEDULER_TIMEZONE), args=[scheduler],
+        id='sync-tasks', jobstore='internal', next_run_time=datetime.now().astimezone()
+    )
+    logger.info("Agendador iniciado (job store: %s)", SCHEDULER_DB_URL if SQLALCHEMY_AVAILABLE else 'memória')
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Agendador encerrado")
+
+
+if __name__ == "__main__":
+    main()
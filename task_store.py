@@ -0,0 +1,264 @@
+"""
+Tarefas de Scraping Automático e histórico de execuções em SQLite.
+
+Antes tudo ficava em scraping_tasks.json / scraping_history.json: cada
+execução relia e regravava o histórico inteiro (O(n) por execução) e a
+interface lia o arquivo todo só para mostrar as 5 últimas. Com o agendador
+rodando em outro processo, duas gravações ao mesmo tempo ainda podiam
+perder entradas.
+
+Aqui:
+- modo WAL: leituras não bloqueiam a gravação e vice-versa, entre processos
+- histórico só recebe INSERT (nada é reescrito)
+- índices em task_id e timestamp: as páginas do histórico saem do índice,
+  em tempo constante mesmo com dezenas de milhares de execuções
+- na primeira abertura, os arquivos JSON antigos são importados
+- snapshots: a última versão de cada produto por tarefa (chave de
+  identidade + hash), base da detecção de mudanças entre execuções
+- source_pages: ETag/Last-Modified e hash do conteúdo da página de origem
+  na última execução bem-sucedida de cada tarefa (página sem mudança = nada a extrair)
+"""
+import json
+import os
+import sqlite3
+import threading
+
+SCRAPING_DB_PATH = os.environ.get('SCRAPING_DB_PATH', 'scraping_tasks.sqlite')
+SQLITE_BUSY_TIMEOUT_MS = 10000  # espera por um lock de gravação de outro processo
+
+# Arquivos do formato antigo, importados uma vez
+LEGACY_TASKS_FILE = "scraping_tasks.json"
+LEGACY_HISTORY_FILE = "scraping_history.json"
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT,
+    config TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    task_name TEXT,
+    timestamp TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    entry TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_task_timestamp ON history (task_id, timestamp);
+CREATE TABLE IF NOT EXISTS snapshots (
+    task_id TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    row TEXT NOT NULL,
+    PRIMARY KEY (task_id, row_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS source_pages (
+    task_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (task_id, url)
+) WITHOUT ROWID;
+"""
+
+
+class TaskStore:
+    """
+    Tarefas e histórico num banco SQLite (uma conexão por thread).
+
+    Args:
+        path: Arquivo do banco
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')  # seguro em WAL; fsync só nos checkpoints
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._create_schema(conn)
+                    self._initialized = True
+        return conn
+
+    def _create_schema(self, conn):
+        conn.executescript(_SCHEMA)
+        # BEGIN IMMEDIATE: se o app e o agendador abrirem o banco novo juntos, só um importa
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] < _SCHEMA_VERSION:
+                self._import_legacy_files(conn)
+                conn.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _import_legacy_files(self, conn):
+        """Importa scraping_tasks.json / scraping_history.json (uma vez só, na criação do banco)"""
+        for task in _read_json_list(LEGACY_TASKS_FILE):
+            if task.get('id'):
+                self._upsert_task(conn, task)
+        conn.executemany(
+            'INSERT INTO history (task_id, task_name, timestamp, success, entry) VALUES (?, ?, ?, ?, ?)',
+            [_history_row(entry) for entry in _read_json_list(LEGACY_HISTORY_FILE)
+             if entry.get('task_id') and entry.get('timestamp')]
+        )
+
+    # ---- Tarefas ----
+
+    @staticmethod
+    def _upsert_task(conn, task):
+        conn.execute(
+            'INSERT OR REPLACE INTO tasks (id, name, enabled, created_at, config) VALUES (?, ?, ?, ?, ?)',
+            (task['id'], task.get('name', ''), 1 if task.get('enabled', True) else 0, task.get('created_at'),
+             json.dumps(task, ensure_ascii=False, default=str))
+        )
+
+    def save_task(self, task):
+        """Cria ou atualiza uma tarefa (precisa de 'id')"""
+        conn = self._connect()
+        with conn:
+            self._upsert_task(conn, task)
+
+    def delete_task(self, task_id):
+        """Exclui a tarefa, o snapshot e o estado da página de origem (o histórico continua)"""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM snapshots WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM source_pages WHERE task_id = ?', (task_id,))
+            return conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,)).rowcount > 0
+
+    def get_task(self, task_id):
+        """Tarefa pelo id (ou None)"""
+        row = self._connect().execute('SELECT config FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return json.loads(row['config']) if row else None
+
+    def list_tasks(self, enabled_only=False):
+        """Tarefas na ordem de criação"""
+        query = 'SELECT config FROM tasks'
+        if enabled_only:
+            query += ' WHERE enabled = 1'
+        query += ' ORDER BY created_at, rowid'
+        return [json.loads(row['config']) for row in self._connect().execute(query)]
+
+    # ---- Histórico ----
+
+    def append_history(self, entry):
+        """Registra uma execução (INSERT; nada é regravado)"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT INTO history (task_id, task_name, timestamp, success, entry) VALUES (?, ?, ?, ?, ?)',
+                _history_row(entry)
+            )
+
+    def history_page(self, limit=20, offset=0, task_id=None):
+        """
+        Página do histórico, da execução mais recente para a mais antiga.
+
+        Args:
+            limit: Execuções por página
+            offset: Quantas pular (página * limit)
+            task_id: Só as execuções desta tarefa (opcional)
+
+        Returns:
+            list: Entradas do histórico (dicts)
+        """
+        where, params = ('WHERE task_id = ?', [task_id]) if task_id else ('', [])
+        rows = self._connect().execute(
+            f'SELECT entry FROM history {where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?',
+            params + [int(limit), int(offset)]
+        )
+        return [json.loads(row['entry']) for row in rows]
+
+    def history_count(self, task_id=None):
+        """Total de execuções registradas (de uma tarefa ou de todas)"""
+        if task_id:
+            row = self._connect().execute('SELECT COUNT(*) FROM history WHERE task_id = ?', (task_id,)).fetchone()
+        else:
+            row = self._connect().execute('SELECT COUNT(*) FROM history').fetchone()
+        return row[0]
+
+    # ---- Snapshots (detecção de mudanças) ----
+
+    def load_snapshot(self, task_id):
+        """Última versão conhecida dos produtos da tarefa: dict chave -> {'hash': ..., 'row': ...}"""
+        rows = self._connect().execute('SELECT row_key, row_hash, row FROM snapshots WHERE task_id = ?', (task_id,))
+        return {row['row_key']: {'hash': row['row_hash'], 'row': json.loads(row['row'])} for row in rows}
+
+    def update_snapshot(self, task_id, upserts, deleted_keys):
+        """
+        Aplica só as diferenças ao snapshot, numa transação.
+
+        Args:
+            task_id: ID da tarefa
+            upserts: [(chave, hash, linha)] dos produtos novos/alterados
+            deleted_keys: Chaves dos produtos removidos
+        """
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO snapshots (task_id, row_key, row_hash, row) VALUES (?, ?, ?, ?)',
+                [(task_id, key, digest, json.dumps(row, ensure_ascii=False, default=str)) for key, digest, row in upserts]
+            )
+            conn.executemany(
+                'DELETE FROM snapshots WHERE task_id = ? AND row_key = ?',
+                [(task_id, key) for key in deleted_keys]
+            )
+
+    # ---- Página de origem (execução sem mudança) ----
+
+    def get_source_state(self, task_id, url):
+        """Validadores e hash da página na última execução bem-sucedida (dict ou None)"""
+        row = self._connect().execute(
+            'SELECT etag, last_modified, content_hash, updated_at FROM source_pages WHERE task_id = ? AND url = ?',
+            (task_id, url)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save_source_state(self, task_id, url, state):
+        """Grava etag / last_modified / content_hash / updated_at da página de origem da tarefa"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO source_pages (task_id, url, etag, last_modified, content_hash, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (task_id, url, state.get('etag'), state.get('last_modified'), state.get('content_hash'),
+                 state.get('updated_at'))
+            )
+
+
+def _history_row(entry):
+    return (
+        entry['task_id'], entry.get('task_name'), entry['timestamp'], 1 if entry.get('success') else 0,
+        json.dumps(entry, ensure_ascii=False, default=str)
+    )
+
+
+def _read_json_list(path):
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else []
+    except (OSError, ValueError):
+        return []
+
+
+task_store = TaskStore(SCRAPING_DB_PATH)